@@ -0,0 +1,422 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+import basedados
+import caches
+import medicao
+import wbcache
+import wbdados
+import wdi
+from wbfetch import WBFetchError
+
+# ------------------ API de dados (sem Streamlit) ------------------
+# Serviço HTTP para jobs que hoje carregam nos botões "Baixar CSV"/"Baixar Excel" dos dashboards:
+# os mesmos dados, pelo mesmo caminho de leitura e reformatação, sem figuras, KPIs nem reruns.
+#
+#     GET /base?colunas=Crédito Interno,Reservas Obrigatórias&inicio=2020-01&fim=2023-12&resolucao=Trimestral
+#     GET /base?categoria=Banca&formato=jsonl
+#     GET /wb?indicadores=NY.GDP.MKTP.CD,SP.POP.TOTL&paises=MOZ,MWI&inicio=2000&fim=2020&formato=arrow
+#     GET /base/colunas, /wb/indicadores, /wb/paises   (listas em JSON)
+#
+# Filtros: `colunas` (lista separada por vírgulas ou parâmetro repetido), `inicio`/`fim` (datas na
+# base, anos no /wb), `paises` e `indicadores` (códigos ou nomes como aparecem no wbapp.py).
+# `formato`: csv (por defeito), jsonl ou arrow (Arrow IPC stream). As respostas são enviadas aos
+# blocos (chunked) e têm ETag: um GET com If-None-Match igual recebe 304 sem corpo. Na base a ETag
+# sai da versão do Excel e das categorias; no /wb da versão da cópia do WDI (meta.json) ou das
+# células guardadas no wbcache. Em ambos é verificada antes de ler os dados.
+#
+#     python api.py --porta 8502
+
+PORTA = int(os.environ.get('MOZDADOS_API_PORTA', 8502))
+LINHAS_POR_BLOCO = 10_000  # linhas serializadas de cada vez na resposta
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+SINONIMOS_FORMATO = {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl', 'json': 'jsonl',
+                     'arrow': 'arrow', 'ipc': 'arrow', 'feather': 'arrow'}
+COLUNAS_WB = ['País', 'Indicador', 'Ano', 'Valor']
+LISTAS_TTL = 24 * 3600
+
+
+class PedidoInvalido(ValueError):
+    pass
+
+
+# ------------------ Parâmetros ------------------
+
+def _lista(params, nome):
+    # ?x=a,b&x=c -> ['a', 'b', 'c'] (sem repetições, pela ordem do pedido)
+    valores = [v.strip() for bruto in params.get(nome, []) for v in bruto.split(',')]
+    return list(dict.fromkeys(v for v in valores if v)) or None
+
+
+def _um(params, nome, padrao=None):
+    valores = params.get(nome)
+    return valores[-1].strip() if valores else padrao
+
+
+def _formato(params):
+    formato = SINONIMOS_FORMATO.get(_um(params, 'formato', 'csv').lower())
+    if formato is None:
+        raise PedidoInvalido(f"formato desconhecido; use {', '.join(FORMATOS)}")
+    return formato
+
+
+def _data(params, nome):
+    valor = _um(params, nome)
+    if valor is None:
+        return None
+    try:
+        return pd.Timestamp(valor)
+    except ValueError:
+        raise PedidoInvalido(f'{nome} não é uma data: {valor!r}') from None
+
+
+def _ano(params, nome, padrao):
+    valor = _um(params, nome)
+    if valor is None:
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise PedidoInvalido(f'{nome} não é um ano: {valor!r}') from None
+
+
+def _etag(*partes):
+    return '"' + hashlib.sha1(repr(partes).encode('utf-8')).hexdigest() + '"'
+
+
+# ------------------ Base de dados do app.py ------------------
+
+# Mesmo caminho do carregar_dados do app.py: cópia colunar do Excel, só as colunas pedidas,
+# reamostrada para a resolução pedida com as agregações de dados/categorias.csv
+@caches.em_cache('api_base', max_entradas=16, max_bytes=512 * 1024 ** 2)
+def _base(versao, versao_categorias, colunas, resolucao):
+    df = basedados.carregar(colunas=list(colunas))
+    regra = basedados.RESOLUCOES[resolucao]
+    return df if regra is None else basedados.reamostrar(df, regra, basedados.carregar_agregacoes())
+
+
+def _resolucao(params):
+    valor = _um(params, 'resolucao', 'Mensal')
+    for nome in basedados.RESOLUCOES:
+        if nome.lower() == valor.lower():
+            return nome
+    raise PedidoInvalido(f"resolucao desconhecida; use {', '.join(basedados.RESOLUCOES)}")
+
+
+def pedido_base(params):
+    # Devolve (etag, função que carrega o DataFrame): a ETag não precisa de ler os dados
+    # Colunas pedidas que não existem (ou não pertencem à categoria) dão erro em vez de serem
+    # ignoradas: nunca se devolve outro conjunto de colunas diferente do pedido
+    todas = basedados.colunas()
+    disponiveis = todas
+    categoria = _um(params, 'categoria')
+    if categoria is not None:
+        categorias = basedados.carregar_categorias()
+        if categoria not in categorias:
+            raise PedidoInvalido(f'categoria desconhecida: {categoria!r}')
+        disponiveis = [c for c in categorias[categoria] if c in todas]
+    colunas = _lista(params, 'colunas')
+    if colunas is None:
+        colunas = [] if 'colunas' in params else disponiveis
+    else:
+        desconhecidas = [c for c in colunas if c not in todas]
+        if desconhecidas:
+            raise PedidoInvalido(f"colunas desconhecidas: {', '.join(desconhecidas)}")
+        fora = [c for c in colunas if c not in disponiveis]
+        if fora:
+            raise PedidoInvalido(f"colunas fora da categoria {categoria!r}: {', '.join(fora)}")
+    if not colunas:
+        raise PedidoInvalido('nenhuma coluna para devolver' +
+                             (f' na categoria {categoria!r}' if categoria is not None else ''))
+    resolucao = _resolucao(params)
+    inicio, fim = _data(params, 'inicio'), _data(params, 'fim')
+
+    versao = basedados.versao()
+    versao_categorias = basedados.versao(basedados.CATEGORIAS)
+    etag = _etag('base', versao, versao_categorias, colunas, resolucao, inicio, fim)
+
+    def carregar():
+        df = _base(versao, versao_categorias, tuple(colunas), resolucao)
+        return basedados.fatiar_resolucao(df, resolucao, inicio, fim).reset_index()
+
+    return etag, carregar
+
+
+# ------------------ Banco Mundial (wbapp.py) ------------------
+
+# Tamanho estimado pelo catálogo quando foi construído (o dicionário partilha as mesmas strings)
+@caches.em_cache('api_catalogo', ttl=LISTAS_TTL, max_entradas=1,
+                 medir=lambda valor: valor[0].nbytes + sys.getsizeof(valor[1]))
+def _catalogo_guardado():
+    catalogo = wbdados.carregar_catalogo()
+    return catalogo, dict(zip(catalogo.ids, catalogo.nomes))
+
+
+def _catalogo():
+    catalogo, nomes = _catalogo_guardado()
+    if catalogo.degradado:
+        # Catálogo sem tópicos (a API falhou): não fica em memória, o próximo pedido volta a tentar
+        _catalogo_guardado.limpar()
+    return catalogo, nomes
+
+
+@caches.em_cache('api_paises', ttl=LISTAS_TTL, max_entradas=1)
+def _paises():
+    paises = wbdados.carregar_paises()
+    return paises, dict(zip(paises['id'], paises.index))
+
+
+def _resolver(pedidos, nome_para_id, id_para_nome, o_que):
+    # Aceita códigos ou nomes; devolve (códigos, nomes) pela ordem do pedido
+    codigos = []
+    for valor in pedidos:
+        codigo = valor if valor in id_para_nome else nome_para_id.get(valor)
+        if codigo is None:
+            raise PedidoInvalido(f'{o_que} desconhecido: {valor!r}')
+        codigos.append(codigo)
+    codigos = list(dict.fromkeys(codigos))
+    return codigos, [id_para_nome[c] for c in codigos]
+
+
+def pedido_wb(params):
+    indicadores, paises = _lista(params, 'indicadores'), _lista(params, 'paises')
+    if not indicadores or not paises:
+        raise PedidoInvalido('indique indicadores e paises')
+    catalogo, nomes_ind = _catalogo()
+    tabela_paises, nomes_paises = _paises()
+    i_lis, sel_ind = _resolver(indicadores, catalogo.nome_para_id, nomes_ind, 'indicador')
+    c_lis, sel_country = _resolver(paises, tabela_paises['id'].to_dict(), nomes_paises, 'país')
+    inicio, fim = _ano(params, 'inicio', wbdados.ANOS[0]), _ano(params, 'fim', wbdados.ANOS[1])
+    if inicio > fim:
+        raise PedidoInvalido('inicio depois de fim')
+    colunas = _lista(params, 'colunas')
+    if colunas is None and 'colunas' in params:
+        raise PedidoInvalido('nenhuma coluna para devolver')
+    colunas = colunas or COLUNAS_WB
+    desconhecidas = [c for c in colunas if c not in COLUNAS_WB]
+    if desconhecidas:
+        raise PedidoInvalido(f"colunas desconhecidas: {', '.join(desconhecidas)}; use {', '.join(COLUNAS_WB)}")
+
+    # Cópia local do WDI se existir, senão o cache local (só as células em falta vão à API)
+    def versao():
+        if wdi.disponivel():
+            return 'wdi', wdi.versao()
+        return 'wbcache', wbcache.versao(i_lis, c_lis, inicio, fim)
+
+    def carregar():
+        if wdi.disponivel():
+            df = wdi.get_data(i_lis, c_lis, inicio, fim)
+        else:
+            df = wbcache.get_data(i_lis, c_lis, inicio, fim)
+        return wbdados.formato_longo(df, i_lis, sel_ind, c_lis, sel_country)[colunas]
+
+    # A ETag junta o pedido normalizado (códigos pela ordem pedida, anos, colunas) à versão dos
+    # dados: um If-None-Match igual recebe 304 sem ler nada. Se faltam células no wbcache, os
+    # dados ainda vão mudar: são pedidos já e a versão é lida depois
+    origem, atual = versao()
+    df_long = None
+    if atual is None:
+        df_long = carregar()
+        origem, atual = versao()
+    etag = None if atual is None else _etag('wb', origem, atual, i_lis, c_lis, inicio, fim, colunas)
+    return etag, carregar if df_long is None else (lambda: df_long)
+
+
+def lista_wb(o_que):
+    if o_que == 'indicadores':
+        catalogo, _ = _catalogo()
+        return [{'id': i, 'nome': n} for i, n in zip(catalogo.ids, catalogo.nomes)]
+    paises, _ = _paises()
+    return [{'id': i, 'nome': n} for n, i in paises['id'].items()]
+
+
+# ------------------ Serialização aos blocos ------------------
+
+def _blocos_csv(df):
+    for inicio in range(0, max(len(df), 1), LINHAS_POR_BLOCO):
+        yield df.iloc[inicio:inicio + LINHAS_POR_BLOCO].to_csv(index=False, header=inicio == 0).encode('utf-8')
+
+
+def _blocos_jsonl(df):
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        texto = df.iloc[inicio:inicio + LINHAS_POR_BLOCO].to_json(orient='records', lines=True, date_format='iso',
+                                                                   force_ascii=False)
+        yield (texto if texto.endswith('\n') else texto + '\n').encode('utf-8')
+
+
+class _Saida:
+    # Destino "ficheiro" do escritor Arrow: cada write vira um bloco da resposta
+    def __init__(self):
+        self.blocos = []
+
+    def write(self, dados):
+        self.blocos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    @property
+    def closed(self):
+        return False
+
+
+def _blocos_arrow(df):
+    # Categorias ficam como dictionary arrays; o esquema vai no primeiro bloco
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    saida = _Saida()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        for lote in tabela.to_batches(max_chunksize=LINHAS_POR_BLOCO):
+            escritor.write_batch(lote)
+            yield b''.join(saida.blocos)
+            saida.blocos.clear()
+    yield b''.join(saida.blocos)
+
+
+_SERIALIZADORES = {'csv': _blocos_csv, 'jsonl': _blocos_jsonl, 'arrow': _blocos_arrow}
+
+
+# ------------------ Servidor ------------------
+
+def _coincide(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    etiquetas = [e.strip().removeprefix('W/') for e in if_none_match.split(',')]
+    return '*' in etiquetas or etag in etiquetas
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # ligações persistentes e Transfer-Encoding: chunked
+    server_version = 'MozdadosAPI/1.0'
+
+    def do_GET(self):
+        self._responder(corpo=True)
+
+    def do_HEAD(self):
+        self._responder(corpo=False)
+
+    def _responder(self, corpo):
+        inicio = time.perf_counter()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        caminho = url.path.rstrip('/') or '/'
+        try:
+            if caminho == '/base/colunas':
+                return self._json(200, {'colunas': basedados.colunas(),
+                                        'categorias': basedados.carregar_categorias(),
+                                        'resolucoes': list(basedados.RESOLUCOES)}, corpo)
+            if caminho in ('/wb/indicadores', '/wb/paises'):
+                return self._json(200, lista_wb(caminho.rsplit('/', 1)[1]), corpo)
+            if caminho == '/base':
+                etag, carregar = pedido_base(params)
+            elif caminho == '/wb':
+                etag, carregar = pedido_wb(params)
+            else:
+                return self._json(404, {'erro': f'caminho desconhecido: {url.path}',
+                                        'caminhos': ['/base', '/base/colunas', '/wb', '/wb/indicadores',
+                                                     '/wb/paises']}, corpo)
+            formato = _formato(params)
+            if etag is not None:
+                etag = etag[:-1] + f'-{formato}"'
+            if etag is not None and _coincide(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                medicao.registar('api', caminho, (time.perf_counter() - inicio) * 1000, cache='304')
+                return
+            df = carregar()
+        except PedidoInvalido as e:
+            return self._json(400, {'erro': str(e)}, corpo)
+        except FileNotFoundError as e:
+            return self._json(404, {'erro': f'ficheiro não encontrado: {e}'}, corpo)
+        except WBFetchError as e:
+            return self._json(502, {'erro': f'Banco Mundial indisponível: {e}'}, corpo)
+        except Exception as e:
+            self.log_error('%s: %r', self.path, e)
+            return self._json(500, {'erro': str(e)}, corpo)
+
+        # O primeiro bloco é serializado antes do 200: um erro logo no início (ex.: conversão para
+        # Arrow de um tipo inesperado) ainda pode ser respondido com 500
+        blocos = iter(_SERIALIZADORES[formato](df)) if corpo else iter(())
+        try:
+            primeiro = next(blocos, b'')
+        except Exception as e:
+            self.log_error('%s: %r', self.path, e)
+            medicao.registar('api', caminho, (time.perf_counter() - inicio) * 1000, formato=formato,
+                             erro=repr(e))
+            return self._json(500, {'erro': f'erro ao serializar em {formato}: {e}'}, corpo)
+
+        self.send_response(200)
+        self.send_header('Content-Type', FORMATOS[formato])
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')  # guardar, mas confirmar sempre com If-None-Match
+        self.send_header('X-Linhas', str(len(df)))
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        if not corpo:
+            return
+        enviados = 0
+        erro = None
+        try:
+            for bloco in itertools.chain([primeiro], blocos):
+                if bloco:
+                    self.wfile.write(f'{len(bloco):X}\r\n'.encode('ascii') + bloco + b'\r\n')
+                    enviados += len(bloco)
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # o cliente desistiu a meio
+            erro = 'ligação fechada pelo cliente'
+        except Exception as e:
+            # O 200 já foi enviado: a resposta fica sem o bloco final e a ligação é fechada, para
+            # que o cliente veja o corpo como incompleto em vez de dados truncados em silêncio
+            self.close_connection = True
+            erro = repr(e)
+        medicao.registar('api', caminho, (time.perf_counter() - inicio) * 1000, linhas=len(df),
+                         bytes=enviados, formato=formato, erro=erro)
+
+    def _json(self, estado, valor, corpo=True):
+        dados = json.dumps(valor, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        if corpo:
+            self.wfile.write(dados)
+
+
+def servir(porta=PORTA, endereco='127.0.0.1'):
+    servidor = ThreadingHTTPServer((endereco, porta), Handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='API de dados do Mozdados (CSV, JSON Lines e Arrow IPC)')
+    parser.add_argument('--porta', type=int, default=PORTA)
+    parser.add_argument('--endereco', default='127.0.0.1', help='use 0.0.0.0 para aceitar ligações de fora')
+    args = parser.parse_args()
+
+    servidor = servir(args.porta, args.endereco)
+    print(f'✓ API em http://{args.endereco}:{args.porta} (Ctrl+C para terminar)', flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
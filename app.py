@@ -1,7 +1,15 @@
+import functools
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from io import BytesIO
+
+import basedados
+import caches
+import exportar
+import graficos
+import medicao
+from kpis import calcular_kpis_largo
 
 # 1. Configuração da Página
 st.set_page_config(
@@ -10,23 +18,29 @@ st.set_page_config(
     layout='wide'
 )
 
+# Tempo de cada etapa deste rerun (log JSON; painel lateral com ?desempenho=1)
+medir = medicao.Medicao('app')
+painel_desempenho = medicao.painel_ativo(st.query_params)
+admin = caches.admin_ativo(st.query_params)
+
+# Categorias (abas) do dashboard e o respetivo rótulo
+CATEGORIAS = {'Saúde': '🏥 Saúde', 'Educação': '🎓 Educação', 'Finanças': '💰 Finanças', 'Banca': '🏦 Banca'}
 
 # 2. Função de Carregamento de Dados com Cache
-# O @st.cache_data faz com que o Excel seja lido apenas uma vez, melhorando a performance.
-@st.cache_data
-def carregar_dados():
+# O Excel é convertido uma única vez para um ficheiro colunar (dados/cache) e lido daí.
+# A versão do ficheiro entra na chave do cache: quando o Excel muda, os dados são recarregados.
+# Cada aba pede só as suas colunas (colunas=() carrega apenas as datas). A cache é limitada em
+# entradas e em bytes (LRU); as versões antigas acabam por sair sem esperar por um TTL.
+@caches.em_cache('app_dados', max_entradas=16, max_bytes=512 * 1024 ** 2)
+def _carregar_dados(versao, colunas=None):
+    medicao.falha_cache()
+    return basedados.carregar(colunas=None if colunas is None else list(colunas))
+
+
+# Os erros não ficam em cache: o próximo rerun volta a tentar ler o ficheiro
+def carregar_dados(versao, colunas=None):
     try:
-        # Tenta carregar o arquivo original
-        df = pd.read_excel('dados/database.xlsx')
-
-        # Tratamento da coluna de data
-        # Verifica se existe coluna 'Mês', senão tenta usar o índice ou cria dados fictícios para teste
-        if 'Mês' in df.columns:
-            df.set_index('Mês', inplace=True)
-
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
-        return df
+        return _carregar_dados(versao, colunas)
     except FileNotFoundError:
         st.error("Arquivo 'dados/database.xlsx' não encontrado. Por favor, verifique o caminho.")
         return pd.DataFrame()  # Retorna vazio para não quebrar o app
@@ -35,11 +49,38 @@ def carregar_dados():
         return pd.DataFrame()
 
 
-# Carrega os dados
-df_raw = carregar_dados()
+# Dados da aba nas três resoluções (basedados.piramide), reamostrados uma vez por versão do Excel
+# e das agregações em dados/categorias.csv; as exceções chegam à aba, que mostra o erro
+@caches.em_cache('app_piramide', max_entradas=16, max_bytes=512 * 1024 ** 2)
+def carregar_piramide(versao, versao_categorias, colunas):
+    medicao.falha_cache()
+    return basedados.piramide(_carregar_dados(versao, colunas), basedados.carregar_agregacoes())
+
+
+# Mapa indicador -> aba definido em dados/categorias.csv
+@caches.em_cache('app_categorias', max_entradas=2)
+def carregar_categorias(versao_dados, versao_categorias):
+    medicao.falha_cache()
+    categorias = basedados.carregar_categorias()
+    todas = basedados.colunas()
+    if not categorias:
+        # Sem ficheiro de categorias todas as abas mostram todos os indicadores
+        return {nome: todas for nome in CATEGORIAS}, []
+    mapeadas = {c for cols in categorias.values() for c in cols}
+    return categorias, [c for c in todas if c not in mapeadas]
+
+
+# Carrega os dados (aqui só o índice de datas; cada aba carrega as suas colunas)
+versao_dados = basedados.versao()
+with medir.etapa('carregar_indice', cache=True) as etapa:
+    df_raw = carregar_dados(versao_dados, colunas=())
+    etapa['linhas'] = len(df_raw)
 
 # Verifica se o dataframe não está vazio antes de continuar
-if not df_raw.empty:
+if len(df_raw.index):
+    with medir.etapa('categorias', cache=True):
+        versao_categorias = basedados.versao(basedados.CATEGORIAS)
+        categorias, sem_categoria = carregar_categorias(versao_dados, versao_categorias)
 
     # 3. Sidebar (Barra Lateral) para Filtros Globais
     st.sidebar.subheader('Moçambique')
@@ -55,12 +96,26 @@ if not df_raw.empty:
     data_inicio = st.sidebar.date_input("Data Início", min_date, min_value=min_date, max_value=max_date)
     data_fim = st.sidebar.date_input("Data Fim", max_date, min_value=min_date, max_value=max_date)
 
-    # Filtrar o DataFrame principal
+    # Período aplicado aos dados de cada aba
     if data_inicio <= data_fim:
-        df = df_raw.loc[data_inicio:data_fim]
+        periodo = (data_inicio, data_fim)
     else:
         st.sidebar.error("A Data de Início deve ser menor que a Data Fim.")
-        df = df_raw
+        periodo = (None, None)
+
+    # Resolução dos gráficos, KPIs e tabela: automática pelo intervalo (no máximo ~60 pontos por
+    # série) ou escolhida pelo utilizador
+    granularidade = st.sidebar.radio("Granularidade", ['Automática', *basedados.RESOLUCOES], horizontal=True,
+                                     key="granularidade")
+    if granularidade == 'Automática':
+        resolucao = basedados.resolucao_automatica(periodo[0] or min_date, periodo[1] or max_date)
+        st.sidebar.caption(f"Resolução automática: **{resolucao}**")
+    else:
+        resolucao = granularidade
+
+    if sem_categoria:
+        st.sidebar.caption(f"⚠️ {len(sem_categoria)} indicador(es) sem categoria em dados/categorias.csv: "
+                           f"{', '.join(sem_categoria[:5])}{'...' if len(sem_categoria) > 5 else ''}")
 
     # 4. Interface Principal
     a, e, i = st.columns(3)
@@ -69,86 +124,161 @@ if not df_raw.empty:
 
 
     # Criação das Abas
-    tab1, tab2, tab3, tab4 = st.tabs(['🏥 Saúde', '🎓 Educação', '💰 Finanças', '🏦 Banca'])
+    # on_change="rerun" faz as abas guardarem qual está aberta: só o conteúdo dela é calculado e enviado.
+    # Abre primeiro a primeira categoria com indicadores; as vazias explicam como associar colunas
+    aba_inicial = next((rotulo for nome, rotulo in CATEGORIAS.items() if categorias.get(nome)), None)
+    tab1, tab2, tab3, tab4 = st.tabs(list(CATEGORIAS.values()), default=aba_inicial, key="aba_ativa",
+                                     on_change="rerun")
 
 
     # Função auxiliar para criar o conteúdo de cada aba (evita repetição de código)
-    def criar_dashboard_aba(tab_context, df_filtrado, categoria_nome):
+    def criar_dashboard_aba(tab_context, categoria_nome):
+        # Abas fechadas ficam adiadas até serem abertas
+        if tab_context.open is False:
+            return
+
         with tab_context:
             st.subheader(f"Análise de {categoria_nome}")
 
-            # Seletor de Variáveis Específico para a Aba
+            cols = categorias.get(categoria_nome, [])
+            if not cols:
+                st.info(f"Ainda não há indicadores de {categoria_nome} na base de dados. "
+                        "Associe colunas a esta categoria em dados/categorias.csv.")
+                return
+
+            # Só as colunas desta categoria são lidas, filtradas e guardadas em cache
+            try:
+                with medir.etapa('carregar_colunas', cache=True, aba=categoria_nome) as etapa:
+                    niveis = carregar_piramide(versao_dados, versao_categorias, tuple(cols))
+                    etapa['linhas'] = niveis['Mensal'].size
+            except Exception as e:
+                st.error(f"Erro ao carregar dados: {e}")
+                return
+            with medir.etapa('fatiar', aba=categoria_nome, resolucao=resolucao) as etapa:
+                df_filtrado = basedados.fatiar_resolucao(niveis[resolucao], resolucao, *periodo)
+                etapa['linhas'] = df_filtrado.size
             cols = df_filtrado.columns.tolist()
-            # Dica: Aqui você poderia filtrar colunas específicas por categoria se souber os nomes
+
+            # Seletor de Variáveis Específico para a Aba
+            chave = f"multi_{categoria_nome}"  # Chave única para evitar conflito
+            # O Streamlit apaga o estado de widgets que não foram desenhados no rerun;
+            # a cópia em "_multi_..." restaura a seleção quando a aba volta a ser aberta
+            if chave not in st.session_state and f"_{chave}" in st.session_state:
+                st.session_state[chave] = [v for v in st.session_state[f"_{chave}"] if v in cols]
             vars = st.multiselect(
                 f'Selecione indicadores de {categoria_nome}:',
                 options=cols,
-                default=cols[0] if cols else None,
-                key=f"multi_{categoria_nome}"  # Chave única para evitar conflito
+                default=None if chave in st.session_state else (cols[0] if cols else None),
+                key=chave
             )
+            st.session_state[f"_{chave}"] = vars
 
             if vars:
                 # --- Área de Métricas (KPIs) ---
                 st.markdown("#### Indicadores Recentes")
                 cols_kpi = st.columns(len(vars))
 
-                for i, var in enumerate(vars):
-                    if i < 4:  # Limita a 4 cartões para não quebrar o layout visualmente
-                        valor_atual = df_filtrado[var].iloc[-1]
-                        valor_anterior = df_filtrado[var].iloc[-2] if len(df_filtrado) > 1 else valor_atual
-                        delta = ((valor_atual - valor_anterior) / valor_anterior) * 100 if valor_anterior != 0 else 0
-                        with cols_kpi[i]:
-                            st.metric(
-                                label=var,
-                                value=f"{valor_atual:,.2f}",
-                                delta=f"{delta:.1f}% (Mês ant.)"
-                            )
+                # Todos os KPIs calculados de uma vez a partir dos dados mensais do intervalo, ignorando
+                # meses sem valor: o cartão mostra a última observação e não a agregação do trimestre/ano
+                mensal = basedados.fatiar(niveis['Mensal'], *periodo)
+                with medir.etapa('kpis', aba=categoria_nome, linhas=mensal[vars].size):
+                    kpis = calcular_kpis_largo(mensal, vars)
+
+                for i, var in enumerate(vars[:4]):  # Limita a 4 cartões para não quebrar o layout visualmente
+                    if var not in kpis.index:
+                        continue
+                    kpi = kpis.loc[var]
+                    ajuda = f"Média dos últimos 3 meses: {kpi['media_movel']:,.2f}"
+                    if pd.notna(kpi['cagr']):
+                        ajuda += f" · Crescimento anual composto no período: {kpi['cagr']:.1f}%"
+                    with cols_kpi[i]:
+                        st.metric(
+                            label=var,
+                            value=f"{kpi['atual']:,.2f}",
+                            delta=f"{kpi['variacao']:.1f}% (Mês ant.)" if pd.notna(kpi['variacao']) else None,
+                            help=ajuda
+                        )
 
                 st.markdown("---")
 
                 # --- Gráfico ---
-                fig = px.line(
-                    df_filtrado,
-                    x=df_filtrado.index,
-                    y=vars,
-                    markers=True,
-                    template="plotly_white"
-                )
-
-                fig.update_layout(
-                    title=f"Evolução Temporal: {', '.join(vars)}",
-                    xaxis_title='Período',
-                    yaxis_title='Valor',
-                    legend_title='Indicadores',
-                    hovermode="x unified",  # Mostra todos os valores ao passar o mouse
-                    height=500
-                )
+                # As figuras ficam numa cache partilhada entre sessões, pela versão dos dados e das
+                # agregações, aba, resolução, indicadores e intervalo; só são construídas se faltarem
+                vista = ('app', versao_dados, versao_categorias, categoria_nome, resolucao, tuple(vars),
+                         df_filtrado.index.min(), df_filtrado.index.max())
+
+                # Séries longas são reduzidas (LTTB) a um número máximo de pontos antes de irem para o browser;
+                # a redução é feita uma vez e só se alguma das figuras tiver de ser construída
+                dados_grafico = functools.cache(lambda: graficos.largo_para_longo(df_filtrado, vars))
+
+                def construir_linhas():
+                    fig = px.line(
+                        dados_grafico(),
+                        x='Período',
+                        y='Valor',
+                        color='Indicador',
+                        markers=True,
+                        template="plotly_white",
+                        render_mode=graficos.modo_render(dados_grafico())
+                    )
+
+                    fig.update_layout(
+                        title=f"Evolução Temporal ({resolucao}): {', '.join(vars)}",
+                        xaxis_title='Período',
+                        yaxis_title='Valor',
+                        legend_title='Indicadores',
+                        hovermode="x unified",  # Mostra todos os valores ao passar o mouse
+                        height=500
+                    )
+                    return fig
+
+                def construir_area():
+                    fig_area = px.area(dados_grafico(), x='Período', y='Valor', color='Indicador',
+                                       template="plotly_white", title=f"Volume Acumulado (Área, {resolucao}) {', '.join(vars)}",)
+                    # Depois da redução as séries podem não partilhar as mesmas datas: interpola ao empilhar
+                    fig_area.update_traces(stackgaps='interpolate')
+                    fig_area.update_layout(
+                        xaxis_title='Período',
+                        yaxis_title='Valor',
+                        legend_title='Indicadores',
+                        hovermode="x unified",  # Mostra todos os valores ao passar o mouse
+                        height=500
+                    )
+                    return fig_area
+
+                with medir.etapa('grafico_linhas', cache=True, aba=categoria_nome, linhas=df_filtrado[vars].size) as etapa:
+                    fig = graficos.figura_em_cache(vista + ('linhas',), construir_linhas)
+                    if painel_desempenho:
+                        etapa['bytes'] = medicao.json_bytes(fig)
                 st.plotly_chart(fig, use_container_width=True, key=f"grafico_{categoria_nome}")
 
-                fig_area = px.area(df_filtrado, x=df_filtrado.index, y=vars,
-                                   template="plotly_white", title=f"Volume Acumulado (Área) {', '.join(vars)}",)
-                fig_area.update_layout(
-                    xaxis_title='Período',
-                    yaxis_title='Valor',
-                    legend_title='Indicadores',
-                    hovermode="x unified",  # Mostra todos os valores ao passar o mouse
-                    height=500
-                )
+                with medir.etapa('grafico_area', cache=True, aba=categoria_nome, linhas=df_filtrado[vars].size) as etapa:
+                    fig_area = graficos.figura_em_cache(vista + ('area',), construir_area)
+                    if painel_desempenho:
+                        etapa['bytes'] = medicao.json_bytes(fig_area)
                 st.plotly_chart(fig_area, use_container_width=True, key=f"graph_area_{categoria_nome}")
 
-                fig_hist = px.histogram(df_filtrado, x=vars, nbins=15,
-                                        title="Distribuição/Frequência dos Valores", marginal="rug")
-                fig_hist.update_layout(
-                    xaxis_title='Valor',
-                    yaxis_title='Frequência',
-                    legend_title='Indicadores',
-                    hovermode="x unified",  # Mostra todos os valores ao passar o mouse
-                    height=500
-                )
+                # Histograma calculado no servidor: só as contagens por intervalo são enviadas
+                resumo = st.toggle("Mostrar resumo (quartis) sobre o histograma", value=True,
+                                   key=f"resumo_hist_{categoria_nome}")
+
+                def construir_histograma():
+                    fig_hist = graficos.histograma(df_filtrado, vars, nbins=15, resumo=resumo)
+                    fig_hist.update_layout(
+                        legend_title='Indicadores',
+                        hovermode="x unified",  # Mostra todos os valores ao passar o mouse
+                        height=500
+                    )
+                    return fig_hist
+
+                with medir.etapa('histograma', cache=True, aba=categoria_nome, linhas=df_filtrado[vars].size) as etapa:
+                    fig_hist = graficos.figura_em_cache(vista + ('histograma', resumo), construir_histograma)
+                    if painel_desempenho:
+                        etapa['bytes'] = medicao.json_bytes(fig_hist)
                 st.plotly_chart(fig_hist, use_container_width=True, key=f"graph_hist_{categoria_nome}")
 
                 # --- Área de Dados e Download ---
-                st.subheader("Dados Detalhados")
+                st.subheader(f"Dados Detalhados ({resolucao})")
                 col1, col2 = st.columns([3, 1])
 
                 with col1:
@@ -158,38 +288,50 @@ if not df_raw.empty:
                 with col2:
                     st.write("📥 **Exportar Dados**")
 
-                    # Converter para CSV
-                    csv = df_filtrado[vars].to_csv().encode('utf-8')
+                    # Os ficheiros só são gerados no clique e ficam memorizados por seleção
+                    chave = exportar.fingerprint(versao_dados, versao_categorias, categoria_nome, resolucao, vars,
+                                                 df_filtrado.index.min(), df_filtrado.index.max())
                     st.download_button(
                         label="Baixar CSV",
-                        data=csv,
+                        data=exportar.gerador(df_filtrado[vars], 'csv', chave),
                         file_name=f'mozdados_{categoria_nome}.csv',
-                        mime='text/csv',
+                        mime=exportar.FORMATOS['csv'],
+                        on_click="ignore",
                         key=f"dl_csv_{categoria_nome}"
                     )
-
-                    # Converter para Excel
-                    buffer = BytesIO()
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        df_filtrado[vars].to_excel(writer, sheet_name='Dados')
-
                     st.download_button(
                         label="Baixar Excel",
-                        data=buffer,
+                        data=exportar.gerador(df_filtrado[vars], 'xlsx', chave),
                         file_name=f'mozdados_{categoria_nome}.xlsx',
-                        mime='application/vnd.ms-excel',
+                        mime=exportar.FORMATOS['xlsx'],
+                        on_click="ignore",
                         key=f"dl_excel_{categoria_nome}"
                     )
+                    st.download_button(
+                        label="Baixar Parquet",
+                        data=exportar.gerador(df_filtrado[vars], 'parquet', chave),
+                        file_name=f'mozdados_{categoria_nome}.parquet',
+                        mime=exportar.FORMATOS['parquet'],
+                        on_click="ignore",
+                        key=f"dl_parquet_{categoria_nome}"
+                    )
             else:
                 st.info("Por favor, selecione pelo menos uma variável acima para visualizar.")
 
 
-    # Renderiza as abas (Como não sei quais colunas são de qual categoria,
-    # deixei genérico, mas você pode passar listas de colunas específicas)
-    criar_dashboard_aba(tab1, df, "Saúde")
-    criar_dashboard_aba(tab2, df, "Educação")
-    criar_dashboard_aba(tab3, df, "Finanças")
-    criar_dashboard_aba(tab4, df, "Banca")
+    # Renderiza as abas; as colunas de cada uma vêm de dados/categorias.csv
+    criar_dashboard_aba(tab1, "Saúde")
+    criar_dashboard_aba(tab2, "Educação")
+    criar_dashboard_aba(tab3, "Finanças")
+    criar_dashboard_aba(tab4, "Banca")
 
 else:
-    st.warning("Aguardando carregamento da base de dados.")
\ No newline at end of file
+    st.warning("Aguardando carregamento da base de dados.")
+
+# Painel de desempenho (só com ?desempenho=1 ou MOZDADOS_DESEMPENHO=1)
+if painel_desempenho:
+    medicao.mostrar_painel(medir)
+
+# Contadores das caches e botão para as esvaziar (só com ?admin=<MOZDADOS_ADMIN_TOKEN>)
+if admin:
+    caches.mostrar_admin()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather as feather_io
+
+# ------------------ Armazenamento colunar da base dados/database.xlsx ------------------
+# O Excel é convertido uma vez para Arrow/Feather (colunar, lido por memory mapping) com tipos
+# compactos. A cópia só é refeita quando o ficheiro original muda (data de modificação,
+# tamanho e, em caso de dúvida, o hash do conteúdo), por isso o arranque não volta a
+# passar pelo openpyxl e uma folha atualizada é usada sem reiniciar o servidor.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONTE = os.path.join(BASE_DIR, 'dados', 'database.xlsx')
+CACHE_DIR = os.environ.get('MOZDADOS_CACHE_DIR', os.path.join(BASE_DIR, 'dados', 'cache'))
+
+
+def _caminhos(fonte):
+    nome = os.path.splitext(os.path.basename(fonte))[0]
+    return os.path.join(CACHE_DIR, f'{nome}.feather'), os.path.join(CACHE_DIR, f'{nome}.json')
+
+
+def _hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _ler_meta(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_atomico(path, escrever):
+    temporario = f'{path}.{os.getpid()}.tmp'
+    escrever(temporario)
+    os.replace(temporario, path)
+
+
+def _gravar_meta(path, meta):
+    def escrever(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    _gravar_atomico(path, escrever)
+
+
+def compactar(df):
+    # float64 -> float32 só quando não há perda de precisão. A conversão é feita de uma vez e o
+    # resultado consolidado (o read_excel devolve um bloco por coluna, o que fragmenta o DataFrame
+    # e torna lento o reset_index/insert quando há centenas de colunas)
+    reduzir = {}
+    for col in df.select_dtypes('float64').columns:
+        valores = df[col].to_numpy()
+        if np.array_equal(valores.astype('float32').astype('float64'), valores, equal_nan=True):
+            reduzir[col] = 'float32'
+    return df.astype(reduzir).copy()
+
+
+def ler_excel(fonte=FONTE):
+    df = pd.read_excel(fonte)
+
+    # Tratamento da coluna de data
+    # Verifica se existe coluna 'Mês', senão usa o índice
+    if 'Mês' in df.columns:
+        df.set_index('Mês', inplace=True)
+
+    df.index = pd.to_datetime(df.index)
+    df.index.name = df.index.name or 'Mês'
+    return compactar(df.sort_index())
+
+
+def versao(fonte=FONTE):
+    # Identificador barato (um stat) que muda sempre que o ficheiro original muda; None se não existir
+    try:
+        info = os.stat(fonte)
+    except FileNotFoundError:
+        return None
+    return f'{info.st_mtime_ns}-{info.st_size}'
+
+
+def atualizar(fonte=FONTE, forcar=False):
+    # Garante que a cópia colunar corresponde ao Excel atual; devolve (caminho, metadados)
+    atual = versao(fonte)
+    if atual is None:
+        raise FileNotFoundError(fonte)
+    feather, meta_path = _caminhos(fonte)
+    meta = _ler_meta(meta_path)
+    existe = os.path.exists(feather) and 'colunas' in meta and not forcar
+
+    if existe and meta.get('versao') != atual and meta.get('sha1') == _hash(fonte):
+        # Só a data de modificação mudou (ex.: ficheiro copiado); o conteúdo é o mesmo
+        meta['versao'] = atual
+        _gravar_meta(meta_path, meta)
+
+    if existe and meta.get('versao') == atual:
+        return feather, meta
+
+    df = ler_excel(fonte)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _gravar_atomico(feather, lambda tmp: df.reset_index().to_feather(tmp, compression='uncompressed'))
+    meta = {'versao': atual, 'sha1': _hash(fonte), 'indice': df.index.name, 'colunas': list(df.columns)}
+    _gravar_meta(meta_path, meta)
+    return feather, meta
+
+
+def colunas(fonte=FONTE):
+    return atualizar(fonte)[1]['colunas']
+
+
+def carregar(fonte=FONTE, colunas=None):
+    # colunas=None lê tudo; uma lista lê só essas colunas (o formato colunar evita ler as outras)
+    for tentativa in range(2):
+        feather, meta = atualizar(fonte, forcar=tentativa > 0)
+        ler = None
+        if colunas is not None:
+            ler = [meta['indice']] + [c for c in colunas if c in meta['colunas']]
+        try:
+            df = feather_io.read_table(feather, columns=ler, memory_map=True).to_pandas()
+            return df.set_index(meta['indice'])
+        except (FileNotFoundError, pa.ArrowInvalid):
+            if tentativa:
+                raise
+            # cópia apagada ou corrompida: reconstrói e tenta de novo
+
+
+def fatiar(df, inicio=None, fim=None):
+    # Linhas entre duas datas (inclusive); None deixa esse extremo em aberto
+    return df.loc[slice(inicio, fim)]
+
+
+# ------------------ Categorias dos indicadores ------------------
+# dados/categorias.csv associa cada coluna da base (indicador) a uma aba do app.py e, numa
+# coluna opcional, diz como os meses se juntam em trimestres e anos (soma, media ou ultimo):
+#     indicador,categoria,agregacao
+#     Inflação,Finanças,soma
+#     Depósitos,Banca,ultimo
+
+CATEGORIAS = os.path.join(BASE_DIR, 'dados', 'categorias.csv')
+
+
+def carregar_categorias(path=CATEGORIAS):
+    # Devolve {categoria: [indicadores]} pela ordem do ficheiro; {} se o ficheiro não existir
+    if not os.path.exists(path):
+        return {}
+    # A coluna opcional `agregacao` pode estar vazia: só indicador e categoria são obrigatórios
+    mapa = pd.read_csv(path, dtype=str, encoding='utf-8').dropna(subset=['indicador', 'categoria'])
+    categorias = {}
+    for indicador, categoria in mapa[['indicador', 'categoria']].itertuples(index=False):
+        categorias.setdefault(categoria.strip(), []).append(indicador.strip())
+    return categorias
+
+
+def carregar_agregacoes(path=CATEGORIAS):
+    # Devolve {indicador: 'soma' | 'media' | 'ultimo'} só para os indicadores com agregação indicada
+    if not os.path.exists(path):
+        return {}
+    mapa = pd.read_csv(path, dtype=str, encoding='utf-8')
+    if 'agregacao' not in mapa.columns:
+        return {}
+    mapa = mapa.dropna(subset=['indicador', 'agregacao'])
+    agregacoes = {}
+    for indicador, agregacao in mapa[['indicador', 'agregacao']].itertuples(index=False):
+        agregacao = SINONIMOS_AGREGACAO.get(agregacao.strip().lower())
+        if agregacao:
+            agregacoes[indicador.strip()] = agregacao
+    return agregacoes
+
+
+# ------------------ Pirâmide de resoluções (mensal, trimestral, anual) ------------------
+# Os dados mensais são reamostrados uma vez para trimestres e anos, com a agregação de cada
+# indicador (AGREGACAO_PADRAO quando não está indicada). Cada período fica com a data do seu início.
+# O app.py escolhe a resolução pelo intervalo selecionado, para que um intervalo longo seja
+# desenhado com algumas dezenas de pontos em vez do histórico mensal completo.
+
+RESOLUCOES = {'Mensal': None, 'Trimestral': 'QS', 'Anual': 'YS'}
+PERIODOS = {'Mensal': 'M', 'Trimestral': 'Q', 'Anual': 'Y'}
+AGREGACAO_PADRAO = 'media'
+SINONIMOS_AGREGACAO = {'soma': 'soma', 'sum': 'soma', 'media': 'media', 'média': 'media', 'mean': 'media',
+                       'ultimo': 'ultimo', 'último': 'ultimo', 'last': 'ultimo'}
+MAX_PONTOS = 60  # pontos por série a partir dos quais a resolução automática passa à seguinte
+
+
+def reamostrar(df, regra, agregacoes=None):
+    # Colunas agrupadas pela agregação: uma chamada ao resample por função em vez de uma por coluna
+    agregacoes = agregacoes or {}
+    por_funcao = {}
+    for col in df.columns:
+        por_funcao.setdefault(agregacoes.get(col, AGREGACAO_PADRAO), []).append(col)
+    periodos = df.resample(regra)
+    partes = []
+    for funcao, cols in por_funcao.items():
+        if funcao == 'soma':
+            # Períodos sem nenhum valor ficam vazios (NaN) e não a zero
+            partes.append(periodos[cols].sum(min_count=1))
+        elif funcao == 'ultimo':
+            partes.append(periodos[cols].last())
+        else:
+            partes.append(periodos[cols].mean())
+    if not partes:
+        return periodos.size().to_frame().iloc[:, :0]
+    return pd.concat(partes, axis=1)[list(df.columns)]
+
+
+def piramide(df, agregacoes=None):
+    # {resolução: DataFrame}; a mensal é o próprio df
+    return {nome: df if regra is None else reamostrar(df, regra, agregacoes) for nome, regra in RESOLUCOES.items()}
+
+
+def resolucao_automatica(inicio, fim, max_pontos=MAX_PONTOS):
+    # Resolução mais fina que não passa de max_pontos períodos no intervalo
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    meses = (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    if meses <= max_pontos:
+        return 'Mensal'
+    if meses / 3 <= max_pontos:
+        return 'Trimestral'
+    return 'Anual'
+
+
+def fatiar_resolucao(df, resolucao, inicio=None, fim=None):
+    # Como fatiar(), mas o início recua ao começo do seu trimestre/ano: o período que contém a
+    # data de início entra inteiro
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio).to_period(PERIODOS[resolucao]).start_time
+    return fatiar(df, inicio, fim)
@@ -0,0 +1,277 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import basedados
+import exportar
+import graficos
+import medicao
+import wbcache
+import wbdados
+import wbfetch
+import wbstub
+import wdi
+from kpis import calcular_kpis, calcular_kpis_largo
+
+# ------------------ Benchmark do pipeline carregar -> transformar -> KPI -> gráfico -> exportar ------------------
+# Mede cada etapa em separado (tempo e pico de memória) com dados sintéticos de tamanho crescente:
+#   - app.py: séries mensais com 10 a 1000 colunas, lidas de um Excel gerado para o efeito
+#   - wbapp.py: tabelas largas do Banco Mundial (1-200 economias x 1-50 séries x 65 anos),
+#     servidas pela API simulada do wbstub e pela cópia local do WDI (wdi.py)
+# O resultado sai em JSON para ser guardado e comparado entre commits:
+#
+#     python benchmark.py --saida antes.json
+#     python benchmark.py --saida depois.json --comparar antes.json
+
+COLUNAS_APP = [10, 100, 1000]
+MESES = 240
+ESCALAS_WB = [(1, 1), (10, 5), (50, 20), (200, 50)]
+ANOS_WB = (1960, 2024)
+REPETICOES = 3
+SERIES_GRAFICO = 1000  # acima disto o px.line leva minutos e nenhum utilizador lê o gráfico
+TOLERANCIA = 1.25  # etapa mais lenta do que 1.25x a referência conta como regressão
+
+
+def _log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def medir(funcao, repeticoes=REPETICOES):
+    # Melhor tempo e mediana de `repeticoes` execuções; o pico de memória vem de uma execução
+    # extra com tracemalloc (que abranda o código e por isso não entra nos tempos)
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    medida = {'segundos': round(min(tempos), 6), 'mediana_segundos': round(statistics.median(tempos), 6),
+              'pico_mb': round(pico / 2 ** 20, 3), 'repeticoes': repeticoes}
+    return resultado, medida
+
+
+class Registo:
+    def __init__(self):
+        self.resultados = []
+
+    def etapa(self, painel, escala, etapa, funcao, repeticoes=REPETICOES, extra=None):
+        resultado, medida = medir(funcao, repeticoes)
+        linha = {'painel': painel, 'escala': escala, 'etapa': etapa, **medida}
+        if extra:
+            linha.update(extra(resultado))
+        self.resultados.append(linha)
+        _log(f"{painel:5} {escala:28} {etapa:16} {medida['segundos'] * 1000:10.1f} ms {medida['pico_mb']:9.1f} MB")
+        return resultado
+
+
+def _bytes(conteudo):
+    return {'bytes': len(conteudo)}
+
+
+def _exportar(df, formato):
+    # Chave nova a cada chamada para medir a geração e não a memória do exportar
+    return lambda: exportar.preparar(df, formato, ('benchmark', time.perf_counter_ns()))
+
+
+# ------------------ app.py ------------------
+
+def dados_mensais(colunas, meses=MESES, semente=0):
+    rng = np.random.default_rng(semente)
+    indice = pd.date_range('2000-01-01', periods=meses, freq='MS', name='Mês')
+    valores = 100 + rng.standard_normal((meses, colunas)).cumsum(axis=0)
+    valores[rng.random(valores.shape) < 0.02] = np.nan
+    return pd.DataFrame(valores, index=indice, columns=[f'Indicador {i:04d}' for i in range(colunas)])
+
+
+def benchmark_app(registo, colunas, pasta, repeticoes):
+    escala = f'{colunas} colunas x {MESES} meses'
+    fonte = os.path.join(pasta, f'database_{colunas}.xlsx')
+    dados_mensais(colunas).to_excel(fonte)
+
+    registo.etapa('app', escala, 'excel', lambda: basedados.ler_excel(fonte), repeticoes=1)
+    basedados.atualizar(fonte)
+    df = registo.etapa('app', escala, 'colunar', lambda: basedados.carregar(fonte), repeticoes)
+    registo.etapa('app', escala, 'piramide', lambda: basedados.piramide(df), repeticoes,
+                  extra=lambda r: {'linhas': {nome: len(nivel) for nome, nivel in r.items()}})
+
+    inicio, fim = df.index[len(df) // 4], df.index[3 * len(df) // 4]
+    df = registo.etapa('app', escala, 'fatiar', lambda: basedados.fatiar(df, inicio, fim), repeticoes,
+                       extra=lambda r: {'linhas': len(r)})
+    cols = list(df.columns)
+
+    longo = registo.etapa('app', escala, 'melt',
+                          lambda: df.rename_axis('Período').reset_index()
+                          .melt(id_vars='Período', var_name='Indicador', value_name='Valor'), repeticoes,
+                          extra=lambda r: {'linhas': len(r)})
+    registo.etapa('app', escala, 'kpis', lambda: calcular_kpis_largo(df, cols), repeticoes)
+    reduzido = registo.etapa('app', escala, 'reduzir',
+                             lambda: graficos.reduzir(longo, 'Período', 'Valor', grupo='Indicador'), repeticoes,
+                             extra=lambda r: {'pontos': len(r)})
+    fig = registo.etapa('app', escala, 'figura',
+                        lambda: px.line(reduzido, x='Período', y='Valor', color='Indicador', markers=True,
+                                        template='plotly_white', render_mode=graficos.modo_render(reduzido)),
+                        repeticoes)
+    registo.etapa('app', escala, 'figura_json', fig.to_json, repeticoes, extra=lambda r: {'bytes': len(r)})
+    registo.etapa('app', escala, 'histograma', lambda: graficos.histograma(df, cols).to_json(), repeticoes,
+                  extra=lambda r: {'bytes': len(r)})
+    registo.etapa('app', escala, 'csv', _exportar(df, 'csv'), repeticoes, extra=_bytes)
+    registo.etapa('app', escala, 'xlsx', _exportar(df, 'xlsx'), repeticoes=1, extra=_bytes)
+
+
+# ------------------ wbapp.py ------------------
+
+def benchmark_wb(registo, economias, series, endpoint, pasta, repeticoes):
+    escala = f'{economias} economias x {series} séries'
+    c_lis = [f'E{i:03d}' for i in range(economias)]
+    i_lis = [f'S.{i:03d}' for i in range(series)]
+    inicio, fim = ANOS_WB
+
+    def buscar(s, e, anos):
+        return wbfetch.fetch_chunked(s, e, anos, endpoint=endpoint)
+
+    def fria():
+        path = os.path.join(pasta, f'wb_{time.perf_counter_ns()}.sqlite')
+        return wbcache.get_data(i_lis, c_lis, inicio, fim, fetcher=buscar, path=path)
+
+    quente = os.path.join(pasta, f'wb_{economias}_{series}.sqlite')
+    wbcache.get_data(i_lis, c_lis, inicio, fim, fetcher=buscar, path=quente)
+
+    registo.etapa('wb', escala, 'api_fria', fria, repeticoes=1, extra=lambda r: {'celulas': int(r.size)})
+    df = registo.etapa('wb', escala, 'cache_sqlite',
+                       lambda: wbcache.get_data(i_lis, c_lis, inicio, fim, fetcher=buscar, path=quente), repeticoes)
+    df_long = registo.etapa('wb', escala, 'melt', lambda: wbdados.formato_longo(df, i_lis, i_lis, c_lis, c_lis),
+                            repeticoes, extra=lambda r: {'linhas': len(r), 'mb': round(
+                                r.memory_usage(deep=True).sum() / 2 ** 20, 3)})
+    registo.etapa('wb', escala, 'kpis', lambda: calcular_kpis(df_long, ['País', 'Indicador'], 'Ano'), repeticoes)
+    # O gráfico usa no máximo SERIES_GRAFICO séries (país, indicador); o número vai no resultado
+    no_grafico = df_long[df_long['País'].isin(c_lis[:max(1, SERIES_GRAFICO // series)])]
+    figuras = registo.etapa('wb', escala, 'figura',
+                            lambda: wbdados.figuras(wbdados.dados_grafico(no_grafico, i_lis), i_lis), repeticoes,
+                            extra=lambda r: {'series': len(r[0].data)})
+    registo.etapa('wb', escala, 'figura_json', lambda: [f.to_json() for f in figuras], repeticoes,
+                  extra=lambda r: {'bytes': sum(map(len, r))})
+    registo.etapa('wb', escala, 'csv', _exportar(df_long, 'csv'), repeticoes, extra=_bytes)
+    registo.etapa('wb', escala, 'xlsx', _exportar(df_long, 'xlsx'), repeticoes=1, extra=_bytes)
+
+    # Mesmos valores servidos pela cópia local do WDI (wdi.py), a partir de um CSV no formato da descarga
+    fonte = os.path.join(pasta, f'WDICSV_{economias}_{series}.csv')
+    wdi_csv(df).to_csv(fonte, index=False)
+    destino = os.path.join(pasta, f'wdi_{economias}_{series}')
+    registo.etapa('wb', escala, 'wdi_ingestao', lambda: wdi.ingerir(fonte, destino), repeticoes=1,
+                  extra=lambda r: {'linhas': r['linhas']})
+    registo.etapa('wb', escala, 'wdi_consulta', lambda: wdi.get_data(i_lis, c_lis, inicio, fim, path=destino),
+                  repeticoes, extra=lambda r: {'celulas': int(r.size)})
+
+
+def wdi_csv(wide):
+    # Tabela larga (economy, series) x YRxxxx -> colunas do WDICSV.csv do Banco Mundial
+    csv = wide.rename(columns=lambda c: c.replace('YR', '')).reset_index()
+    csv.insert(0, 'Country Name', csv['economy'])
+    csv.insert(2, 'Indicator Name', csv['series'])
+    return csv.rename(columns={'economy': 'Country Code', 'series': 'Indicator Code'})
+
+
+# ------------------ Execução e comparação ------------------
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def executar(colunas_app=COLUNAS_APP, escalas_wb=ESCALAS_WB, repeticoes=REPETICOES):
+    registo = Registo()
+    with tempfile.TemporaryDirectory() as pasta:
+        # As cópias colunares do benchmark ficam na pasta temporária, não em dados/cache
+        cache_original, basedados.CACHE_DIR = basedados.CACHE_DIR, pasta
+        # As linhas de desempenho do exportar.preparar iam misturar-se com a tabela do benchmark
+        medicao.logger.disabled = True
+        servidor, endpoint = wbstub.iniciar()
+        try:
+            for colunas in colunas_app:
+                benchmark_app(registo, colunas, pasta, repeticoes)
+            for economias, series in escalas_wb:
+                benchmark_wb(registo, economias, series, endpoint, pasta, repeticoes)
+        finally:
+            servidor.shutdown()
+            basedados.CACHE_DIR = cache_original
+            medicao.logger.disabled = False
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'repeticoes': repeticoes,
+        },
+        'resultados': registo.resultados,
+    }
+
+
+def comparar(atual, referencia, tolerancia=TOLERANCIA):
+    # Razão tempo atual / referência por (painel, escala, etapa); devolve as regressões
+    anteriores = {(r['painel'], r['escala'], r['etapa']): r for r in referencia['resultados']}
+    regressoes = []
+    _log(f"\nComparação com {referencia['meta'].get('commit')} (razão > {tolerancia} = regressão)")
+    for r in atual['resultados']:
+        antes = anteriores.get((r['painel'], r['escala'], r['etapa']))
+        if not antes or not antes['segundos']:
+            continue
+        razao = r['segundos'] / antes['segundos']
+        marca = '  <-- regressão' if razao > tolerancia else ''
+        _log(f"{r['painel']:5} {r['escala']:28} {r['etapa']:16} {razao:6.2f}x{marca}")
+        if razao > tolerancia:
+            regressoes.append({**r, 'referencia_segundos': antes['segundos'], 'razao': round(razao, 3)})
+    return regressoes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline dos dashboards Mozdados')
+    parser.add_argument('--saida', help='ficheiro JSON para os resultados (por defeito stdout)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--rapido', action='store_true', help='só as escalas pequenas')
+    args = parser.parse_args()
+
+    colunas_app = COLUNAS_APP[:2] if args.rapido else COLUNAS_APP
+    escalas_wb = ESCALAS_WB[:2] if args.rapido else ESCALAS_WB
+    resultado = executar(colunas_app, escalas_wb, args.repeticoes)
+
+    regressoes = []
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        resultado['regressoes'] = regressoes
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=1)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+    sys.exit(1 if regressoes else 0)
@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import hmac
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# ------------------ Caches em memória com limites ------------------
+# Substitui o @st.cache_data sem limites: cada função decorada com @em_cache tem o seu TTL,
+# número máximo de entradas e orçamento de bytes, com despejo LRU (a entrada usada há mais tempo
+# sai primeiro) quando um dos limites é ultrapassado. Cada cache conta acertos, falhas, despejos,
+# expirações e bytes residentes. Os valores são partilhados entre sessões e devolvidos sem cópia:
+# quem os usa não os altera.
+#
+# Um administrador pode ver os contadores e esvaziar uma cache sem reiniciar o servidor abrindo
+# o dashboard com ?admin=<MOZDADOS_ADMIN_TOKEN> (ver mostrar_admin).
+
+ADMIN_TOKEN = os.environ.get('MOZDADOS_ADMIN_TOKEN', '')
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def tamanho(valor):
+    # Bytes ocupados por um valor: exato para DataFrames e bytes, aproximado (pickle) no resto.
+    # Para objetos grandes que não são DataFrames (ex.: o catálogo de indicadores) quem guarda
+    # deve passar o tamanho (`medir` no em_cache / obter_ou_calcular) para evitar a serialização
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(valor, pd.DataFrame) else uso)
+    if isinstance(valor, pd.Index):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, str):
+        return len(valor.encode('utf-8'))
+    if isinstance(valor, dict) and any(isinstance(v, (pd.DataFrame, pd.Series)) for v in valor.values()):
+        # Ex.: pirâmide de resoluções {nome: DataFrame}; evita serializar os DataFrames
+        return sum(tamanho(k) + tamanho(v) for k, v in valor.items())
+    try:
+        return len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(valor)
+
+
+class Cache:
+    def __init__(self, nome, ttl=None, max_entradas=None, max_bytes=None):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # chave -> (valor, bytes, criado_em)
+        self._lock = threading.Lock()
+        self._calculando = {}  # chave -> Lock: pedidos simultâneos da mesma chave calculam uma só vez
+        self.bytes = 0
+        self.acertos = self.falhas = self.despejos = self.expiradas = 0
+
+    def _remover(self, chave):
+        self.bytes -= self._entradas.pop(chave)[1]
+
+    def obter(self, chave):
+        # Devolve (encontrado, valor)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and self.ttl is not None and time.time() - entrada[2] > self.ttl:
+                self._remover(chave)
+                self.expiradas += 1
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return False, None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return True, entrada[0]
+
+    def guardar(self, chave, valor, nbytes=None):
+        nbytes = tamanho(valor) if nbytes is None else nbytes
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (valor, nbytes, time.time())
+            self.bytes += nbytes
+            # A entrada acabada de guardar fica sempre, mesmo que sozinha ultrapasse max_bytes
+            while len(self._entradas) > 1 and (
+                    (self.max_entradas is not None and len(self._entradas) > self.max_entradas)
+                    or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self._remover(next(iter(self._entradas)))
+                self.despejos += 1
+
+    def obter_ou_calcular(self, chave, calcular, medir=None):
+        # `medir(valor)` dá os bytes de valores que tamanho() não sabe medir bem (ex.: figuras)
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        with self._lock:
+            calculo = self._calculando.setdefault(chave, threading.Lock())
+        with calculo:
+            # Outra sessão pode ter calculado o valor enquanto esta esperava
+            with self._lock:
+                entrada = self._entradas.get(chave)
+            if entrada is not None:
+                return entrada[0]
+            try:
+                valor = calcular()
+                self.guardar(chave, valor, None if medir is None else medir(valor))
+            finally:
+                with self._lock:
+                    self._calculando.pop(chave, None)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            pedidos = self.acertos + self.falhas
+            return {
+                'cache': self.nome,
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_s': self.ttl,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / pedidos, 3) if pedidos else None,
+                'despejos': self.despejos,
+                'expiradas': self.expiradas,
+            }
+
+
+def obter_cache(nome, ttl=None, max_entradas=None, max_bytes=None):
+    # O Streamlit volta a correr o script (e os decoradores) a cada rerun: a cache com o mesmo
+    # nome é reaproveitada, só os limites são atualizados
+    with _caches_lock:
+        c = _caches.get(nome)
+        if c is None:
+            c = _caches[nome] = Cache(nome, ttl, max_entradas, max_bytes)
+        else:
+            c.ttl, c.max_entradas, c.max_bytes = ttl, max_entradas, max_bytes
+    return c
+
+
+def _chave(args, kwargs):
+    chave = (args, tuple(sorted(kwargs.items())))
+    try:
+        hash(chave)
+        return chave
+    except TypeError:
+        # Argumentos não hasheáveis (listas, dicts): impressão digital do repr
+        return hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()
+
+
+def em_cache(nome=None, ttl=None, max_entradas=None, max_bytes=None, medir=None):
+    # Decorador: memoriza o resultado pela combinação dos argumentos. As exceções não ficam
+    # em cache, o próximo pedido volta a tentar. `medir(valor)` dá os bytes do resultado.
+    def decorador(funcao):
+        c = obter_cache(nome or funcao.__name__, ttl, max_entradas, max_bytes)
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            return c.obter_ou_calcular(_chave(args, kwargs), lambda: funcao(*args, **kwargs), medir)
+
+        envolvida.cache = c
+        envolvida.limpar = c.limpar
+        return envolvida
+    return decorador
+
+
+def limpar(nome=None):
+    # Esvazia uma cache pelo nome, ou todas; os contadores mantêm-se
+    with _caches_lock:
+        alvo = list(_caches.values()) if nome is None else [_caches[nome]]
+    for c in alvo:
+        c.limpar()
+
+
+def estatisticas():
+    with _caches_lock:
+        todas = list(_caches.values())
+    colunas = ['cache', 'entradas', 'max_entradas', 'bytes', 'max_bytes', 'ttl_s', 'acertos', 'falhas',
+               'taxa_acerto', 'despejos', 'expiradas']
+    return pd.DataFrame([c.estatisticas() for c in todas], columns=colunas)
+
+
+def admin_ativo(query_params=None):
+    if not ADMIN_TOKEN or query_params is None:
+        return False
+    return hmac.compare_digest(str(query_params.get('admin', '')).encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+def mostrar_admin():
+    import streamlit as st
+
+    with st.sidebar.expander('🗄️ Caches (admin)', expanded=True):
+        with _caches_lock:
+            nomes = sorted(_caches)
+        escolhida = st.selectbox('Cache a esvaziar', ['Todas'] + nomes, key='_admin_cache')
+        if st.button('Esvaziar', key='_admin_limpar'):
+            limpar(None if escolhida == 'Todas' else escolhida)
+            st.toast(f'Cache esvaziada: {escolhida}')
+        st.dataframe(estatisticas(), hide_index=True, use_container_width=True)
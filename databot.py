@@ -0,0 +1,269 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import intencoes
+from kpis import calcular_kpis
+from wbcatalog import normalizar
+
+# ------------------ Contexto e sessão de conversa do DataBot ------------------
+# Em vez de enviar todos os valores, anos e nomes da seleção, o contexto resume cada série
+# (país, indicador) em poucos números — primeiro/último valor, mínimo, máximo, tendência — e
+# escolhe o nível de detalhe que cabe num orçamento de tokens. A conversa com o modelo é
+# criada uma vez por utilizador e só volta a ser semeada quando os dados mudam de facto.
+
+TOKENS_CONTEXTO = int(os.environ.get('MOZDADOS_TOKENS_CONTEXTO', 1500))
+CARACTERES_POR_TOKEN = 4
+TURNOS_MANTIDOS = 6
+MAX_RESPOSTAS = 256
+
+INSTRUCOES = """Você é o Databot. Explique indicadores económicos, traduza nomes em inglês e utilize todos os recursos disponiveis na internet, livros,
+modelos, jornais, etc para explicar e esclarecer o que lhe for pedido. Seja criativo quando não tiver informação.
+Quando o utilizador precisar de dica de como encontrar um indicador (por exemplo: como encontro a inflação?), responda:
+comece a escrever na pesquisa de indicadores (Inflation, inflação, ...) e selecione o seu indicador. A pesquisa aceita
+português e inglês (PIB ou GDP) e pode ser filtrada por tópico.
+Indicadores selecionados: {indicadores}
+Países selecionados: {paises}
+Resumo dos dados ({nivel}), uma série por linha:
+{series}"""
+
+CONFIRMACAO = "Entendido. Estou pronto para analisar os novos dados."
+
+
+def estimar_tokens(texto):
+    # Estimativa barata (~4 caracteres por token), suficiente para respeitar o orçamento
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def impressao_digital(df_long):
+    # Muda sempre que muda algum país, indicador, ano ou valor da seleção
+    hashes = pd.util.hash_pandas_object(df_long, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _num(valor):
+    return '-' if pd.isna(valor) else f'{valor:.4g}'
+
+
+def resumo_series(df_long, grupos=('País', 'Indicador'), tempo='Ano', valor='Valor'):
+    # Uma linha por série com início, fim, extremos e tendência (CAGR e variação do último período)
+    grupos = list(grupos)
+    kpis = calcular_kpis(df_long, grupos, tempo, valor)
+    dados = df_long[grupos + [tempo, valor]].dropna(subset=[valor])
+    if dados.empty:
+        return kpis.assign(inicio=np.nan, periodo_inicio=np.nan, minimo=np.nan, periodo_minimo=np.nan,
+                           maximo=np.nan, periodo_maximo=np.nan)
+
+    g = dados.sort_values(grupos + [tempo]).groupby(grupos, sort=False, observed=True)
+    primeiro = g.head(1).set_index(grupos)
+    minimos = dados.loc[g[valor].idxmin()].set_index(grupos)
+    maximos = dados.loc[g[valor].idxmax()].set_index(grupos)
+
+    kpis['inicio'] = primeiro[valor].reindex(kpis.index)
+    kpis['periodo_inicio'] = primeiro[tempo].reindex(kpis.index)
+    kpis['minimo'] = minimos[valor].reindex(kpis.index)
+    kpis['periodo_minimo'] = minimos[tempo].reindex(kpis.index)
+    kpis['maximo'] = maximos[valor].reindex(kpis.index)
+    kpis['periodo_maximo'] = maximos[tempo].reindex(kpis.index)
+    return kpis
+
+
+def _nome(chave):
+    return ' · '.join(map(str, chave)) if isinstance(chave, tuple) else str(chave)
+
+
+def _linha_curta(chave, s):
+    seta = '↑' if s['atual'] > s['inicio'] else '↓' if s['atual'] < s['inicio'] else '→'
+    return f"{_nome(chave)}: último {_num(s['atual'])} ({s['periodo_atual']}) {seta}"
+
+
+def _linha_resumo(chave, s):
+    linha = (f"{_nome(chave)}: {s['periodo_inicio']}–{s['periodo_atual']}, {s['observacoes']} obs; "
+             f"início {_num(s['inicio'])}; último {_num(s['atual'])}; "
+             f"mín {_num(s['minimo'])} ({s['periodo_minimo']}); máx {_num(s['maximo'])} ({s['periodo_maximo']})")
+    if pd.notna(s['cagr']):
+        linha += f"; CAGR {s['cagr']:.2f}%/ano"
+    if pd.notna(s['variacao']):
+        linha += f"; variação {s['periodo_anterior']}→{s['periodo_atual']} {s['variacao']:.1f}%"
+    return linha
+
+
+def _tabela(df_long, grupos, tempo, valor):
+    # Valores por série em texto compacto ("ano: valor"), usado só quando cabe no orçamento
+    tabela = {}
+    dados = df_long[list(grupos) + [tempo, valor]].dropna(subset=[valor]).sort_values(tempo)
+    for chave, serie in dados.groupby(list(grupos), sort=False, observed=True):
+        tabela[chave] = ', '.join(f'{t}: {_num(v)}' for t, v in zip(serie[tempo], serie[valor]))
+    return tabela
+
+
+def construir_contexto(df_long, orcamento=None, grupos=('País', 'Indicador'), tempo='Ano', valor='Valor'):
+    # Devolve a instrução de sistema com o nível de detalhe mais rico que cabe em `orcamento` tokens:
+    # tabela completa > resumo por série > linha curta por série > linhas curtas truncadas
+    orcamento = orcamento or TOKENS_CONTEXTO
+    grupos = list(grupos)
+    resumo = resumo_series(df_long, grupos, tempo, valor)
+    base = dict(indicadores=list(df_long['Indicador'].unique()), paises=list(df_long['País'].unique()))
+
+    def montar(nivel, linhas):
+        return INSTRUCOES.format(nivel=nivel, series='\n'.join(linhas) or '(sem valores)', **base)
+
+    # to_dict mantém o tipo de cada coluna (iterrows converteria os anos para float)
+    series = resumo.to_dict('index')
+    resumos = [_linha_resumo(chave, s) for chave, s in series.items()]
+    curtas = [_linha_curta(chave, s) for chave, s in series.items()]
+
+    # A tabela só é montada se o resumo já deixar espaço para ela
+    if estimar_tokens(montar('resumo', resumos)) * 2 < orcamento:
+        tabela = _tabela(df_long, grupos, tempo, valor)
+        linhas = [f'{r}\n  valores: {tabela.get(chave, "")}' for r, chave in zip(resumos, resumo.index)]
+        candidatos = [('valores por ano', linhas)]
+    else:
+        candidatos = []
+    candidatos += [('resumo por série', resumos), ('último valor e tendência', curtas)]
+
+    for nivel, linhas in candidatos:
+        texto = montar(nivel, linhas)
+        if estimar_tokens(texto) <= orcamento:
+            return texto
+
+    # Nem as linhas curtas cabem: mantém as primeiras séries e indica quantas ficaram de fora
+    restante = orcamento - estimar_tokens(montar('último valor e tendência', []))
+    incluidas = []
+    for linha in curtas:
+        custo = estimar_tokens(linha) + 1
+        if custo > restante - 10:
+            break
+        incluidas.append(linha)
+        restante -= custo
+    omitidas = len(curtas) - len(incluidas)
+    return montar('último valor e tendência', incluidas + [f'(+{omitidas} séries omitidas)'])
+
+
+# ------------------ Respostas memorizadas ------------------
+# Só as respostas locais (intencoes) são memorizadas e partilhadas entre sessões: dependem apenas
+# da pergunta e dos dados, com chave (pergunta normalizada, impressão digital dos dados). As
+# respostas do modelo dependem da conversa (ex.: "e em 2019?") e nunca são reaproveitadas.
+
+_respostas = OrderedDict()
+_respostas_lock = threading.Lock()
+
+
+def chave_resposta(pergunta, impressao):
+    return normalizar(pergunta), impressao
+
+
+def resposta_memorizada(pergunta, impressao):
+    chave = chave_resposta(pergunta, impressao)
+    with _respostas_lock:
+        if chave in _respostas:
+            _respostas.move_to_end(chave)
+            return _respostas[chave]
+    return None
+
+
+def memorizar(pergunta, impressao, resposta):
+    with _respostas_lock:
+        _respostas[chave_resposta(pergunta, impressao)] = resposta
+        while len(_respostas) > MAX_RESPOSTAS:
+            _respostas.popitem(last=False)
+
+
+class SessaoChat:
+    # Uma conversa por utilizador (guardada no st.session_state). `modelo` é qualquer objeto com
+    # start_chat(history=[...]) cujo chat tenha send_message(texto).text — o GenerativeModel do
+    # Gemini ou o ModeloFalso abaixo.
+    def __init__(self, modelo, turnos_mantidos=TURNOS_MANTIDOS):
+        self.modelo = modelo
+        self.turnos_mantidos = turnos_mantidos
+        self.chat = None
+        self.impressao = None
+        self.turnos = []  # (pergunta, resposta) mostradas ao utilizador, venham do modelo ou não
+        self._semente = []  # contexto e confirmação com que a conversa atual foi semeada
+        self._desde = 0  # primeiro turno que pertence à conversa atual
+        self._desatualizado = False  # há turnos locais que o chat do modelo ainda não viu
+
+    def _historico(self):
+        historico = list(self._semente)
+        for pergunta, resposta in self.turnos[self._desde:]:
+            historico += [{'role': 'user', 'parts': [pergunta]}, {'role': 'model', 'parts': [resposta]}]
+        return historico
+
+    def atualizar(self, impressao, contexto):
+        # Só volta a semear a conversa se os dados mudaram; devolve True quando semeou.
+        # `contexto` pode ser uma função, chamada apenas quando é mesmo preciso semear.
+        if self.chat is not None and impressao == self.impressao:
+            return False
+        if callable(contexto):
+            contexto = contexto()
+        self._semente = [
+            {'role': 'user', 'parts': [contexto]},
+            {'role': 'model', 'parts': [CONFIRMACAO]},
+        ]
+        # Os últimos turnos passam para a nova conversa para o modelo não perder o fio
+        self._desde = max(0, len(self.turnos) - self.turnos_mantidos)
+        self.chat = self.modelo.start_chat(history=self._historico())
+        self._desatualizado = False
+        self.impressao = impressao
+        return True
+
+    def enviar(self, pergunta):
+        if self._desatualizado:
+            # start_chat não faz nenhum pedido: o histórico só segue com a próxima mensagem
+            self.chat = self.modelo.start_chat(history=self._historico())
+            self._desatualizado = False
+        resposta = self.chat.send_message(pergunta).text
+        self.turnos.append((pergunta, resposta))
+        return resposta
+
+    def responder(self, pergunta, dados=None):
+        # Memória de respostas locais -> resposta local (pandas) -> modelo. Devolve (resposta, origem)
+        # com origem em 'memoria', 'local' ou 'modelo'.
+        resposta, origem = resposta_memorizada(pergunta, self.impressao), 'memoria'
+        if resposta is None and dados is not None:
+            resposta, origem = intencoes.responder(pergunta, dados), 'local'
+            if resposta is not None:
+                memorizar(pergunta, self.impressao, resposta)
+        if resposta is None:
+            return self.enviar(pergunta), 'modelo'
+        # A resposta foi mostrada: entra no histórico e o modelo passa a vê-la na próxima pergunta
+        self.turnos.append((pergunta, resposta))
+        self._desatualizado = True
+        return resposta, origem
+
+
+# ------------------ Modelo local para testes ------------------
+# Imita a interface do google.generativeai sem rede: regista o histórico recebido e responde
+# com um texto fixo (ou com a função `responder`). Ativado no wbapp com MOZDADOS_DATABOT=falso.
+
+class _Resposta:
+    def __init__(self, text):
+        self.text = text
+
+
+class _ChatFalso:
+    def __init__(self, modelo, history):
+        self.modelo = modelo
+        self.history = list(history)
+
+    def send_message(self, texto):
+        resposta = self.modelo.responder(texto, self.history)
+        self.history += [{'role': 'user', 'parts': [texto]}, {'role': 'model', 'parts': [resposta]}]
+        self.modelo.mensagens.append(texto)
+        return _Resposta(resposta)
+
+
+class ModeloFalso:
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda texto, historico: f'(modelo local) Recebi: {texto}')
+        self.chats = []
+        self.mensagens = []
+
+    def start_chat(self, history=()):
+        chat = _ChatFalso(self, history)
+        self.chats.append(chat)
+        return chat
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+import caches
+import medicao
+
+# ------------------ Exportação de dados sob demanda ------------------
+# Os ficheiros (CSV, Excel, Parquet) só são gerados quando o utilizador clica no botão e
+# ficam memorizados pela impressão digital da seleção (colunas, intervalo, países). O Excel
+# é escrito em modo streaming (write_only), sem montar o modelo completo do openpyxl.
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+MAX_ENTRADAS = 32
+MAX_BYTES = 256 * 1024 ** 2
+
+# Ficheiros já gerados, por (formato, seleção, índice); LRU limitado em entradas e em bytes
+_memo = caches.obter_cache('exportar', max_entradas=MAX_ENTRADAS, max_bytes=MAX_BYTES)
+
+
+def fingerprint(*partes):
+    # Impressão digital estável de uma seleção (listas, datas, números, textos)
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _csv(df, index):
+    return df.to_csv(index=index).encode('utf-8')
+
+
+def _celula(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if hasattr(valor, 'item'):
+        return valor.item()  # tipos NumPy -> tipos Python
+    return valor
+
+
+def _xlsx(df, index, sheet_name='Dados'):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    dados = df.reset_index() if index else df
+    ws.append([str(c) for c in dados.columns])
+    for linha in dados.itertuples(index=False, name=None):
+        ws.append([_celula(v) for v in linha])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _parquet(df, index):
+    buffer = BytesIO()
+    dados = df.copy()
+    dados.columns = [str(c) for c in dados.columns]
+    dados.to_parquet(buffer, index=index)
+    return buffer.getvalue()
+
+
+_GERADORES = {'csv': _csv, 'xlsx': _xlsx, 'parquet': _parquet}
+
+
+def preparar(df, formato, chave, index=True):
+    # Devolve os bytes do ficheiro, gerando-os só se esta seleção ainda não foi exportada
+    memo_chave = (formato, chave, index)
+    inicio = time.perf_counter()
+    encontrado, conteudo = _memo.obter(memo_chave)
+    if not encontrado:
+        conteudo = _GERADORES[formato](df, index)
+        _memo.guardar(memo_chave, conteudo, len(conteudo))
+    medicao.registar('exportar', formato, (time.perf_counter() - inicio) * 1000,
+                     linhas=len(df), bytes=len(conteudo), cache='hit' if encontrado else 'miss')
+    return conteudo
+
+
+def gerador(df, formato, chave, index=True):
+    # Função sem argumentos para o `data` do st.download_button: só corre no clique
+    return lambda: preparar(df, formato, chave, index)
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+from plotly.subplots import make_subplots
+
+import caches
+import medicao
+
+# ------------------ Redução de pontos para os gráficos ------------------
+# Histogramas são calculados no servidor (só as contagens por intervalo vão para o browser) e
+# as séries longas são reduzidas com LTTB (largest-triangle-three-buckets) até um orçamento
+# de pontos por série. Acima de um certo total de pontos as linhas passam a WebGL.
+
+PONTOS_POR_SERIE = int(os.environ.get('MOZDADOS_PONTOS_SERIE', 500))
+LIMIAR_WEBGL = int(os.environ.get('MOZDADOS_LIMIAR_WEBGL', 5000))
+MAX_FIGURAS = 256
+MAX_BYTES_FIGURAS = 128 * 1024 ** 2
+
+
+def lttb(x, y, limite):
+    # Devolve os índices dos pontos escolhidos; x e y são arrays numéricos sem NaN
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    limites = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+
+    a = 0
+    for i in range(limite - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do balde seguinte (o último ponto no caso do último balde)
+        prox_inicio, prox_fim = limites[i + 1], limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+
+        areas = np.abs((x[a] - media_x) * (y[inicio:fim] - y[a]) - (x[a] - x[inicio:fim]) * (media_y - y[a]))
+        a = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def _numerico(valores):
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores.astype('datetime64[ns]').astype('int64').to_numpy(dtype=float)
+    return pd.to_numeric(valores).to_numpy(dtype=float)
+
+
+def reduzir(df, x, y, grupo=None, limite=None):
+    # Reduz cada série (grupo) de um DataFrame longo para no máximo `limite` pontos
+    limite = limite or PONTOS_POR_SERIE
+    partes = []
+    grupos = df.groupby(grupo, sort=False, observed=True) if grupo else [(None, df)]
+    for _, serie in grupos:
+        serie = serie.sort_values(x)
+        if serie[y].count() > limite:
+            serie = serie.dropna(subset=[y])
+            serie = serie.iloc[lttb(_numerico(serie[x]), serie[y].to_numpy(dtype=float), limite)]
+        partes.append(serie)
+    return pd.concat(partes) if partes else df.iloc[0:0]
+
+
+def largo_para_longo(df, colunas, x='Período', limite=None):
+    # Tabela larga (uma coluna por indicador) -> longa e reduzida, como usada pelos gráficos do app.py
+    longo = (df[list(colunas)].rename_axis(x).reset_index()
+             .melt(id_vars=x, var_name='Indicador', value_name='Valor'))
+    return reduzir(longo, x, 'Valor', grupo='Indicador', limite=limite)
+
+
+def modo_render(df):
+    return 'webgl' if len(df) > LIMIAR_WEBGL else 'svg'
+
+
+def histograma(df, colunas, nbins=15, resumo=True, titulo="Distribuição/Frequência dos Valores",
+               titulo_x='Valor', titulo_y='Frequência'):
+    # Histograma com intervalos comuns a todas as colunas, calculado com NumPy.
+    # `resumo` acrescenta por cima um boxplot (5 números por série) em vez do rug com todos os pontos.
+    valores = {c: df[c].dropna().to_numpy(dtype=float) for c in colunas}
+    todos = np.concatenate([v for v in valores.values() if len(v)] or [np.array([0.0])])
+    limites = np.histogram_bin_edges(todos, bins=nbins)
+    centros = (limites[:-1] + limites[1:]) / 2
+    larguras = np.diff(limites)
+
+    if resumo:
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.15, 0.85], vertical_spacing=0.02)
+    else:
+        fig = go.Figure()
+    for i, (coluna, v) in enumerate(valores.items()):
+        cor = qualitative.Plotly[i % len(qualitative.Plotly)]
+        contagens, _ = np.histogram(v, bins=limites)
+        barra = go.Bar(x=centros, y=contagens, width=larguras, name=str(coluna), legendgroup=str(coluna),
+                       marker_color=cor, hovertemplate='%{x}: %{y}<extra>' + str(coluna) + '</extra>')
+        if resumo:
+            fig.add_trace(barra, row=2, col=1)
+            if len(v):
+                q1, mediana, q3 = np.percentile(v, [25, 50, 75])
+                fig.add_trace(go.Box(q1=[q1], median=[mediana], q3=[q3], lowerfence=[v.min()], upperfence=[v.max()],
+                                     y=[str(coluna)], orientation='h', name=str(coluna), legendgroup=str(coluna),
+                                     showlegend=False, marker_color=cor), row=1, col=1)
+        else:
+            fig.add_trace(barra)
+
+    fig.update_layout(title=titulo, barmode='relative', bargap=0)
+    if resumo:
+        fig.update_yaxes(showticklabels=False, row=1, col=1)
+        fig.update_xaxes(title_text=titulo_x, row=2, col=1)
+        fig.update_yaxes(title_text=titulo_y, row=2, col=1)
+    else:
+        fig.update_layout(xaxis_title=titulo_x, yaxis_title=titulo_y)
+    return fig
+
+
+# ------------------ Cache de figuras partilhada entre sessões ------------------
+# Construir uma figura com o Plotly Express (e os update_layout) custa dezenas de ms por gráfico.
+# A mesma vista (versão dos dados, seleção, intervalo, tipo de gráfico) pedida por qualquer sessão
+# reutiliza a figura já construída. Guarda-se o objeto Figure e não o JSON: o st.plotly_chart
+# volta a validar um dict/JSON (~20 ms), enquanto uma Figure passa direto. O tamanho de cada
+# entrada é o do JSON da figura. Quem recebe a figura não a altera: todo o layout é aplicado
+# dentro de `construir`.
+
+_figuras = caches.obter_cache('figuras', max_entradas=MAX_FIGURAS, max_bytes=MAX_BYTES_FIGURAS)
+
+
+def figura_em_cache(chave, construir):
+    def calcular():
+        medicao.falha_cache()
+        return construir()
+    return _figuras.obter_ou_calcular(chave, calcular, medir=lambda fig: len(fig.to_json()))
@@ -0,0 +1,302 @@
+import re
+
+import pandas as pd
+
+from kpis import calcular_kpis
+from wbcatalog import SINONIMOS, normalizar
+
+# ------------------ Respostas locais do DataBot ------------------
+# Perguntas frequentes sobre os dados selecionados ("qual foi o maior valor", "crescimento entre
+# 2010 e 2020", "compare Moçambique e Malawi") são reconhecidas por modelos de frase em português
+# e inglês e respondidas diretamente com pandas, sem ida ao modelo. Perguntas abertas (explicações,
+# porquês, definições), perguntas sobre países ou indicadores fora da seleção e perguntas sem dados
+# para responder devolvem None e seguem para o modelo.
+
+_MAXIMO = r'maior|mais alto|mais elevado|maximo|pico|highest|largest|biggest|maximum|max|peak'
+_MINIMO = r'menor|mais baixo|minimo|lowest|smallest|minimum|min'
+
+# (intenção, expressão em português | inglês) pela ordem de prioridade; o texto vem normalizado (sem acentos)
+INTENCOES = [
+    ('crescimento', r'\b(crescimento|cresceu|crescer|variacao|variou|evolucao|evoluiu'
+                    r'|growth|grew|grow|change|changed|increase|decrease)\b'),
+    ('comparar', r'\b(compar\w*|versus|vs)\b'),
+    ('extremos', rf'^(?=.*\b({_MAXIMO})\b)(?=.*\b({_MINIMO})\b)'),
+    ('maximo', rf'\b({_MAXIMO})\b'),
+    ('minimo', rf'\b({_MINIMO})\b'),
+    ('media', r'\b(media|valor medio|average)\b'),
+    # "last 5 years" é um intervalo (ver JANELA), não o último valor
+    ('ultimo', r'\b(ultimo|mais recente|atual|latest|last|most recent|current)\b(?!\s+\d)'),
+    ('valor_ano', r'\b(valor\w*|values?)\b.*\b(em|no ano de|de|in|for)\s+(19|20)\d\d\b'),
+    # "Qual foi a inflação em 2015?": só quando a pergunta nomeia um dos indicadores selecionados
+    ('indicador_ano', r'\b(em|no ano de|in)\s+(19|20)\d\d\b'),
+]
+
+# Superlativos e "último"/"atual" também descrevem coisas que não são os valores da seleção ("o país
+# com a maior população", "current account"): só contam com uma referência a valores na pergunta
+PEDEM_VALOR = {'extremos', 'maximo', 'minimo', 'ultimo'}
+CONTEXTO_VALOR = (r'\b(valor\w*|values?|numero|nivel|level|figure|quando|when|em que ano|which year|what year'
+                  r'|maximo|minimo|maximum|minimum|max|min|pico|peak|(19|20)\d\d)\b')
+
+# "últimos 5 anos" / "last 5 years": intervalo que termina no último ano com dados
+JANELA = r'\b(?:ultimos|last|past)\s+(\d+)\s+(?:anos|years)\b'
+
+# Palavras frequentes usadas para responder na língua da pergunta
+PALAVRAS_PT = {'qual', 'quais', 'o', 'a', 'os', 'as', 'de', 'do', 'da', 'dos', 'das', 'e', 'em', 'no', 'na',
+               'entre', 'foi', 'que', 'com', 'para', 'como', 'pais', 'ano', 'valor'}
+PALAVRAS_EN = {'what', 'which', 'the', 'of', 'and', 'in', 'between', 'was', 'is', 'for', 'how', 'from', 'to',
+               'country', 'year', 'value', 'did', 'has', 'had'}
+
+# Pedidos de explicação ficam sempre para o modelo; definições ("o que é o PIB?") também, exceto
+# quando a pergunta pede um valor ("what is the highest value?")
+ABERTAS = (r'\b(porque|por que|porqu\w*|explica\w*|expliqu\w*|why|explain|interpret\w*|significa\w*'
+           r'|meaning|means?|quer dizer|what does)\b')
+DEFINICOES = r'\b(o que (e|sao)|what (is|are))\b'
+
+# Nomes de países em português -> nomes usados pelo Banco Mundial (normalizados)
+PAISES = {
+    'mocambique': 'mozambique',
+    'malaui': 'malawi',
+    'africa do sul': 'south africa',
+    'tanzania': 'tanzania',
+    'zimbabue': 'zimbabwe',
+    'zambia': 'zambia',
+    'suazilandia': 'eswatini',
+    'brasil': 'brazil',
+    'estados unidos': 'united states',
+    'reino unido': 'united kingdom',
+    'china': 'china',
+    'india': 'india',
+    'quenia': 'kenya',
+    'etiopia': 'ethiopia',
+    'nigeria': 'nigeria',
+    'madagascar': 'madagascar',
+    'cabo verde': 'cabo verde',
+    'guine bissau': 'guinea bissau',
+    'sao tome e principe': 'sao tome and principe',
+}
+
+# Termos de indicadores reconhecidos na pergunta (já traduzidos); "growth" é a intenção crescimento
+TERMOS_INDICADORES = sorted(set(SINONIMOS.values()) - {'growth'})
+
+# Perguntas sobre todos os países do mundo não se respondem com a seleção
+ABRANGENTES = r'\b(do mundo|no mundo|in the world|worldwide|all countries|todos os paises)\b'
+
+TEXTOS = {
+    'pt': {
+        'maximo': 'Maior valor', 'minimo': 'Menor valor', 'extremos': 'Maior e menor valor',
+        'media': 'Média', 'ultimo': 'Último valor',
+        'em': 'em', 'entre': 'entre', 'sem_dados': 'sem dados', 'ao_ano': 'ao ano',
+        'geral_max': 'O maior de todos', 'geral_min': 'O menor de todos',
+        'crescimento': 'Crescimento', 'comparacao': 'Comparação', 'valor': 'Valor',
+        'variacao_ant': 'vs ano anterior', 'fonte': '_Calculado diretamente a partir dos dados selecionados._',
+    },
+    'en': {
+        'maximo': 'Highest value', 'minimo': 'Lowest value', 'extremos': 'Highest and lowest value',
+        'media': 'Average', 'ultimo': 'Latest value',
+        'em': 'in', 'entre': 'between', 'sem_dados': 'no data', 'ao_ano': 'per year',
+        'geral_max': 'Highest overall', 'geral_min': 'Lowest overall',
+        'crescimento': 'Growth', 'comparacao': 'Comparison', 'valor': 'Value',
+        'variacao_ant': 'vs previous year', 'fonte': '_Computed directly from the selected data._',
+    },
+}
+
+
+def _texto(pergunta):
+    # Texto normalizado com os nomes de países e termos em português trocados pelos do Banco Mundial
+    texto = f' {normalizar(pergunta)} '
+    for pt, en in list(PAISES.items()) + list(SINONIMOS.items()):
+        texto = texto.replace(f' {pt} ', f' {en} ')
+    return texto
+
+
+def lingua(pergunta):
+    palavras = normalizar(pergunta).split()
+    en = sum(p in PALAVRAS_EN for p in palavras)
+    pt = sum(p in PALAVRAS_PT for p in palavras)
+    return 'en' if en > pt else 'pt'
+
+
+def identificar(pergunta):
+    # Devolve (intenção, língua) ou None para perguntas abertas / não reconhecidas
+    texto = f' {normalizar(pergunta)} '
+    com_valor = re.search(CONTEXTO_VALOR, texto) is not None
+    if re.search(ABERTAS, texto) or (re.search(DEFINICOES, texto) and not com_valor):
+        return None
+    for intencao, padrao in INTENCOES:
+        if re.search(padrao, texto) and (com_valor or intencao not in PEDEM_VALOR):
+            return intencao, lingua(pergunta)
+    return None
+
+
+def anos(pergunta):
+    return sorted({int(a) for a in re.findall(r'\b(?:19|20)\d\d\b', pergunta)})
+
+
+def janela(pergunta):
+    # N de "últimos N anos", ou None
+    correspondencia = re.search(JANELA, normalizar(pergunta))
+    return int(correspondencia.group(1)) if correspondencia else None
+
+
+def _mencionados(texto, nomes, cabeca=False):
+    # Nomes (países ou indicadores) citados na pergunta; para indicadores basta a parte antes
+    # da vírgula ou do parêntese ("Inflation, consumer prices" -> "inflation")
+    encontrados = []
+    for nome in nomes:
+        chave = re.split(r'[,(]', str(nome))[0] if cabeca else str(nome)
+        chave = normalizar(chave)
+        if chave and f' {chave} ' in texto:
+            encontrados.append(nome)
+    return encontrados
+
+
+def _indicadores(texto, todos):
+    # Indicadores da seleção citados na pergunta, pelo nome ou por um termo ("PIB" -> os que têm
+    # "GDP" no nome). None se a pergunta cita um termo que nenhum indicador selecionado tem.
+    nomeados = _mencionados(texto, todos, cabeca=True)
+    por_termo = set()
+    for termo in TERMOS_INDICADORES:
+        if f' {termo} ' in texto:
+            correspondentes = [i for i in todos if f' {termo} ' in f' {normalizar(str(i))} ']
+            if not correspondentes:
+                return None
+            por_termo.update(correspondentes)
+    return nomeados or [i for i in todos if i in por_termo]
+
+
+def _num(valor):
+    return f'{valor:,.2f}'
+
+
+def _rotulo(pais, indicador, n_paises, n_indicadores):
+    partes = ([str(pais)] if n_paises > 1 else []) + ([str(indicador)] if n_indicadores > 1 else [])
+    return ' · '.join(partes) or f'{pais} · {indicador}'
+
+
+def responder(pergunta, df_long, tempo='Ano', valor='Valor'):
+    # Resposta em markdown calculada com pandas, ou None se a pergunta deve ir para o modelo
+    reconhecida = identificar(pergunta)
+    if reconhecida is None or df_long.empty:
+        return None
+    intencao, idioma = reconhecida
+    t = TEXTOS[idioma]
+    texto = _texto(pergunta)
+
+    if re.search(ABRANGENTES, texto):
+        return None
+
+    todos_paises = list(pd.unique(df_long['País']))
+    todos_indicadores = list(pd.unique(df_long['Indicador']))
+    # Um país ou indicador citado que não está na seleção não é trocado pela seleção inteira:
+    # a resposta seria sobre outra coisa
+    selecionados = {normalizar(str(p)) for p in todos_paises}
+    if any(f' {pais} ' in texto and pais not in selecionados for pais in PAISES.values()):
+        return None
+    nomeados = _indicadores(texto, todos_indicadores)
+    if nomeados is None:
+        return None
+    paises = _mencionados(texto, todos_paises) or todos_paises
+    if intencao == 'indicador_ano':
+        if not nomeados:
+            return None
+        intencao = 'valor_ano'
+    indicadores = nomeados or todos_indicadores
+    periodo = anos(pergunta)
+
+    dados = df_long[df_long['País'].isin(paises) & df_long['Indicador'].isin(indicadores)]
+    dados = dados.dropna(subset=[valor])
+    n_anos = janela(pergunta)
+    if n_anos and not periodo and not dados.empty:
+        fim = int(dados[tempo].max())
+        periodo = [fim - n_anos + 1, fim]
+    if intencao in ('maximo', 'minimo', 'extremos', 'media') and periodo:
+        dados = dados[dados[tempo].between(periodo[0], periodo[-1])]
+    if dados.empty:
+        return None
+
+    dados = dados.astype({'País': 'object', 'Indicador': 'object'})
+    n_p, n_i = len(paises), len(indicadores)
+    grupos = dados.groupby(['País', 'Indicador'], sort=False)
+    linhas = []
+
+    if intencao in ('maximo', 'minimo', 'extremos'):
+        titulo = t[intencao] + (f" {t['entre']} {periodo[0]}–{periodo[-1]}" if len(periodo) >= 2 else '')
+        for extremo in (['maximo', 'minimo'] if intencao == 'extremos' else [intencao]):
+            pos = grupos[valor].idxmax() if extremo == 'maximo' else grupos[valor].idxmin()
+            extremos = dados.loc[pos]
+            if intencao == 'extremos':
+                linhas.append(f"*{t[extremo]}*" if extremo == 'maximo' else f"\n*{t[extremo]}*")
+            for r in extremos.itertuples(index=False):
+                r = r._asdict()
+                linhas.append(f"- {_rotulo(r['País'], r['Indicador'], n_p, n_i)}: **{_num(r[valor])}** "
+                              f"{t['em']} {r[tempo]}")
+            if len(extremos) > 1 and n_i == 1:
+                geral = extremos.loc[extremos[valor].idxmax() if extremo == 'maximo' else extremos[valor].idxmin()]
+                chave = 'geral_max' if extremo == 'maximo' else 'geral_min'
+                linhas.append(f"\n{t[chave]}: **{geral['País']}** ({_num(geral[valor])} {t['em']} {geral[tempo]})")
+
+    elif intencao == 'media':
+        titulo = t['media'] + (f" {t['entre']} {periodo[0]}–{periodo[-1]}" if len(periodo) >= 2 else '')
+        for (pais, indicador), serie in grupos:
+            linhas.append(f"- {_rotulo(pais, indicador, n_p, n_i)}: **{_num(serie[valor].mean())}** "
+                          f"({serie[tempo].min()}–{serie[tempo].max()})")
+
+    elif intencao == 'valor_ano':
+        ano = periodo[-1]
+        titulo = f"{t['valor']} {t['em']} {ano}"
+        for (pais, indicador), serie in grupos:
+            no_ano = serie.loc[serie[tempo] == ano, valor]
+            linhas.append(f"- {_rotulo(pais, indicador, n_p, n_i)}: "
+                          + (f'**{_num(no_ano.iloc[0])}**' if len(no_ano) else t['sem_dados']))
+        if not (dados[tempo] == ano).any():
+            # Ano sem nenhum valor (ex.: um ano futuro): uma lista de "sem dados" não responde
+            return None
+
+    elif intencao == 'ultimo':
+        titulo = t['ultimo']
+        kpis = calcular_kpis(dados, ['País', 'Indicador'], tempo, valor)
+        for (pais, indicador), k in kpis.iterrows():
+            linha = f"- {_rotulo(pais, indicador, n_p, n_i)}: **{_num(k['atual'])}** ({int(k['periodo_atual'])})"
+            if pd.notna(k['variacao']):
+                linha += f", {k['variacao']:+.1f}% {t['variacao_ant']}"
+            linhas.append(linha)
+
+    elif intencao == 'crescimento':
+        inicio = periodo[0] if periodo else None
+        fim = periodo[-1] if len(periodo) >= 2 else None
+        titulo = t['crescimento']
+        for (pais, indicador), serie in grupos:
+            serie = serie.sort_values(tempo)
+            if inicio is not None:
+                serie = serie[serie[tempo].between(inicio, fim if fim is not None else serie[tempo].max())]
+            if len(serie) < 2:
+                linhas.append(f"- {_rotulo(pais, indicador, n_p, n_i)}: {t['sem_dados']}")
+                continue
+            a, b = serie.iloc[0], serie.iloc[-1]
+            linha = f"- {_rotulo(pais, indicador, n_p, n_i)}: {_num(a[valor])} ({a[tempo]}) → {_num(b[valor])} ({b[tempo]})"
+            if a[valor] != 0:
+                linha += f", **{(b[valor] - a[valor]) / abs(a[valor]) * 100:+.1f}%**"
+            anos_decorridos = b[tempo] - a[tempo]
+            if a[valor] > 0 and b[valor] > 0 and anos_decorridos > 0:
+                linha += f" ({((b[valor] / a[valor]) ** (1 / anos_decorridos) - 1) * 100:+.2f}% {t['ao_ano']})"
+            linhas.append(linha)
+
+    else:  # comparar
+        if n_p < 2 and n_i < 2:
+            return None
+        titulo = t['comparacao']
+        kpis = calcular_kpis(dados, ['País', 'Indicador'], tempo, valor)
+        for indicador in indicadores:
+            if n_i > 1:
+                linhas.append(f'**{indicador}**')
+            ranking = kpis.xs(indicador, level='Indicador').sort_values('atual', ascending=False) \
+                if indicador in kpis.index.get_level_values('Indicador') else kpis.iloc[0:0]
+            for pais, k in ranking.iterrows():
+                linha = f"- {pais}: **{_num(k['atual'])}** ({int(k['periodo_atual'])})"
+                if pd.notna(k['cagr']):
+                    linha += f", CAGR {k['cagr']:+.2f}% {t['ao_ano']}"
+                linhas.append(linha)
+
+    if not linhas:
+        return None
+    return f"**{titulo}**\n\n" + '\n'.join(linhas) + f"\n\n{t['fonte']}"
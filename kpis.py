@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# ------------------ Motor de KPIs vetorizado ------------------
+# Calcula de uma só vez, para todos os pares (país, indicador) ou colunas selecionadas:
+# último e penúltimo valor não nulo, variação %, CAGR no intervalo e média móvel.
+# Substitui os filtros (query) feitos dentro de ciclos por país e por indicador.
+
+COLUNAS = ['atual', 'periodo_atual', 'anterior', 'periodo_anterior', 'variacao', 'cagr', 'media_movel', 'observacoes']
+
+
+def _anos_entre(inicio, fim):
+    if pd.api.types.is_datetime64_any_dtype(inicio):
+        return (fim - inicio).dt.days / 365.25
+    return (fim - inicio).astype(float)
+
+
+def calcular_kpis(df_long, grupos, tempo, valor='Valor', janela=3):
+    # df_long: formato longo com as colunas de grupo, a coluna de tempo e a coluna de valor.
+    # Devolve um DataFrame indexado pelos grupos com as colunas em COLUNAS.
+    grupos = list(grupos)
+    dados = df_long[grupos + [tempo, valor]].dropna(subset=[valor])
+    if dados.empty:
+        return pd.DataFrame(columns=COLUNAS, index=pd.MultiIndex.from_arrays([[]] * len(grupos), names=grupos)
+                            if len(grupos) > 1 else pd.Index([], name=grupos[0]))
+
+    dados = dados.sort_values(grupos + [tempo])
+    g = dados.groupby(grupos, sort=False, observed=True)
+    # Posição a contar do fim: 0 = último valor não nulo, 1 = penúltimo, ...
+    posicao = g.cumcount(ascending=False)
+
+    ultimo = dados[posicao == 0].set_index(grupos)
+    penultimo = dados[posicao == 1].set_index(grupos)
+    primeiro = g.head(1).set_index(grupos)
+
+    kpis = pd.DataFrame(index=ultimo.index)
+    kpis['atual'] = ultimo[valor]
+    kpis['periodo_atual'] = ultimo[tempo]
+    kpis['anterior'] = penultimo[valor].reindex(kpis.index)
+    kpis['periodo_anterior'] = penultimo[tempo].reindex(kpis.index)
+
+    anterior = kpis['anterior'].where(kpis['anterior'] != 0)
+    kpis['variacao'] = (kpis['atual'] - anterior) / anterior * 100
+
+    inicio = primeiro[valor].reindex(kpis.index)
+    anos = _anos_entre(primeiro[tempo].reindex(kpis.index), kpis['periodo_atual'])
+    validos = (inicio > 0) & (kpis['atual'] > 0) & (anos > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = (np.power(kpis['atual'] / inicio, 1 / anos) - 1) * 100
+    kpis['cagr'] = cagr.where(validos)
+
+    kpis['media_movel'] = dados[posicao < janela].groupby(grupos, sort=False, observed=True)[valor].mean()
+    kpis['observacoes'] = g[valor].size()
+    return kpis[COLUNAS]
+
+
+def calcular_kpis_largo(df, colunas, janela=3):
+    # Para tabelas largas (uma coluna por indicador, índice temporal), como no app.py
+    tempo = df.index.name or 'Período'
+    df_long = (df[list(colunas)].rename_axis(tempo).reset_index()
+               .melt(id_vars=tempo, var_name='Indicador', value_name='Valor'))
+    return calcular_kpis(df_long, ['Indicador'], tempo, janela=janela)
@@ -0,0 +1,124 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ------------------ Medição do tempo de cada etapa dos dashboards ------------------
+# Cada rerun do app.py / wbapp.py abre uma Medicao e envolve as etapas (pedido à API, melt, KPIs,
+# gráficos, exportação, DataBot) em `with medicao.etapa(...)`. Cada etapa regista o tempo, as
+# linhas processadas, os bytes enviados e se veio de cache, escreve uma linha JSON no log
+# (logger "mozdados.desempenho") e entra na janela usada para os percentis do painel.
+#
+# O painel lateral só aparece com ?desempenho=1 no URL ou MOZDADOS_DESEMPENHO=1. O log vai para
+# o stderr por defeito; MOZDADOS_LOG_DESEMPENHO=<ficheiro> escreve num ficheiro e vazio desliga.
+
+LOG_DESTINO = os.environ.get('MOZDADOS_LOG_DESEMPENHO', '-')
+PAINEL = os.environ.get('MOZDADOS_DESEMPENHO', '') == '1'
+JANELA = 500  # últimas medições de cada etapa usadas nos percentis
+
+logger = logging.getLogger('mozdados.desempenho')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+if LOG_DESTINO and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr) if LOG_DESTINO == '-' else logging.FileHandler(LOG_DESTINO, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+
+_historico = defaultdict(lambda: deque(maxlen=JANELA))
+_historico_lock = threading.Lock()
+
+# Etapa em curso nesta thread: funções em cache chamam falha_cache() quando o corpo corre de facto
+_etapa_atual = contextvars.ContextVar('etapa_atual', default=None)
+
+
+def registar(painel, etapa, ms, **info):
+    # Regista uma medição avulsa (ex.: exportação gerada no clique, fora de um rerun)
+    registo = {'ts': round(time.time(), 3), 'painel': painel, 'etapa': etapa, 'ms': round(ms, 3)}
+    registo.update({k: v for k, v in info.items() if v is not None})
+    with _historico_lock:
+        _historico[(painel, etapa)].append(registo['ms'])
+    if logger.handlers:
+        logger.info(json.dumps(registo, ensure_ascii=False, default=str))
+    return registo
+
+
+def falha_cache():
+    # Chamado dentro do corpo de uma função em cache: se correu, a etapa não veio da cache
+    registo = _etapa_atual.get()
+    if registo is not None:
+        registo['cache'] = 'miss'
+
+
+class Medicao:
+    # Medições de um rerun
+    def __init__(self, painel):
+        self.painel = painel
+        self.rerun = uuid.uuid4().hex[:8]
+        self.inicio = time.perf_counter()
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nome, cache=False, **info):
+        # `cache=True` marca a etapa como "hit" até falha_cache() ser chamado lá dentro.
+        # O dicionário devolvido aceita mais informação (linhas, bytes, origem, ...).
+        registo = dict(info)
+        if cache:
+            registo['cache'] = 'hit'
+        token = _etapa_atual.set(registo)
+        inicio = time.perf_counter()
+        try:
+            yield registo
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            _etapa_atual.reset(token)
+            self.etapas.append(registar(self.painel, nome, ms, rerun=self.rerun, **registo))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def tabela(self):
+        colunas = ['etapa', 'ms', 'linhas', 'bytes', 'cache']
+        df = pd.DataFrame(self.etapas)
+        return df.reindex(columns=colunas + [c for c in df.columns if c not in colunas + ['ts', 'painel', 'rerun']])
+
+
+def percentis(painel=None):
+    # p50/p90/p99 das últimas JANELA medições de cada etapa
+    with _historico_lock:
+        copia = {chave: list(valores) for chave, valores in _historico.items() if painel in (None, chave[0])}
+    linhas = []
+    for (nome_painel, etapa), valores in copia.items():
+        p50, p90, p99 = np.percentile(valores, [50, 90, 99])
+        linhas.append({'painel': nome_painel, 'etapa': etapa, 'n': len(valores),
+                       'p50_ms': round(p50, 1), 'p90_ms': round(p90, 1), 'p99_ms': round(p99, 1)})
+    return pd.DataFrame(linhas, columns=['painel', 'etapa', 'n', 'p50_ms', 'p90_ms', 'p99_ms'])
+
+
+def json_bytes(fig):
+    # Tamanho do JSON de uma figura; só calculado com o painel ligado (serializar tem custo)
+    return len(fig.to_json())
+
+
+def painel_ativo(query_params=None):
+    if PAINEL:
+        return True
+    return query_params is not None and query_params.get('desempenho') in ('1', 'true', 'sim')
+
+
+def mostrar_painel(medicao):
+    import streamlit as st
+
+    with st.sidebar.expander('⏱️ Desempenho', expanded=True):
+        st.caption(f'Rerun {medicao.rerun}: {medicao.total_ms():,.0f} ms no total')
+        st.dataframe(medicao.tabela(), hide_index=True, use_container_width=True)
+        st.caption(f'Percentis das últimas {JANELA} medições por etapa')
+        st.dataframe(percentis(medicao.painel), hide_index=True, use_container_width=True)
@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import time
+
+import basedados
+import wbdados
+
+# ------------------ Pré-aquecimento das caches ------------------
+# Corre fora do Streamlit (cron ou arranque do contentor, ver .devcontainer) para que o primeiro
+# utilizador depois de um deploy já encontre as caches em disco preenchidas:
+#   - catálogo de indicadores, tópicos e economias (dados/cache/*.pkl)
+#   - valores dos conjuntos mais consultados de países e indicadores (dados/cache/wb.sqlite)
+#   - cópia colunar de dados/database.xlsx usada pelo app.py (dados/cache/database.feather)
+# e constrói as figuras desses conjuntos para validar o caminho completo até ao gráfico.
+#
+#     python preaquecer.py
+#     python preaquecer.py --paises Mozambique Malawi --indicadores "GDP (current US$)" --inicio 2000
+
+# Países e indicadores mais consultados (nomes como aparecem nas listas do wbapp.py)
+PAISES = ['Mozambique', 'South Africa', 'Malawi', 'Tanzania', 'Zimbabwe', 'Zambia', 'Eswatini',
+          'Angola', 'Botswana', 'Namibia']
+INDICADORES = [
+    'Agricultural land (sq. km)',
+    'GDP (current US$)',
+    'GDP growth (annual %)',
+    'Inflation, consumer prices (annual %)',
+    'Population, total',
+    'Official exchange rate (LCU per US$, period average)',
+    'Life expectancy at birth, total (years)',
+]
+
+
+def _etapa(nome, funcao):
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao()
+    except Exception as e:
+        print(f'✗ {nome}: {e}', flush=True)
+        return None, False
+    print(f'✓ {nome} ({time.perf_counter() - inicio:.1f}s)', flush=True)
+    return resultado, True
+
+
+def preaquecer(paises=None, indicadores=None, inicio=wbdados.ANOS[0], fim=wbdados.ANOS[1],
+               refresh=False, figuras=True, base=True):
+    # Devolve True se todas as etapas correram bem
+    ok = True
+    catalogo, passou = _etapa('catálogo de indicadores', lambda: wbdados.carregar_catalogo(refresh))
+    if catalogo is not None and catalogo.degradado:
+        print('⚠ catálogo de indicadores incompleto (sem tópicos): não foi guardado em disco', flush=True)
+        passou = False
+    ok &= passou
+    ok &= _etapa('tópicos', lambda: wbdados.carregar_topicos(refresh))[1]
+    economias, passou = _etapa('economias', lambda: wbdados.carregar_paises(refresh))
+    ok &= passou
+
+    if catalogo is not None and economias is not None:
+        paises = [p for p in (paises or PAISES) if p in economias.index]
+        indicadores = [i for i in (indicadores or INDICADORES) if i in catalogo.nome_para_id]
+        if paises and indicadores:
+            # O cache guarda células (série, país, ano): o intervalo completo serve qualquer subintervalo
+            df_long, passou = _etapa(
+                f'dados: {len(paises)} países x {len(indicadores)} indicadores, {inicio}-{fim}',
+                lambda: wbdados.carregar_longo(indicadores, paises, inicio, fim, catalogo, economias))
+            ok &= passou
+            if figuras and df_long is not None:
+                ok &= _etapa('figuras', lambda: [f.to_json() for f in
+                                                  wbdados.figuras(wbdados.dados_grafico(df_long, indicadores),
+                                                                  indicadores)])[1]
+
+    if base and os.path.exists(basedados.FONTE):
+        ok &= _etapa('cópia colunar de database.xlsx', lambda: basedados.atualizar(forcar=refresh))[1]
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pré-aquece as caches em disco do Mozdados')
+    parser.add_argument('--paises', nargs='+', help='nomes dos países (por defeito os mais consultados)')
+    parser.add_argument('--indicadores', nargs='+', help='nomes dos indicadores (por defeito os mais consultados)')
+    parser.add_argument('--inicio', type=int, default=wbdados.ANOS[0])
+    parser.add_argument('--fim', type=int, default=wbdados.ANOS[1])
+    parser.add_argument('--refresh', action='store_true', help='descarrega de novo catálogo e listas')
+    parser.add_argument('--sem-figuras', action='store_true', help='não constrói as figuras')
+    parser.add_argument('--sem-base', action='store_true', help='não converte dados/database.xlsx')
+    args = parser.parse_args()
+
+    sucesso = preaquecer(args.paises, args.indicadores, args.inicio, args.fim, refresh=args.refresh,
+                         figuras=not args.sem_figuras, base=not args.sem_base)
+    sys.exit(0 if sucesso else 1)
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import caches
+
+# ------------------ Testes das caches em memória (caches.Cache) ------------------
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    # Relógio manual para o TTL: agora[0] é o time.time() visto pelas caches
+    agora = [1000.0]
+    monkeypatch.setattr(caches.time, 'time', lambda: agora[0])
+    return agora
+
+
+def test_lru_por_numero_de_entradas():
+    c = caches.Cache('t', max_entradas=2)
+    c.guardar('a', 1, 10)
+    c.guardar('b', 2, 10)
+    assert c.obter('a') == (True, 1)  # 'a' passa a ser a mais recente
+    c.guardar('c', 3, 10)
+    assert c.obter('b') == (False, None)
+    assert c.obter('a') == (True, 1) and c.obter('c') == (True, 3)
+    assert c.despejos == 1
+    assert c.bytes == 20
+
+
+def test_lru_por_bytes():
+    c = caches.Cache('t', max_bytes=100)
+    for chave in 'abc':
+        c.guardar(chave, chave, 40)
+    assert c.obter('a') == (False, None)
+    assert c.bytes == 80
+    # Uma entrada maior que o orçamento fica, sozinha
+    c.guardar('grande', 'x', 500)
+    assert c.obter('grande') == (True, 'x')
+    assert c.estatisticas()['entradas'] == 1
+    assert c.bytes == 500
+    assert c.despejos == 3
+
+
+def test_substituir_atualiza_bytes():
+    c = caches.Cache('t', max_bytes=100)
+    c.guardar('a', 1, 60)
+    c.guardar('a', 2, 30)
+    c.guardar('b', 3, 60)
+    assert c.bytes == 90
+    assert c.obter('a') == (True, 2)
+    assert c.despejos == 0
+
+
+def test_ttl(relogio):
+    c = caches.Cache('t', ttl=60)
+    c.guardar('a', 1, 10)
+    relogio[0] += 59
+    assert c.obter('a') == (True, 1)
+    relogio[0] += 2
+    assert c.obter('a') == (False, None)
+    assert (c.expiradas, c.despejos, c.bytes) == (1, 0, 0)
+    # O TTL conta desde que o valor foi guardado, não desde o último acesso
+    c.guardar('b', 2, 10)
+    relogio[0] += 40
+    c.obter('b')
+    relogio[0] += 40
+    assert c.obter('b') == (False, None)
+
+
+def test_ttl_e_limites_juntos(relogio):
+    c = caches.Cache('t', ttl=10, max_entradas=2, max_bytes=50)
+    c.guardar('a', 1, 20)
+    relogio[0] += 5
+    c.guardar('b', 2, 20)
+    c.guardar('c', 3, 20)  # passa os 50 bytes: sai 'a', a menos recente
+    assert c.obter('a') == (False, None)
+    relogio[0] += 6  # 'b' e 'c' ainda dentro do TTL
+    assert c.obter('b') == (True, 2)
+    relogio[0] += 10
+    assert c.obter('c') == (False, None)
+    stats = c.estatisticas()
+    assert (stats['despejos'], stats['expiradas'], stats['entradas'], stats['bytes']) == (1, 1, 1, 20)
+    assert stats['acertos'] == 1 and stats['falhas'] == 2 and stats['taxa_acerto'] == 0.333
+
+
+def test_obter_ou_calcular_mede_e_nao_guarda_excecoes():
+    c = caches.Cache('t')
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise ValueError('falhou')
+        return 'valor'
+
+    with pytest.raises(ValueError):
+        c.obter_ou_calcular('k', calcular)
+    assert c.obter_ou_calcular('k', calcular, medir=lambda v: 123) == 'valor'
+    assert c.obter_ou_calcular('k', calcular) == 'valor'
+    assert len(chamadas) == 2
+    assert c.bytes == 123
+
+
+def test_obter_ou_calcular_uma_vez_por_chave():
+    c = caches.Cache('t')
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        time.sleep(0.05)
+        return 42
+
+    threads = [threading.Thread(target=c.obter_ou_calcular, args=('k', calcular)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(chamadas) == 1
+    assert c.obter('k') == (True, 42)
+
+
+def test_em_cache_com_argumentos_nao_hasheaveis():
+    chamadas = []
+
+    @caches.em_cache('teste_em_cache', max_entradas=4)
+    def somar(valores, fator=1):
+        chamadas.append(1)
+        return sum(valores) * fator
+
+    assert somar([1, 2], fator=2) == 6
+    assert somar([1, 2], fator=2) == 6
+    assert somar([1, 3]) == 4
+    assert len(chamadas) == 2
+    somar.limpar()
+    assert somar([1, 2], fator=2) == 6
+    assert len(chamadas) == 3
+    assert somar.cache.acertos == 1
+
+
+def test_obter_cache_reaproveita_e_atualiza_limites():
+    c = caches.obter_cache('teste_reaproveitar', max_entradas=2)
+    c.guardar('a', 1, 1)
+    mesma = caches.obter_cache('teste_reaproveitar', max_entradas=5, ttl=30)
+    assert mesma is c
+    assert (mesma.max_entradas, mesma.ttl) == (5, 30)
+    assert mesma.obter('a') == (True, 1)
+    caches.limpar('teste_reaproveitar')
+    assert mesma.obter('a') == (False, None)
+    assert mesma.acertos == 1  # os contadores mantêm-se
+
+
+def test_tamanho():
+    df = pd.DataFrame({'a': np.zeros(1000), 'b': np.zeros(1000, dtype=np.int8)})
+    assert caches.tamanho(df) == df.memory_usage(deep=True).sum()
+    assert caches.tamanho({'Mensal': df, 'Anual': df.iloc[:10]}) > caches.tamanho(df)
+    assert caches.tamanho('ção') == 5
+    assert caches.tamanho(b'1234') == 4
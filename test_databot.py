@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import databot
+
+# ------------------ Testes do contexto e da sessão do DataBot ------------------
+# O modelo é sempre o databot.ModeloFalso: regista os históricos e as mensagens recebidas.
+
+
+def selecao(n_paises, n_indicadores, anos=range(1990, 2024)):
+    anos = list(anos)
+    paises = [f'País {p}' for p in range(n_paises)]
+    indicadores = [f'Indicador {i}, total (% do PIB)' for i in range(n_indicadores)]
+    indice = pd.MultiIndex.from_product([paises, indicadores, anos], names=['País', 'Indicador', 'Ano'])
+    rng = np.random.default_rng(n_paises * 1000 + n_indicadores)
+    df = pd.DataFrame({'Valor': rng.uniform(1, 1000, len(indice))}, index=indice).reset_index()
+    return df.astype({'País': 'category', 'Indicador': 'category', 'Ano': np.int16})
+
+
+def linhas_series(contexto):
+    return contexto.split('uma série por linha:\n', 1)[1].splitlines()
+
+
+@pytest.fixture(autouse=True)
+def sem_respostas_memorizadas():
+    databot._respostas.clear()
+    yield
+    databot._respostas.clear()
+
+
+@pytest.mark.parametrize('n_paises, n_indicadores, nivel', [
+    (1, 1, 'valores por ano'),
+    (20, 5, 'último valor e tendência'),
+    (200, 50, 'último valor e tendência'),
+])
+def test_contexto_cabe_no_orcamento(n_paises, n_indicadores, nivel):
+    df = selecao(n_paises, n_indicadores, anos=range(2004, 2024))
+    contexto = databot.construir_contexto(df)
+    assert databot.estimar_tokens(contexto) <= databot.TOKENS_CONTEXTO
+    assert f'Resumo dos dados ({nivel})' in contexto
+
+    linhas = [l for l in linhas_series(contexto) if not l.startswith('  valores:')]
+    total = n_paises * n_indicadores
+    if linhas[-1].startswith('(+'):
+        # Séries que não couberam são contadas, não descartadas em silêncio
+        omitidas = int(linhas[-1][2:].split()[0])
+        assert omitidas > 0
+        assert len(linhas) - 1 + omitidas == total
+    else:
+        assert len(linhas) == total
+
+
+def test_contexto_completo_para_selecoes_pequenas():
+    df = selecao(1, 1, anos=range(2020, 2024))
+    contexto = databot.construir_contexto(df)
+    valores = linhas_series(contexto)[1]
+    assert valores.startswith('  valores: 2020: ')
+    assert valores.count(':') == 5
+
+
+def test_contexto_muito_grande_indica_omitidas():
+    contexto = databot.construir_contexto(selecao(200, 50, anos=range(2014, 2024)))
+    assert linhas_series(contexto)[-1].endswith('séries omitidas)')
+
+
+def test_orcamento_menor_reduz_o_detalhe():
+    df = selecao(3, 2)
+    completo = databot.construir_contexto(df, orcamento=5000)
+    curto = databot.construir_contexto(df, orcamento=400)
+    assert 'valores por ano' in completo
+    assert databot.estimar_tokens(curto) <= 400
+    assert 'valores por ano' not in curto
+
+
+def test_atualizar_so_semeia_quando_os_dados_mudam():
+    modelo = databot.ModeloFalso()
+    sessao = databot.SessaoChat(modelo)
+    chamadas = []
+
+    def contexto():
+        chamadas.append(1)
+        return f'contexto {len(chamadas)}'
+
+    assert sessao.atualizar('a', contexto) is True
+    assert sessao.atualizar('a', contexto) is False
+    assert sessao.atualizar('a', contexto) is False
+    # O contexto (caro de montar) só é construído quando é mesmo preciso semear
+    assert len(chamadas) == 1
+    assert len(modelo.chats) == 1
+    assert modelo.chats[0].history[0]['parts'] == ['contexto 1']
+
+    assert sessao.atualizar('b', contexto) is True
+    assert len(chamadas) == 2
+    assert len(modelo.chats) == 2
+    assert modelo.chats[1].history[0]['parts'] == ['contexto 2']
+    assert modelo.chats[1].history[1]['parts'] == [databot.CONFIRMACAO]
+
+
+def test_historico_passa_por_turnos_locais_e_do_modelo():
+    df = selecao(2, 1)
+    modelo = databot.ModeloFalso()
+    sessao = databot.SessaoChat(modelo, turnos_mantidos=2)
+    sessao.atualizar(databot.impressao_digital(df), 'contexto')
+
+    resposta, origem = sessao.responder('Qual foi o maior valor?', df)
+    assert origem == 'local'
+    assert modelo.mensagens == []
+
+    _, origem = sessao.responder('Porque é que o valor subiu?', df)
+    assert origem == 'modelo'
+    # O chat do modelo foi refeito com a resposta local no histórico antes da pergunta
+    historico = modelo.chats[-1].history
+    assert historico[2:4] == [{'role': 'user', 'parts': ['Qual foi o maior valor?']},
+                              {'role': 'model', 'parts': [resposta]}]
+    assert modelo.mensagens == ['Porque é que o valor subiu?']
+
+    sessao.responder('E em 2019?', df)
+    assert len(sessao.turnos) == 3
+    # Novos dados: nova conversa com os dois últimos turnos, locais ou do modelo
+    sessao.atualizar('outra', 'contexto novo')
+    historico = modelo.chats[-1].history
+    assert historico[0]['parts'] == ['contexto novo']
+    assert [h['parts'][0] for h in historico[2::2]] == ['Porque é que o valor subiu?', 'E em 2019?']
+
+
+def test_so_respostas_locais_sao_memorizadas():
+    df = selecao(2, 1)
+    impressao = databot.impressao_digital(df)
+    modelo = databot.ModeloFalso()
+    primeira, segunda = databot.SessaoChat(modelo), databot.SessaoChat(modelo)
+    primeira.atualizar(impressao, 'contexto')
+    segunda.atualizar(impressao, 'contexto')
+
+    resposta, origem = primeira.responder('Qual foi o maior valor?', df)
+    assert origem == 'local'
+    # Outra sessão com os mesmos dados reutiliza a resposta local, e ela entra no seu histórico
+    assert segunda.responder('qual foi o MAIOR valor?', df) == (resposta, 'memoria')
+    assert segunda.turnos == [('qual foi o MAIOR valor?', resposta)]
+
+    primeira.responder('Explique a tendência', df)
+    segunda.responder('Explique a tendência', df)
+    assert modelo.mensagens == ['Explique a tendência', 'Explique a tendência']
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+import graficos
+
+# ------------------ Testes da redução de pontos e dos histogramas ------------------
+
+
+def test_lttb_sem_reducao():
+    x = np.arange(10, dtype=float)
+    # Orçamento maior ou igual ao número de pontos, ou pequeno demais para haver baldes
+    for limite in (10, 11, 500, 2, 0):
+        assert np.array_equal(graficos.lttb(x, x, limite), np.arange(10))
+
+
+def test_lttb_mantem_extremos_e_ordem():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000, dtype=float)
+    y = rng.normal(size=1000).cumsum()
+    y[637] = 100.0  # pico isolado
+    indices = graficos.lttb(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 637 in indices
+
+
+def test_lttb_com_tres_pontos():
+    x = np.arange(7, dtype=float)
+    y = np.array([0, 1, 0, 9, 0, 1, 0], dtype=float)
+    assert list(graficos.lttb(x, y, 3)) == [0, 3, 6]
+
+
+def longo(valores, x=None, indicador='A'):
+    x = np.arange(len(valores)) if x is None else x
+    return pd.DataFrame({'Período': x, 'Indicador': indicador, 'Valor': valores})
+
+
+def test_reduzir_respeita_limite_por_serie():
+    df = pd.concat([longo(np.sin(np.arange(300) / 10), indicador='A'),
+                    longo(np.arange(40, dtype=float), indicador='B')])
+    reduzido = graficos.reduzir(df, 'Período', 'Valor', grupo='Indicador', limite=60)
+    tamanhos = reduzido.groupby('Indicador').size()
+    assert tamanhos['A'] == 60
+    assert tamanhos['B'] == 40  # já cabia no orçamento: fica inteira
+
+
+def test_reduzir_ignora_nan_no_fim():
+    # Só os valores válidos contam para o orçamento; uma série reduzida perde os NaN
+    valores = np.r_[np.arange(100, dtype=float), [np.nan] * 50]
+    reduzido = graficos.reduzir(longo(valores), 'Período', 'Valor', limite=20)
+    assert len(reduzido) == 20
+    assert reduzido['Valor'].notna().all()
+    assert reduzido['Período'].iloc[-1] == 99
+
+    curta = graficos.reduzir(longo(valores), 'Período', 'Valor', limite=120)
+    assert len(curta) == 150
+
+
+def test_reduzir_ordena_e_aceita_datas():
+    datas = pd.date_range('2000-01-31', periods=200, freq='ME')
+    df = longo(np.arange(200, dtype=float), x=datas).iloc[::-1]
+    reduzido = graficos.reduzir(df, 'Período', 'Valor', limite=25)
+    assert len(reduzido) == 25
+    assert reduzido['Período'].is_monotonic_increasing
+    assert reduzido['Período'].iloc[0] == datas[0] and reduzido['Período'].iloc[-1] == datas[-1]
+
+
+def test_largo_para_longo():
+    df = pd.DataFrame({'A': np.arange(100, dtype=float), 'B': np.ones(100)},
+                      index=pd.date_range('2000-01-31', periods=100, freq='ME'))
+    longo_df = graficos.largo_para_longo(df, ['A', 'B'], limite=10)
+    assert list(longo_df.columns) == ['Período', 'Indicador', 'Valor']
+    assert longo_df.groupby('Indicador').size().to_dict() == {'A': 10, 'B': 10}
+
+
+def test_histograma_contagens_com_intervalos_comuns():
+    df = pd.DataFrame({'A': [1.0, 2.0, 2.5, np.nan, 9.0], 'B': [5.0, 5.0, np.nan, np.nan, np.nan],
+                       'C': [np.nan] * 5})
+    fig = graficos.histograma(df, ['A', 'B', 'C'], nbins=4)
+    barras = [t for t in fig.data if t.type == 'bar']
+    caixas = [t for t in fig.data if t.type == 'box']
+    assert [b.name for b in barras] == ['A', 'B', 'C']
+    assert [sum(b.y) for b in barras] == [4, 2, 0]
+    # Os mesmos intervalos para todas as colunas, entre o mínimo e o máximo de todas
+    for b in barras[1:]:
+        assert list(b.x) == list(barras[0].x)
+    assert barras[0].x[0] - barras[0].width[0] / 2 == 1.0
+    assert barras[0].x[-1] + barras[0].width[-1] / 2 == 9.0
+    # Sem valores não há boxplot
+    assert [c.name for c in caixas] == ['A', 'B']
+    assert caixas[0].median[0] == 2.25
+
+
+def test_histograma_sem_resumo_e_sem_dados():
+    df = pd.DataFrame({'A': [np.nan, np.nan]})
+    fig = graficos.histograma(df, ['A'], resumo=False)
+    assert [t.type for t in fig.data] == ['bar']
+    assert sum(fig.data[0].y) == 0
+
+
+def test_modo_render():
+    assert graficos.modo_render(pd.DataFrame(index=range(graficos.LIMIAR_WEBGL))) == 'svg'
+    assert graficos.modo_render(pd.DataFrame(index=range(graficos.LIMIAR_WEBGL + 1))) == 'webgl'
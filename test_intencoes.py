@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import intencoes
+
+# ------------------ Testes das respostas locais do DataBot ------------------
+# Seleção fixa: dois países e dois indicadores, 2000-2020, valores que crescem 10% do valor
+# inicial por ano (Moçambique o dobro do Malawi).
+
+PIB = 'GDP (current US$)'
+INFLACAO = 'Inflation, consumer prices (annual %)'
+ANOS = list(range(2000, 2021))
+
+
+@pytest.fixture
+def dados():
+    linhas = [(pais, indicador, ano, base * escala * (1 + (ano - 2000) / 10))
+              for pais, base in (('Mozambique', 2), ('Malawi', 1))
+              for indicador, escala in ((PIB, 1e9), (INFLACAO, 1))
+              for ano in ANOS]
+    df = pd.DataFrame(linhas, columns=['País', 'Indicador', 'Ano', 'Valor'])
+    return df.astype({'País': 'category', 'Indicador': 'category', 'Ano': np.int16})
+
+
+@pytest.mark.parametrize('pergunta, intencao, lingua', [
+    ('Qual foi o maior valor do PIB?', 'maximo', 'pt'),
+    ('Qual o máximo da inflação?', 'maximo', 'pt'),
+    ('Em que ano o PIB teve o valor mais baixo?', 'minimo', 'pt'),
+    ('Qual foi a média do PIB entre 2010 e 2015?', 'media', 'pt'),
+    ('Qual é o último valor da inflação?', 'ultimo', 'pt'),
+    ('Qual foi o crescimento do PIB entre 2005 e 2015?', 'crescimento', 'pt'),
+    ('Compare Moçambique e Malawi', 'comparar', 'pt'),
+    ('Qual foi o valor da inflação em 2015?', 'valor_ano', 'pt'),
+    ('Qual foi a inflação em 2015?', 'indicador_ano', 'pt'),
+    ('What was the highest value of GDP?', 'maximo', 'en'),
+    ('What is the highest value of GDP?', 'maximo', 'en'),
+    ('When was inflation at its lowest level?', 'minimo', 'en'),
+    ('What was the average GDP between 2010 and 2015?', 'media', 'en'),
+    ('What is the latest value for inflation?', 'ultimo', 'en'),
+    ('How much did GDP grow between 2005 and 2015?', 'crescimento', 'en'),
+    ('Compare Mozambique and Malawi', 'comparar', 'en'),
+    ('What was the value of GDP in 2015?', 'valor_ano', 'en'),
+    ('Show me the min and max', 'extremos', 'en'),
+    ('Qual o valor máximo e mínimo do PIB?', 'extremos', 'pt'),
+])
+def test_modelos_de_frase(pergunta, intencao, lingua):
+    assert intencoes.identificar(pergunta) == (intencao, lingua)
+
+
+@pytest.mark.parametrize('pergunta', [
+    'What does GDP mean?',
+    'O que significa PIB?',
+    'O que é a inflação?',
+    'What is GDP growth?',
+    'Porque é que a inflação subiu em 2016?',
+    'Explain the latest value',
+    # Superlativos e "atual" sem referência a valores não são sobre a seleção
+    'Which country has the largest population?',
+    'Quais são os países com maior PIB do mundo?',
+    'What is the current account balance?',
+    'Qual a inflação atual?',
+    # "últimos 5 anos" não é o último valor
+    'What was GDP in the last 5 years?',
+    'Quais foram os valores nos últimos 5 anos?',
+])
+def test_perguntas_que_seguem_para_o_modelo(pergunta, dados):
+    assert intencoes.identificar(pergunta) is None
+    assert intencoes.responder(pergunta, dados) is None
+
+
+def test_maior_valor(dados):
+    resposta = intencoes.responder('Qual foi o maior valor do PIB?', dados)
+    assert resposta.startswith('**Maior valor**')
+    assert '- Mozambique: **6,000,000,000.00** em 2020' in resposta
+    assert 'O maior de todos: **Mozambique**' in resposta
+    assert INFLACAO not in resposta
+
+
+def test_minimo_e_maximo(dados):
+    resposta = intencoes.responder('Show me the min and max of inflation', dados)
+    assert resposta.startswith('**Highest and lowest value**')
+    assert '*Highest value*' in resposta and '*Lowest value*' in resposta
+    assert '- Mozambique: **6.00** in 2020' in resposta
+    assert '- Mozambique: **2.00** in 2000' in resposta
+    assert 'Lowest overall: **Malawi** (1.00 in 2000)' in resposta
+
+
+def test_media_no_intervalo(dados):
+    resposta = intencoes.responder('What was the average inflation between 2010 and 2020?', dados)
+    assert resposta.startswith('**Average between 2010–2020**')
+    assert '- Malawi: **2.50** (2010–2020)' in resposta
+
+
+def test_ultimos_anos_sao_um_intervalo(dados):
+    resposta = intencoes.responder('Qual foi a média da inflação nos últimos 5 anos?', dados)
+    assert '**Média entre 2016–2020**' in resposta
+    assert '- Malawi: **2.80** (2016–2020)' in resposta
+
+    resposta = intencoes.responder('How did inflation change in the last 10 years?', dados)
+    assert '- Malawi: 2.10 (2011) → 3.00 (2020)' in resposta
+
+
+def test_valor_num_ano(dados):
+    for pergunta in ('Qual foi a inflação em 2015?', 'Qual foi o valor da inflação em 2015?'):
+        resposta = intencoes.responder(pergunta, dados)
+        assert resposta.startswith('**Valor em 2015**')
+        assert '- Mozambique: **5.00**' in resposta
+        assert '- Malawi: **2.50**' in resposta
+    # Sem nomear um indicador, "em 2015" sozinho não chega
+    assert intencoes.responder('O que aconteceu em 2015?', dados) is None
+
+
+def test_ultimo_valor(dados):
+    resposta = intencoes.responder('What is the latest value for inflation in Malawi?', dados)
+    assert resposta.startswith('**Latest value**')
+    assert '**3.00** (2020), +3.4% vs previous year' in resposta
+    assert 'Mozambique' not in resposta
+
+
+def test_crescimento(dados):
+    resposta = intencoes.responder('Qual foi o crescimento da inflação do Malawi entre 2000 e 2010?', dados)
+    assert '1.00 (2000) → 2.00 (2010), **+100.0%** (+7.18% ao ano)' in resposta
+
+
+def test_comparacao(dados):
+    resposta = intencoes.responder('Compare Moçambique e Malawi na inflação', dados)
+    linhas = resposta.splitlines()
+    assert linhas[0] == '**Comparação**'
+    assert linhas[2].startswith('- Mozambique: **6.00** (2020), CAGR')
+    assert linhas[3].startswith('- Malawi: **3.00** (2020)')
+
+
+def test_sem_dados(dados):
+    assert intencoes.responder('Qual foi o maior valor?', dados.iloc[0:0]) is None
+    assert intencoes.responder('Qual foi o maior valor?', dados.assign(Valor=np.nan)) is None
+
+
+@pytest.mark.parametrize('pergunta', [
+    # País ou indicador fora da seleção: não responder sobre a seleção inteira
+    'Qual foi o maior valor do PIB da África do Sul?',
+    'What was the highest value of GDP in Kenya?',
+    'Compare Moçambique e Tanzânia',
+    'Qual foi o maior valor da população?',
+    'What was the unemployment rate value in 2015?',
+    'Qual foi a taxa de juros em 2015?',
+    'What is the highest value in the world?',
+    # Ano sem nenhum valor
+    'Qual foi a inflação em 2030?',
+    'What was the value of GDP in 1990?',
+])
+def test_entidades_fora_da_selecao(pergunta, dados):
+    assert intencoes.identificar(pergunta) is not None
+    assert intencoes.responder(pergunta, dados) is None
+
+
+def test_entidades_da_selecao(dados):
+    resposta = intencoes.responder('Qual foi o maior valor do PIB de Moçambique?', dados)
+    assert '**6,000,000,000.00** em 2020' in resposta
+    assert 'Malawi' not in resposta and INFLACAO not in resposta
+    # O termo em português chega aos indicadores com "GDP" no nome
+    resposta = intencoes.responder('Qual foi o maior valor do produto interno bruto?', dados)
+    assert PIB not in resposta and INFLACAO not in resposta
+    assert '- Malawi: **3,000,000,000.00** em 2020' in resposta
+
+
+def test_ano_com_dados_em_parte(dados):
+    sem_malawi = dados[~((dados['País'] == 'Malawi') & (dados['Ano'] == 2015))]
+    resposta = intencoes.responder('Qual foi a inflação em 2015?', sem_malawi)
+    assert '- Mozambique: **5.00**' in resposta
+    assert '- Malawi: sem dados' in resposta
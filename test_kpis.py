@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpis import COLUNAS, calcular_kpis, calcular_kpis_largo
+
+# ------------------ Testes do kpis.calcular_kpis ------------------
+
+
+def longo(series):
+    # {(país, indicador): [(ano, valor), ...]} -> formato longo
+    linhas = [(p, i, a, v) for (p, i), pontos in series.items() for a, v in pontos]
+    return pd.DataFrame(linhas, columns=['País', 'Indicador', 'Ano', 'Valor'])
+
+
+def kpis_de(series, **opcoes):
+    return calcular_kpis(longo(series), ['País', 'Indicador'], 'Ano', **opcoes)
+
+
+def test_ultimo_e_penultimo_ignoram_nan_no_fim():
+    k = kpis_de({('MOZ', 'PIB'): [(2000, 100.0), (2001, 110.0), (2002, np.nan), (2003, np.nan)]})
+    linha = k.loc[('MOZ', 'PIB')]
+    assert (linha['atual'], linha['periodo_atual']) == (110.0, 2001)
+    assert (linha['anterior'], linha['periodo_anterior']) == (100.0, 2000)
+    assert linha['variacao'] == pytest.approx(10.0)
+    assert linha['observacoes'] == 2
+
+
+def test_ordem_das_linhas_nao_importa():
+    k = kpis_de({('MOZ', 'PIB'): [(2002, 121.0), (2000, 100.0), (2001, 110.0)]})
+    assert k.loc[('MOZ', 'PIB'), 'periodo_atual'] == 2002
+    assert k.loc[('MOZ', 'PIB'), 'anterior'] == 110.0
+
+
+def test_cagr_no_intervalo():
+    k = kpis_de({('MOZ', 'PIB'): [(2000, 100.0), (2001, np.nan), (2002, 121.0)]})
+    assert k.loc[('MOZ', 'PIB'), 'cagr'] == pytest.approx(10.0)
+
+
+def test_cagr_e_variacao_indefinidos():
+    k = kpis_de({
+        ('MOZ', 'PIB'): [(2000, 0.0), (2001, 5.0)],        # começa em zero
+        ('MWI', 'PIB'): [(2000, -2.0), (2001, 3.0)],       # valor negativo
+        ('ZAF', 'PIB'): [(2005, 7.0)],                     # uma só observação
+    })
+    assert np.isnan(k.loc[('MOZ', 'PIB'), 'variacao'])
+    assert k[['cagr']].isna().all().all()
+    assert np.isnan(k.loc[('ZAF', 'PIB'), 'anterior'])
+    assert np.isnan(k.loc[('ZAF', 'PIB'), 'periodo_anterior'])
+    assert k.loc[('ZAF', 'PIB'), 'observacoes'] == 1
+
+
+def test_media_movel_usa_as_ultimas_observacoes_validas():
+    pontos = [(2000, 1.0), (2001, 2.0), (2002, np.nan), (2003, 3.0), (2004, 4.0), (2005, np.nan)]
+    k = kpis_de({('MOZ', 'PIB'): pontos}, janela=3)
+    assert k.loc[('MOZ', 'PIB'), 'media_movel'] == pytest.approx(3.0)
+
+
+def test_grupo_sem_valores_e_omitido():
+    k = kpis_de({('MOZ', 'PIB'): [(2000, 1.0)], ('MWI', 'PIB'): [(2000, np.nan), (2001, np.nan)]})
+    assert list(k.index) == [('MOZ', 'PIB')]
+
+
+def test_sem_dados():
+    k = kpis_de({('MOZ', 'PIB'): [(2000, np.nan)]})
+    assert k.empty
+    assert list(k.columns) == COLUNAS
+    assert list(k.index.names) == ['País', 'Indicador']
+
+
+def test_tempo_em_datas():
+    df = pd.DataFrame({'Indicador': 'Crédito',
+                       'Data': pd.to_datetime(['2020-01-01', '2021-01-01', '2022-01-01']),
+                       'Valor': [100.0, np.nan, 144.0]})
+    k = calcular_kpis(df, ['Indicador'], 'Data')
+    assert k.loc['Crédito', 'periodo_atual'] == pd.Timestamp('2022-01-01')
+    # 731 dias / 365.25 ~ 2 anos
+    assert k.loc['Crédito', 'cagr'] == pytest.approx(20.0, abs=0.02)
+
+
+def test_formato_largo():
+    df = pd.DataFrame({'A': [1.0, 2.0, np.nan], 'B': [5.0, np.nan, 4.0]},
+                      index=pd.Index(pd.to_datetime(['2023-01-31', '2023-02-28', '2023-03-31']), name='Data'))
+    k = calcular_kpis_largo(df, ['A', 'B'])
+    assert k.loc['A', 'atual'] == 2.0
+    assert k.loc['B', 'atual'] == 4.0
+    assert k.loc['B', 'variacao'] == pytest.approx(-20.0)
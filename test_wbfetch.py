@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+import pytest
+
+import wbfetch
+import wbstub
+
+# ------------------ Testes do wbfetch.fetch_chunked contra o wbstub ------------------
+# Cada teste arranca a API simulada numa porta livre, com a latência e os erros que precisa,
+# e confere o formato largo (economy, series) x YRxxxx com os valores sintéticos do wbstub.
+
+SERIES = ['NY.GDP.MKTP.CD', 'AG.LND.TOTL.K2', 'SP.POP.TOTL', 'FP.CPI.TOTL.ZG']
+ECONOMIAS = ['MOZ', 'MWI', 'ZAF', 'TZA', 'ZWE']
+ANOS = list(range(2000, 2010))
+
+
+@pytest.fixture
+def stub():
+    servidores = []
+
+    def arrancar(**opcoes):
+        servidor, endpoint = wbstub.iniciar(**opcoes)
+        servidores.append(servidor)
+        return servidor, endpoint
+
+    yield arrancar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def buscar(endpoint, series=SERIES, economias=ECONOMIAS, **opcoes):
+    # Blocos pequenos para haver vários pedidos em paralelo
+    opcoes = {'series_por_bloco': 1, 'economias_por_bloco': 2, 'max_workers': 4, 'espera_base': 0.01, **opcoes}
+    return wbfetch.fetch_chunked(series, economias, ANOS, endpoint=endpoint, **opcoes)
+
+
+def verificar(wide, series=SERIES, economias=ECONOMIAS):
+    assert list(wide.index.names) == ['economy', 'series']
+    assert list(wide.columns) == [f'YR{a}' for a in ANOS]
+    assert wide.index.is_monotonic_increasing
+    assert len(wide) == len(series) * len(economias)
+    for (economia, serie), linha in wide.iterrows():
+        esperado = [wbstub.valor_sintetico(serie, economia, a) for a in ANOS]
+        np.testing.assert_allclose(linha.to_numpy(), esperado)
+
+
+def test_blocos_fora_de_ordem_sao_juntados(stub, monkeypatch):
+    # Com jitter os blocos chegam por ordem aleatória; páginas pequenas obrigam a juntar várias por bloco
+    monkeypatch.setattr(wbfetch, 'POR_PAGINA', 7)
+    servidor, endpoint = stub(jitter=0.02)
+    verificar(buscar(endpoint))
+    # 4 séries x 3 blocos de economias, com 2 a 3 páginas cada
+    assert servidor.RequestHandlerClass.pedidos > 12
+
+
+def test_um_so_bloco_igual_a_varios(stub):
+    _, endpoint = stub()
+    varios = buscar(endpoint)
+    um = buscar(endpoint, series_por_bloco=len(SERIES), economias_por_bloco=len(ECONOMIAS))
+    assert varios.equals(um)
+
+
+def test_repete_503_transitorios(stub):
+    # Cada URL responde 503 duas vezes antes de responder; com 4 tentativas todos os blocos chegam
+    servidor, endpoint = stub(erros_seguidos=2)
+    verificar(buscar(endpoint, tentativas=4))
+    blocos = len(SERIES) * 3
+    assert servidor.RequestHandlerClass.pedidos == blocos * 3
+
+
+def test_desiste_apos_as_tentativas(stub):
+    servidor, endpoint = stub(erros_seguidos=5)
+    with pytest.raises(wbfetch.WBFetchError, match='falhou após 3 tentativas') as erro:
+        buscar(endpoint, tentativas=3)
+    assert erro.value.parcial.empty
+    assert servidor.RequestHandlerClass.pedidos == len(SERIES) * 3 * 3
+
+
+def test_falha_parcial_devolve_blocos_recebidos(stub):
+    _, endpoint = stub(series_com_erro=['SP.POP.TOTL'])
+    with pytest.raises(wbfetch.WBFetchError, match='3 de 12 blocos falharam') as erro:
+        buscar(endpoint, tentativas=2)
+    assert not isinstance(erro.value, wbfetch.PedidoCancelado)
+    parcial = erro.value.parcial
+    restantes = [s for s in SERIES if s != 'SP.POP.TOTL']
+    assert sorted(parcial.index.get_level_values('series').unique()) == sorted(restantes)
+    verificar(parcial, series=restantes)
+
+
+def test_cancelamento_abandona_blocos_por_pedir(stub):
+    # Um bloco de cada vez, 0.2 s por pedido; o cancelamento chega durante o segundo bloco
+    servidor, endpoint = stub(latencia=0.2)
+    cancelado = threading.Event()
+    threading.Timer(0.3, cancelado.set).start()
+    with pytest.raises(wbfetch.PedidoCancelado) as erro:
+        buscar(endpoint, max_workers=1, cancelado=cancelado)
+    blocos = len(SERIES) * 3
+    assert 0 < servidor.RequestHandlerClass.pedidos < blocos
+    parcial = erro.value.parcial
+    assert 0 < len(parcial) < len(SERIES) * len(ECONOMIAS)
+    # O que chegou está completo e correto
+    assert parcial.notna().all().all()
+    for (economia, serie), linha in parcial.iterrows():
+        assert linha['YR2005'] == wbstub.valor_sintetico(serie, economia, 2005)
+
+
+def test_cancelado_antes_de_comecar(stub):
+    servidor, endpoint = stub()
+    cancelado = threading.Event()
+    cancelado.set()
+    with pytest.raises(wbfetch.PedidoCancelado, match='0 de 12 blocos') as erro:
+        buscar(endpoint, cancelado=cancelado)
+    assert erro.value.parcial.empty
+    assert servidor.RequestHandlerClass.pedidos == 0
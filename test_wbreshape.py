@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import wbreshape
+
+# ------------------ Testes do wbreshape.para_longo ------------------
+# Cada teste monta diretamente uma das tabelas largas que o wb.data.DataFrame pode devolver
+# e compara o formato longo com os valores das células de origem.
+
+SERIES = ['NY.GDP.MKTP.CD', 'AG.LND.TOTL.K2', 'SP.POP.TOTL']
+INDICADORES = ['GDP (current US$)', 'Agricultural land (sq. km)', 'Population, total']
+ECONOMIAS = ['MWI', 'MOZ', 'ZAF']
+PAISES = ['Malawi', 'Mozambique', 'South Africa']
+ANOS = [2000, 2001, 2002, 2003]
+
+
+def valor(economia, serie, ano):
+    # Valor determinístico e distinto para cada célula
+    return ECONOMIAS.index(economia) * 10000 + SERIES.index(serie) * 100 + (ano - 2000) + 0.5
+
+
+def largo(economias, series, anos=ANOS, ordem=('economy', 'series'), nomes_anos=None):
+    # Tabela (economy, series) x YRxxxx, no formato completo do wb.data.DataFrame
+    pares = {'economy': economias, 'series': series}
+    index = pd.MultiIndex.from_product([pares[ordem[0]], pares[ordem[1]]], names=list(ordem))
+    colunas = nomes_anos or [f'YR{a}' for a in anos]
+    dados = [[valor(*(par if ordem[0] == 'economy' else par[::-1]), a) for a in anos] for par in index]
+    return pd.DataFrame(dados, index=index, columns=pd.Index(colunas, name='time'))
+
+
+def converter(df, economias, series):
+    return wbreshape.para_longo(
+        df, series=series, indicadores=[INDICADORES[SERIES.index(s)] for s in series],
+        economias=economias, paises=[PAISES[ECONOMIAS.index(e)] for e in economias])
+
+
+def verificar(longo, economias, series, anos=ANOS):
+    assert list(longo.columns) == ['País', 'Indicador', 'Ano', 'Valor']
+    assert len(longo) == len(economias) * len(series) * len(anos)
+    # Categorias na ordem da seleção, com os nomes em vez dos códigos
+    assert list(longo['País'].cat.categories) == [PAISES[ECONOMIAS.index(e)] for e in economias]
+    assert list(longo['Indicador'].cat.categories) == [INDICADORES[SERIES.index(s)] for s in series]
+    assert longo['Ano'].dtype == np.int16
+    assert longo.notna().all().all()
+    for pais, indicador, ano, v in longo.itertuples(index=False, name=None):
+        economia, serie = ECONOMIAS[PAISES.index(pais)], SERIES[INDICADORES.index(indicador)]
+        assert v == valor(economia, serie, ano)
+    # Cada combinação (país, indicador, ano) aparece uma só vez
+    assert not longo.duplicated(['País', 'Indicador', 'Ano']).any()
+
+
+def test_varias_series_varias_economias():
+    verificar(converter(largo(ECONOMIAS, SERIES), ECONOMIAS, SERIES), ECONOMIAS, SERIES)
+
+
+def test_multiindex_series_economy():
+    df = largo(ECONOMIAS, SERIES, ordem=('series', 'economy'))
+    verificar(converter(df, ECONOMIAS, SERIES), ECONOMIAS, SERIES)
+
+
+def test_ordem_da_selecao_diferente_da_tabela():
+    # A tabela vem ordenada pelos códigos; as categorias seguem a seleção
+    economias, series = ['ZAF', 'MWI'], ['SP.POP.TOTL', 'NY.GDP.MKTP.CD']
+    df = largo(sorted(economias), sorted(series))
+    verificar(converter(df, economias, series), economias, series)
+
+
+def test_uma_serie_varias_economias():
+    # Com uma só série o wb.data.DataFrame omite o nível 'series'
+    df = largo(ECONOMIAS, SERIES[:1]).droplevel('series')
+    verificar(converter(df, ECONOMIAS, SERIES[:1]), ECONOMIAS, SERIES[:1])
+
+
+def test_uma_economia_varias_series():
+    df = largo(ECONOMIAS[:1], SERIES).droplevel('economy')
+    verificar(converter(df, ECONOMIAS[:1], SERIES), ECONOMIAS[:1], SERIES)
+
+
+def test_uma_serie_uma_economia():
+    df = largo(ECONOMIAS[1:2], SERIES[1:2]).droplevel('series')
+    verificar(converter(df, ECONOMIAS[1:2], SERIES[1:2]), ECONOMIAS[1:2], SERIES[1:2])
+
+
+def test_anos_no_indice():
+    # columns='economy': anos nas linhas, uma coluna por economia
+    df = largo(ECONOMIAS, SERIES[:1]).droplevel('series').T
+    verificar(converter(df, ECONOMIAS, SERIES[:1]), ECONOMIAS, SERIES[:1])
+
+
+def test_anos_numericos_e_eixos_sem_nome():
+    # numericTimeKeys=True e eixos sem nome: as dimensões são deduzidas dos valores
+    df = largo(ECONOMIAS, SERIES[:1], nomes_anos=ANOS).droplevel('series')
+    df.index.name = None
+    df.columns.name = None
+    verificar(converter(df, ECONOMIAS, SERIES[:1]), ECONOMIAS, SERIES[:1])
+
+
+def test_colunas_de_nomes():
+    # labels=True acrescenta colunas com os nomes, que são ignoradas
+    df = largo(ECONOMIAS, SERIES)
+    df.insert(0, 'Country', [PAISES[ECONOMIAS.index(e)] for e in df.index.get_level_values('economy')])
+    df.insert(1, 'Series', [INDICADORES[SERIES.index(s)] for s in df.index.get_level_values('series')])
+    verificar(converter(df, ECONOMIAS, SERIES), ECONOMIAS, SERIES)
+
+
+def test_valores_em_falta_mantidos():
+    df = largo(ECONOMIAS, SERIES)
+    df.iloc[0, 0] = np.nan
+    longo = converter(df, ECONOMIAS, SERIES)
+    assert len(longo) == len(ECONOMIAS) * len(SERIES) * len(ANOS)
+    assert longo['Valor'].isna().sum() == 1
+
+
+def test_eixo_nao_identificado():
+    df = largo(ECONOMIAS, SERIES[:1]).droplevel('series')
+    df.index = pd.Index(['X1', 'X2', 'X3'])
+    with pytest.raises(ValueError, match='dimensão do eixo'):
+        converter(df, ECONOMIAS, SERIES[:1])
+
+
+def test_dimensao_omitida_com_varios_codigos():
+    # Sem o nível 'series' só é possível preencher a dimensão se a seleção tiver um único código
+    df = largo(ECONOMIAS, SERIES[:1]).droplevel('series')
+    with pytest.raises(ValueError, match="dimensão 'series'"):
+        converter(df, ECONOMIAS, SERIES[:2])
+
+
+# ------------------ Testes dos tipos compactos (compactar, legenda) ------------------
+
+def longo_objetos():
+    # Formato longo como o melt o devolvia antes dos tipos compactos: strings e anos em texto
+    linhas = [(p, i, str(a), valor(ECONOMIAS[PAISES.index(p)], SERIES[INDICADORES.index(i)], a))
+              for p in PAISES for i in INDICADORES for a in ANOS]
+    df = pd.DataFrame(linhas, columns=['País', 'Indicador', 'Ano', 'Valor'])
+    df.loc[3, 'Valor'] = np.nan
+    return df
+
+
+def test_compactar_tipos_e_ida_e_volta():
+    original = longo_objetos()
+    compacto = wbreshape.compactar(original.copy(), paises=PAISES[::-1], indicadores=INDICADORES)
+    assert isinstance(compacto['País'].dtype, pd.CategoricalDtype)
+    assert isinstance(compacto['Indicador'].dtype, pd.CategoricalDtype)
+    assert list(compacto['País'].cat.categories) == PAISES[::-1]
+    assert compacto['Ano'].dtype == np.int16
+    assert compacto['Valor'].dtype == np.float64
+    # Os valores não mudam: de volta a strings/inteiros dá a tabela original
+    volta = compacto.astype({'País': str, 'Indicador': str, 'Ano': str})
+    pd.testing.assert_frame_equal(volta, original)
+    assert compacto.memory_usage(deep=True).sum() < original.memory_usage(deep=True).sum()
+
+
+def test_compactar_float32_opcional():
+    compacto = wbreshape.compactar(longo_objetos(), float32=True)
+    assert compacto['Valor'].dtype == np.float32
+    # Os valores sintéticos (x.5 abaixo de 2^24) são exatos em float32
+    np.testing.assert_array_equal(compacto['Valor'].to_numpy(np.float64), longo_objetos()['Valor'].to_numpy())
+    # Sem ordem pedida as categorias seguem a ordem de aparição
+    assert list(compacto['País'].cat.categories) == PAISES
+
+
+def test_para_longo_valores_inalterados():
+    df = largo(ECONOMIAS, SERIES)
+    longo = converter(df, ECONOMIAS, SERIES)
+    assert longo['Valor'].dtype == np.float64
+    assert sorted(longo['Valor']) == sorted(df.to_numpy().ravel())
+    compacto = wbreshape.para_longo(df, series=SERIES, economias=ECONOMIAS, float32=True)
+    assert compacto['Valor'].dtype == np.float32
+    np.testing.assert_array_equal(compacto['Valor'].to_numpy(np.float64), longo['Valor'].to_numpy())
+
+
+def test_legenda_a_partir_dos_codigos():
+    longo = converter(largo(ECONOMIAS, SERIES[:2]), ECONOMIAS, SERIES[:2])
+    rotulos = wbreshape.legenda(longo)
+    esperado = longo['País'].astype(str) + ' - ' + longo['Indicador'].astype(str)
+    assert list(rotulos.astype(str)) == list(esperado)
+    assert len(rotulos.categories) == len(ECONOMIAS) * 2
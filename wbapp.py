@@ -1,7 +1,19 @@
+import os
+import time
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import wbgapi as wb
+
+import caches
+import databot
+import exportar
+import medicao
+import wbcache
+import wbdados
+import wbfundo
+import wdi
+from kpis import calcular_kpis
+from wbfetch import WBFetchError
 
 # ------------------ Page config ------------------
 st.set_page_config(
@@ -14,20 +26,38 @@ with e:
     st.info("## **🇲o🇿dados🌍**")
 st.caption("ℹ Os dados utilizados neste projecto são fornecidos pelo **Banco Mundial** através da *world bank api*")
 tab1, tab2, tab3 = st.tabs(['🏦 Indicador', '🤖 DataBot', 'ℹ️ Sobre o Projecto'])
+painel_desempenho = medicao.painel_ativo(st.query_params)
+admin = caches.admin_ativo(st.query_params)
+
+
+# Tempo de cada etapa deste rerun (log JSON; painel lateral com ?desempenho=1)
+medir = medicao.Medicao('wbapp')
 
 
 # ------------------ Cache functions ------------------
-@st.cache_data
-def get_topics():
-    return list(wb.topic.list())
+# As listas e o catálogo também ficam em disco (wbdados), pré-aquecidos pelo preaquecer.py;
+# em memória expiram ao fim de um dia para apanhar as versões novas escritas em disco.
+# medicao.falha_cache() só corre quando a cache em memória não tinha o valor
+LISTAS_TTL = 24 * 3600
 
-@st.cache_data
-def get_indicators(topic_id):
-    return list(wb.series.list())
 
-@st.cache_data
+@caches.em_cache('wb_topicos', ttl=LISTAS_TTL, max_entradas=1)
+def get_topics():
+    medicao.falha_cache()
+    return wbdados.carregar_topicos()
+
+# O catálogo já vem indexado e ordenado e é partilhado sem cópia entre reruns e sessões;
+# o tamanho é o estimado pelo próprio catálogo quando foi construído
+@caches.em_cache('wb_catalogo', ttl=LISTAS_TTL, max_entradas=1, medir=lambda catalogo: catalogo.nbytes)
+def get_indicators():
+    medicao.falha_cache()
+    return wbdados.carregar_catalogo()
+
+# Guardado como DataFrame compacto (nome -> id, já ordenado) em vez de uma lista de dicts
+@caches.em_cache('wb_paises', ttl=LISTAS_TTL, max_entradas=1)
 def get_countries():
-    return list(wb.economy.list())
+    medicao.falha_cache()
+    return wbdados.carregar_paises()
 
 # ------------------ Sidebar ------------------
 st.sidebar.subheader('Moçambique')
@@ -38,35 +68,53 @@ st.sidebar.image(
 with tab1:
     with st.expander('Ajuda'):
         st.write("""Por exemplo: Como encontro a inflação? 
-        Comece escrevendo com letra maiúscula em inglês na barra de seleção de indicadores: **Inflation** ... e selecione o seu indicador.
-        Noutros casos como **PIB** deve ser GDP...
+        Escreva **inflação** (ou **Inflation**) na pesquisa de indicadores e selecione o seu indicador na lista.
+        A pesquisa aceita termos em português como **PIB**, pequenos erros de escrita e pode ser filtrada por tópico.
         Caso ainda enfrente dificuldade o **DataBot** pode ajudar.""")
-    topic = get_topics()
-    country = get_countries()
-    ind = get_indicators(5)
+    with medir.etapa('topicos', cache=True):
+        topic = get_topics()
+    with medir.etapa('paises', cache=True):
+        country = get_countries()
+    with medir.etapa('catalogo', cache=True):
+        catalogo = get_indicators()
+    if catalogo.degradado:
+        # Catálogo sem tópicos (a API falhou): não fica em memória, o próximo rerun volta a tentar
+        get_indicators.limpar()
+        st.warning("⚠️ O catálogo completo de indicadores não está disponível agora: a pesquisa funciona, "
+                   "mas o filtro por tópico não encontra resultados.")
 
-    dic = {}
-    for big in country:
-        dic[big['value']] = big['id']
     sel_country = st.multiselect('Selecione o(s) País(es):',
-                                         options=sorted(dic.keys()), default='Mozambique')
+                                         options=country.index, default='Mozambique')
 
     if not sel_country:
         st.stop()
-    c_lis = []
-    for c in sel_country:
-        c_lis.append(dic[c])
-
-    dice = {}
-    for big in ind:
-        dice[big['value']] = big['id']
+    c_lis = country.loc[sel_country, 'id'].tolist()
+
+    col_busca, col_topico = st.columns([2, 1])
+    with col_busca:
+        busca = st.text_input('Pesquisar indicador (português ou inglês):', placeholder='Ex.: PIB, inflação, Population')
+    with col_topico:
+        topicos = {t['value'].strip(): t['id'] for t in topic}
+        sel_topico = st.selectbox('Tópico:', ['Todos'] + sorted(topicos))
+
+    with medir.etapa('pesquisa') as etapa:
+        if busca or sel_topico != 'Todos':
+            opcoes = catalogo.search(busca, topic=topicos.get(sel_topico), limit=100)
+        else:
+            opcoes = catalogo.nomes_ordenados
+        etapa['linhas'] = len(opcoes)
+    # Os indicadores já escolhidos continuam disponíveis mesmo fora dos resultados da pesquisa.
+    # O valor inicial só é passado na primeira visita: as opções mudam com a pesquisa e o
+    # Streamlit exige que o `default` esteja sempre entre elas
+    indicador_inicial = ["Agricultural land (sq. km)"]
+    primeira_visita = 'sel_ind' not in st.session_state
+    ja_selecionados = indicador_inicial if primeira_visita else st.session_state['sel_ind']
     sel_ind = st.multiselect('Selecione o(s) Indicador(es):',
-                                     options=sorted(dice.keys()), default="Agricultural land (sq. km)")
+                             options=list(dict.fromkeys(ja_selecionados + opcoes)),
+                             default=indicador_inicial if primeira_visita else None, key='sel_ind')
     if not sel_ind:
         st.stop()
-    i_lis = []
-    for c in sel_ind:
-        i_lis.append(dice[c])
+    i_lis = [catalogo.nome_para_id[c] for c in sel_ind]
 
     years = list(range(1960, 2025))
     start_year, end_year = st.select_slider(
@@ -75,152 +123,142 @@ with tab1:
         value=(2000, 2020)
     )
 
-    df = wb.data.DataFrame(
-        series=i_lis,
-        economy=c_lis,
-        time=range(start_year, end_year + 1)
-    )
-    lista = []
-    df.columns = df.columns.str.replace("YR", "").astype(int)
-    df.reset_index(inplace=True)
-
-    if 'series' in df.columns:
-        df['series'] = df['series'].replace(i_lis, sel_ind)
-        df = df.rename(columns={'series': 'Indicador'})
-    else:
-        df['Indicador'] = sel_ind * len(df)
-
-    if 'economy' in df.columns:
-        df['economy'] = df['economy'].replace(c_lis, sel_country)
-        df = df.rename(columns={'economy': 'País'})
+    # Usa o cache local: só as células (série, país, ano) em falta são pedidas à API.
+    # Se tudo já está no cache a resposta é imediata; senão o pedido corre em segundo plano
+    # (wbfundo) e a página continua a mostrar a última seleção carregada até ele terminar.
+    selecao = {'i_lis': i_lis, 'sel_ind': sel_ind, 'c_lis': c_lis, 'sel_country': sel_country,
+               'start_year': start_year, 'end_year': end_year}
+    # Com a cópia local do WDI (python wdi.py WDI_CSV.zip) a API não é usada de todo.
+    anterior = st.session_state.get('wb_pedido')
+    with medir.etapa('api_wb') as etapa:
+        if wdi.disponivel():
+            df = wdi.get_data(i_lis, c_lis, start_year, end_year)
+            etapa['origem'] = 'wdi'
+        else:
+            df = wbcache.get_data(i_lis, c_lis, start_year, end_year, estatisticas=etapa, so_cache=True)
+        etapa['cache'] = 'hit' if df is not None else 'miss'
+        if df is None:
+            vista = st.session_state.get('wb_vista')
+            # Sem nada para mostrar (primeira visita) não há razão para esperar pelo debounce
+            tarefa = wbfundo.pedir_dados(i_lis, c_lis, start_year, end_year, anterior=anterior,
+                                         debounce=None if vista else 0)
+            st.session_state['wb_pedido'] = tarefa
+            if vista is None:
+                with st.spinner("A obter os dados do Banco Mundial..."):
+                    tarefa.esperar()
+            etapa['origem'] = 'fundo' if tarefa.pronta() else 'pendente'
+            if tarefa.pronta():
+                try:
+                    df = tarefa.resultado()
+                except WBFetchError as e:
+                    st.error(f"Não foi possível obter os dados do Banco Mundial: {e}. Tente novamente.")
+                    if vista is None:
+                        st.stop()
+        else:
+            wbfundo.buscador.largar(anterior)
+            st.session_state.pop('wb_pedido', None)
+
+    if df is not None:
+        st.session_state['wb_vista'] = {**selecao, 'df': df}
     else:
-        df['País'] = sel_country * len(df)
-
-    # 1. Transformar colunas de anos em uma única coluna 'Ano' (Melt)
-    df_long = df.melt(
-        id_vars=['País', 'Indicador'],
-        var_name='Ano',
-        value_name='Valor'
-    )
-
-    # 2. Garantir que o Ano seja numérico para o eixo X
-    df_long['Ano'] = pd.to_numeric(df_long['Ano'])
-    # Supondo que 'sel_ind' são os indicadores selecionados e 'sel_pais' o país escolhido
-    # Se você tiver mais de um país selecionado, o KPI mostrará apenas o primeiro
-    for k, countr in enumerate(sel_country):
+        # Enquanto os dados novos não chegam: seleção anterior no ecrã e um aviso que verifica a
+        # tarefa a cada meio segundo e recarrega a página quando ela termina
+        @st.fragment(run_every=0.5)
+        def aguardar_dados(tarefa):
+            if tarefa.pronta():
+                st.rerun(scope='app')
+            st.info(f"⏳ A carregar os dados da nova seleção ({time.time() - tarefa.pedida_em:.0f}s)... "
+                    "A mostrar a seleção anterior.")
+
+        if not tarefa.pronta():
+            aguardar_dados(tarefa)
+    vista = st.session_state['wb_vista']
+    i_lis, sel_ind, c_lis, sel_country, start_year, end_year, df = (
+        vista[k] for k in ('i_lis', 'sel_ind', 'c_lis', 'sel_country', 'start_year', 'end_year', 'df'))
+    # Colunas de anos -> formato longo País/Indicador/Ano/Valor com tipos compactos
+    with medir.etapa('melt') as etapa:
+        df_long = wbdados.formato_longo(df, i_lis, sel_ind, c_lis, sel_country)
+        etapa['linhas'] = len(df_long)
+
+    # KPIs de todos os pares (país, indicador) calculados numa única passagem,
+    # usando sempre os últimos valores não nulos
+    with medir.etapa('kpis', linhas=len(df_long)):
+        kpis = calcular_kpis(df_long, ['País', 'Indicador'], 'Ano')
+    for countr in sel_country:
         st.markdown(f"##### Indicadores Recentes de {countr} - {end_year} vs {end_year - 1}")
-        pais_kpi = sel_country[k] if sel_country else sel_country[k]
         cols_kpi = st.columns(len(sel_ind))
 
-        for i, var in enumerate(sel_ind):
-            if i < 4:  # Limita a 4 cartões
-                # Filtra os dados para o indicador e país específicos
-                dados_kpi = df_long.query("País == @pais_kpi and Indicador == @var").sort_values("Ano")
-
-                if len(dados_kpi) >= 2:
-                    valor_atual = dados_kpi.iloc[-1]['Valor']  # Ano 2020
-                    valor_anterior = dados_kpi.iloc[-2]['Valor']  # Ano 2019
-
-                    delta = ((valor_atual - valor_anterior) / valor_anterior) * 100 if valor_anterior != 0 else 0
-
-                    with cols_kpi[i]:
-                        st.metric(
-                            label=f"{var[:30]}...",  # Abrevia o nome se for muito longo
-                            value=f"{valor_atual:,.2f}",
-                            delta=f"{delta:.1f}% vs ano ant."
-                        )
-                elif len(dados_kpi) == 1:
+        for i, var in enumerate(sel_ind[:4]):  # Limita a 4 cartões
+            if (countr, var) not in kpis.index:
+                continue
+            kpi = kpis.loc[(countr, var)]
+            ajuda = (f"{var} — último valor de {kpi['periodo_atual']}. "
+                     f"Média dos últimos 3 anos: {kpi['media_movel']:,.2f}")
+            if pd.notna(kpi['cagr']):
+                ajuda += f" · Crescimento anual composto no período: {kpi['cagr']:.1f}%"
+            with cols_kpi[i]:
+                if pd.notna(kpi['anterior']):
+                    delta = kpi['variacao'] if pd.notna(kpi['variacao']) else 0
+                    st.metric(
+                        label=f"{var[:30]}...",  # Abrevia o nome se for muito longo
+                        value=f"{kpi['atual']:,.2f}",
+                        delta=f"{delta:.1f}% vs ano ant.",
+                        help=ajuda
+                    )
+                else:
                     # Se só houver um ano de dados
-                    valor_atual = dados_kpi.iloc[-1]['Valor']
-                    with cols_kpi[i]:
-                        st.metric(label=var, value=f"{valor_atual:,.2f}")
+                    st.metric(label=var, value=f"{kpi['atual']:,.2f}", help=ajuda)
 
     st.markdown(f"#### Resumo dos dados {sel_country[0]} - {end_year} vs {end_year - 1}")
     st.dataframe(df_long, hide_index=True, use_container_width=True, height=100)
 
-    a, b, c = st.columns(3)
+    a, b, c, d = st.columns(4)
 
-    # Converter para CSV
-    csv = df_long.to_csv().encode('utf-8')
+    # Os ficheiros só são gerados no clique e ficam memorizados por seleção e pelo conteúdo: depois de
+    # uma renovação do wbcache ou de mudar para a cópia local do WDI a mesma seleção gera ficheiros novos
+    chave = exportar.fingerprint(c_lis, i_lis, start_year, end_year, databot.impressao_digital(df_long))
     with a:
         st.write("📥 **Exportar Dados**")
     with b:
         st.download_button(
             label="Baixar CSV",
-            data=csv,
-            file_name=f'mozdados.csv',
-            mime='text/csv',
-            key=f"dl_csv"
+            data=exportar.gerador(df_long, 'csv', chave),
+            file_name='mozdados.csv',
+            mime=exportar.FORMATOS['csv'],
+            on_click="ignore",
+            key="dl_csv"
         )
-    # Converter para Excel
-    from io import BytesIO
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        df_long.to_excel(writer, sheet_name='Dados', index=False)
     with c:
         st.download_button(
             label="Baixar Excel",
-            data=buffer,
-            file_name=f'mozdados.xlsx',
-            mime='application/vnd.ms-excel',
-            key=f"dl_excel"
+            data=exportar.gerador(df_long, 'xlsx', chave, index=False),
+            file_name='mozdados.xlsx',
+            mime=exportar.FORMATOS['xlsx'],
+            on_click="ignore",
+            key="dl_excel"
         )
-
-
-    # 1. Filtre o dataframe usando a lista completa 'sel_ind'
-    # O operador 'in' funciona perfeitamente com listas no .query()
-    df_filtered = df_long.query("Indicador in @sel_ind")
-
-    # 2. Crie o gráfico FORA do loop
-    df_filtered['Legenda'] = df_filtered['País'] + " - " + df_filtered['Indicador']
-    fig = px.line(
-        df_filtered,
-        x='Ano',
-        y='Valor',
-        color='Legenda',# Uma linha por país
-        line_dash='Indicador', # Diferencia os indicadores por tipo de linha (pontilhada, sólida, etc)
-        markers=True,
-        template='plotly_white'
-    )
-    fig.update_layout(
-                        title=f"Evolução Temporal: {', '.join(sel_ind)}",
-                        legend_title='Indicadores',
-                        hovermode="x unified",  # Mostra todos os valores ao passar o mouse
-                        height=500,
-                        width=1500
-                    )
-    fig.update_layout(
-        legend=dict(
-            orientation="h",   # Define a orientação horizontal
-            yanchor="bottom",
-            y=-0.2,            # Posição vertical (valores negativos descem a legenda)
-            xanchor="center",
-            x=0.5              # Centraliza horizontalmente
+    with d:
+        st.download_button(
+            label="Baixar Parquet",
+            data=exportar.gerador(df_long, 'parquet', chave, index=False),
+            file_name='mozdados.parquet',
+            mime=exportar.FORMATOS['parquet'],
+            on_click="ignore",
+            key="dl_parquet"
         )
-    )
 
+    # Com categorias o isin compara códigos inteiros e a legenda "País - Indicador" sai dos códigos
+    df_filtered = wbdados.dados_grafico(df_long, sel_ind)
+
+    # Linhas e áreas construídas a partir das séries reduzidas (LTTB). A impressão digital da seleção
+    # (países, indicadores, anos e valores) identifica as figuras na cache partilhada entre sessões
+    dados_bot = df_filtered[['País', 'Indicador', 'Ano', 'Valor']]
+    impressao = databot.impressao_digital(dados_bot)
+    with medir.etapa('graficos', cache=True, linhas=len(df_filtered)) as etapa:
+        fig, fig_area = wbdados.figuras(df_filtered, sel_ind, chave=('wb', impressao, tuple(sel_ind)))
+        if painel_desempenho:
+            etapa['bytes'] = medicao.json_bytes(fig) + medicao.json_bytes(fig_area)
     st.plotly_chart(fig, use_container_width=True)
-
-    # Use a mesma coluna 'Legenda' que criamos para o gráfico de linhas
-    fig_area = px.area(
-        df_filtered,
-        x='Ano',
-        y='Valor',
-        color='Legenda', # Essencial para separar as áreas
-        template="plotly_white",
-        title=f"Volume Acumulado (Área): {', '.join(sel_ind)}"
-    )
-
-    fig_area.update_layout(
-        xaxis_title='Período',
-        yaxis_title='Valor',
-        legend_title='Indicadores',
-        hovermode="x unified",
-        height=500,
-        # Colocando a legenda abaixo também para manter o padrão
-        legend=dict(orientation="h", y=-0.3, x=0.5, xanchor="center")
-    )
-
     st.plotly_chart(fig_area, use_container_width=True)
 with tab2:
     st.header("🤖 Análise Inteligente")
@@ -228,9 +266,9 @@ with tab2:
 
     import google.generativeai as genai
 
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    #for m in genai.list_models():
-        #st.write(m.name, m.supported_generation_methods)
+    # MOZDADOS_DATABOT=falso usa um modelo local (sem rede nem API Key), útil para testes
+    modelo_local = os.environ.get('MOZDADOS_DATABOT') == 'falso'
+
     # --- Configuração da API Key do Gemini ---
     try:
         api_key = st.secrets["GEMINI_API_KEY"]
@@ -243,66 +281,36 @@ with tab2:
             help="Obtenha sua chave em https://aistudio.google.com/"
         )
 
-    if not api_key:
+    if not api_key and not modelo_local:
         st.warning("⚠️ Por favor, insira sua API Key do Google Gemini na barra lateral para começar.")
         st.stop()
 
     try:
-        genai.configure(api_key=api_key)
+        if not modelo_local:
+            genai.configure(api_key=api_key)
     except Exception as e:
         st.error(f"❌ Erro ao configurar a API do Gemini: {e}")
         st.stop()
 
-    # --- Instrução inicial (contexto) ---
-    # Cria instrução com base nos dados filtrados atuais
-    indicadores = list(df_filtered['Indicador'].unique())
-    paises = list(df_filtered['País'].unique())
-    valores = list(df_filtered['Valor'])
-    ano = list(df_filtered['Ano'])
-    nomes = list(df['Indicador'])
-
-    # Cria instrução com base nos dados filtrados atuais
-    system_instruction = f"""
-        Você é o Databot. Explique indicadores económicos, traduza nomes em inglês e utilize todos os recursos disponiveis na internet, livros,
-        modelos, jornais, etc para explicar e esclarecer o que lhe for pedido. Seja criativo quando não tiver informação.
-        Indicadores disponíveis: {indicadores}
-        Países selecionados: {paises}
-        dados com valores: {valores}
-        ano referente aos valores : {ano}
-        indicadores de busca:{nomes}. Esses indicadores devem ser apresentados quando o utilizador precisar de dica de como,
-        ecnontrar-los: Por exemplo: como encontro e inflação. Responde: Comece escrevendo na barra de seleção de indicadores: Inflation ... e selecione o seu indicador
-        Explique dizendo que nos dados deve escrever com letra maiuscula a primeira letra e em inglês de acorco com cada caso. Noutros casos como PIB deve ser GDP..
-        """
-
     MODEL_NAME = "gemini-2.5-flash"
 
-    # Reinicializa sempre que filtros mudarem
-    model = genai.GenerativeModel(MODEL_NAME)
-    st.session_state.chat = model.start_chat(history=[
-        {'role': 'user', 'parts': [system_instruction]},
-        {'role': 'model', 'parts': ["Entendido. Estou pronto para analisar os novos dados."]}
-    ])
-
-    # Reinicia também as mensagens
-    st.session_state.messages = [
-        {"role": "assistant", "content": "👋 Olá! Eu sou o Databot. Pergunte sobre os indicadores que deseja explorar."}
-    ]
-
-    MODEL_NAME = "gemini-2.5-flash"
+    # Uma única conversa por utilizador, mantida entre reruns
+    if "databot" not in st.session_state:
+        modelo = databot.ModeloFalso() if modelo_local else genai.GenerativeModel(MODEL_NAME)
+        st.session_state.databot = databot.SessaoChat(modelo)
     if "messages" not in st.session_state:
         st.session_state.messages = [
             {"role": "assistant",
              "content": "👋 Olá! Eu sou o Databot, o seu assistente virtual para explorar os dados económicos. Como posso ajudar?"}
         ]
 
-    if "chat" not in st.session_state:
-        model = genai.GenerativeModel(MODEL_NAME)
-        initial_history = [
-            {'role': 'user', 'parts': [system_instruction]},
-            {'role': 'model', 'parts': [
-                "Entendido. Olá! Eu sou o Databot, pronto para analisar os dados. O que deseja explorar?"]}
-        ]
-        st.session_state.chat = model.start_chat(history=initial_history)
+    # --- Instrução inicial (contexto) ---
+    # Resumo compacto da seleção dentro do orçamento de tokens; a conversa só é semeada de novo
+    # (mantendo os últimos turnos) quando a impressão digital dos dados muda
+    with medir.etapa('databot_contexto', linhas=len(dados_bot)) as etapa:
+        semeado = st.session_state.databot.atualizar(impressao,
+                                                     lambda: databot.construir_contexto(dados_bot))
+        etapa['cache'] = 'miss' if semeado else 'hit'
 
     # --- Layout em colunas para histórico e interação ---
     col1, col2 = st.columns([2, 1])
@@ -319,10 +327,15 @@ with tab2:
         st.error("Exemplo: *Qual é a variável que mede o custo de vida?*")
 
     # --- Função para enviar mensagem ---
+    # Perguntas sobre os dados (máximo, crescimento, comparação, ...) são respondidas localmente
+    # e as repetidas vêm da memória; só as restantes vão ao Gemini
     def send_message_to_gemini(prompt):
         try:
-            response = st.session_state.chat.send_message(prompt)
-            return response.text
+            with medir.etapa('databot') as etapa:
+                resposta, etapa['origem'] = st.session_state.databot.responder(prompt, dados_bot)
+                etapa['cache'] = 'hit' if etapa['origem'] == 'memoria' else 'miss'
+                etapa['bytes'] = len(resposta.encode('utf-8'))
+            return resposta
         except Exception as e:
             st.error(f"⚠️ Ocorreu um erro ao comunicar com a API: {e}")
             return None
@@ -369,3 +382,11 @@ with tab3:
         e fortaleçam a tomada de decisão baseada em evidências.  
         📧 **Contacto**: *gineliohermilio@gmail.com*
         """)
+
+# Painel de desempenho (só com ?desempenho=1 ou MOZDADOS_DESEMPENHO=1)
+if painel_desempenho:
+    medicao.mostrar_painel(medir)
+
+# Contadores das caches e botão para as esvaziar (só com ?admin=<MOZDADOS_ADMIN_TOKEN>)
+if admin:
+    caches.mostrar_admin()
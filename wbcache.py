@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+import wbgapi as wb
+
+import wbfetch
+
+# ------------------ Cache persistente dos dados do Banco Mundial ------------------
+# Cada célula (série, economia, ano) é guardada num ficheiro SQLite partilhado por todas as
+# sessões e que sobrevive ao reinício do servidor. Em cada pedido só as células em falta
+# (ou expiradas) são pedidas à API e depois juntadas ao que já estava guardado.
+
+CACHE_DIR = os.environ.get(
+    'MOZDADOS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'cache')
+)
+CACHE_PATH = os.path.join(CACHE_DIR, 'wb.sqlite')
+
+# Tempo (segundos) até uma célula ser considerada expirada e voltar a ser pedida à API
+TTL = int(os.environ.get('MOZDADOS_CACHE_TTL', 7 * 24 * 3600))
+
+
+def _conectar(path=None):
+    path = path or CACHE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute('PRAGMA journal_mode=WAL')
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS valores (
+            series TEXT NOT NULL,
+            economy TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            value REAL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (series, economy, year)
+        ) WITHOUT ROWID
+    ''')
+    return con
+
+
+def _marcadores(valores):
+    return ','.join('?' * len(valores))
+
+
+def _ler(con, series, economies, start_year, end_year, validade):
+    query = f'''
+        SELECT series, economy, year, value FROM valores
+        WHERE series IN ({_marcadores(series)})
+          AND economy IN ({_marcadores(economies)})
+          AND year BETWEEN ? AND ?
+          AND fetched_at >= ?
+    '''
+    params = [*series, *economies, start_year, end_year, validade]
+    return pd.read_sql_query(query, con, params=params)
+
+
+def _gravar(con, long_df, agora):
+    registos = [
+        (s, e, int(y), None if pd.isna(v) else float(v), agora)
+        for s, e, y, v in long_df[['series', 'economy', 'year', 'value']].itertuples(index=False)
+    ]
+    with con:
+        con.executemany('INSERT OR REPLACE INTO valores VALUES (?, ?, ?, ?, ?)', registos)
+
+
+def fetch_wbgapi(series, economies, years):
+    # Pede à API sempre no formato (economy, series) x YRxxxx, independente do número de elementos
+    return wb.data.DataFrame(
+        series=list(series),
+        economy=list(economies),
+        time=list(years),
+        index=['economy', 'series'],
+        columns='time'
+    )
+
+
+def _wide_para_long(wide):
+    if wide is None or wide.empty:
+        return pd.DataFrame(columns=['series', 'economy', 'year', 'value'])
+    long_df = wide.reset_index().melt(id_vars=['economy', 'series'], var_name='year', value_name='value')
+    long_df['year'] = long_df['year'].astype(str).str.replace('YR', '').astype(int)
+    return long_df[['series', 'economy', 'year', 'value']]
+
+
+def _long_para_wide(long_df, series, economies, years):
+    index = pd.MultiIndex.from_product([sorted(economies), sorted(series)], names=['economy', 'series'])
+    wide = (long_df.astype({'year': int, 'value': float})
+            .set_index(['economy', 'series', 'year'])['value']
+            .unstack('year')
+            .reindex(index=index, columns=years))
+    wide.columns = pd.Index([f'YR{y}' for y in years], name='time')
+    return wide
+
+
+def _agrupar(faltam):
+    # Agrupa as economias que têm em falta o mesmo conjunto de séries e anos, para que cada
+    # grupo seja um único pedido. Mudar o slider ou adicionar um país dá 1 ou 2 pedidos.
+    faltam = faltam.to_frame(index=False)
+    assinaturas = {}
+    for economy, grupo in faltam.groupby('economy', sort=True):
+        chave = (tuple(sorted(grupo['series'].unique())), tuple(sorted(grupo['year'].unique())))
+        assinaturas.setdefault(chave, []).append(economy)
+    return [(list(s), economies, [int(y) for y in years]) for (s, years), economies in assinaturas.items()]
+
+
+def get_data(series, economies, start_year, end_year, ttl=None, fetcher=None, path=None, estatisticas=None,
+             so_cache=False):
+    # Devolve um DataFrame largo (economy, series) x YRxxxx como o wb.data.DataFrame,
+    # pedindo à API apenas as células que ainda não estão guardadas (ou já expiraram).
+    # `estatisticas` (dict opcional) recebe o número de células pedidas e em falta.
+    # Com so_cache=True nunca vai à API: devolve None se faltar alguma célula.
+    series = list(dict.fromkeys(series))
+    economies = list(dict.fromkeys(economies))
+    years = list(range(start_year, end_year + 1))
+    ttl = TTL if ttl is None else ttl
+    fetcher = fetcher or wbfetch.fetch_chunked
+    agora = time.time()
+
+    con = _conectar(path)
+    try:
+        guardado = _ler(con, series, economies, start_year, end_year, agora - ttl)
+
+        pedidas = pd.MultiIndex.from_product([series, economies, years], names=['series', 'economy', 'year'])
+        existentes = pd.MultiIndex.from_frame(guardado[['series', 'economy', 'year']].astype({'year': int}))
+        faltam = pedidas.difference(existentes)
+        if estatisticas is not None:
+            estatisticas.update(celulas=len(pedidas), em_falta=len(faltam))
+        if so_cache and len(faltam):
+            return None
+
+        if len(faltam):
+            novos = []
+            for f_series, f_economies, f_years in _agrupar(faltam):
+                try:
+                    recebido = _wide_para_long(fetcher(f_series, f_economies, f_years))
+                except wbfetch.WBFetchError as e:
+                    # Guarda os blocos que chegaram; o resto é pedido no próximo rerun
+                    if e.parcial is not None and not e.parcial.empty:
+                        _gravar(con, _wide_para_long(e.parcial), agora)
+                    raise
+
+                # Células pedidas que a API não devolveu ficam registadas como vazias,
+                # para não serem pedidas novamente até expirarem
+                completo = pd.MultiIndex.from_product([f_series, f_economies, f_years],
+                                                      names=['series', 'economy', 'year'])
+                novos.append(recebido.set_index(['series', 'economy', 'year'])['value']
+                             .groupby(level=[0, 1, 2]).first()
+                             .reindex(completo)
+                             .reset_index())
+            novos = pd.concat(novos, ignore_index=True)
+            _gravar(con, novos, agora)
+
+            guardado = pd.concat([guardado, novos], ignore_index=True)
+            guardado = guardado.drop_duplicates(['series', 'economy', 'year'], keep='last')
+    finally:
+        con.close()
+
+    return _long_para_wide(guardado, series, economies, years)
+
+
+def versao(series, economies, start_year, end_year, ttl=None, path=None):
+    # Identificador barato dos dados de uma seleção, sem os ler: número de células válidas e a
+    # data da mais recente. None se faltar alguma célula (o get_data ainda iria à API).
+    series = list(dict.fromkeys(series))
+    economies = list(dict.fromkeys(economies))
+    ttl = TTL if ttl is None else ttl
+    con = _conectar(path)
+    try:
+        query = f'''
+            SELECT COUNT(*), MAX(fetched_at) FROM valores
+            WHERE series IN ({_marcadores(series)})
+              AND economy IN ({_marcadores(economies)})
+              AND year BETWEEN ? AND ?
+              AND fetched_at >= ?
+        '''
+        celulas, recente = con.execute(query, [*series, *economies, start_year, end_year,
+                                               time.time() - ttl]).fetchone()
+    finally:
+        con.close()
+    if celulas < len(series) * len(economies) * (end_year - start_year + 1):
+        return None
+    return f'{celulas}-{recente}'
+
+
+def limpar_cache(path=None):
+    con = _conectar(path)
+    try:
+        with con:
+            con.execute('DELETE FROM valores')
+    finally:
+        con.close()
@@ -0,0 +1,252 @@
+import bisect
+import os
+import pickle
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import requests
+import wbgapi as wb
+
+import wbcache
+import wbfetch
+
+# ------------------ Catálogo de indicadores com pesquisa indexada ------------------
+# O catálogo de séries (nomes, ids, tópicos e notas) é descarregado uma vez, indexado e
+# guardado em disco. A pesquisa aceita prefixos, erros de escrita (trigramas) e termos em
+# português (PIB -> GDP, inflação -> Inflation) e pode ser filtrada por tópico.
+
+CATALOGO_PATH = os.path.join(wbcache.CACHE_DIR, 'catalogo.pkl')
+CATALOGO_TTL = 30 * 24 * 3600
+VERSAO = 3
+
+# Termos em português (já normalizados, sem acentos) e o equivalente usado pelo Banco Mundial
+SINONIMOS = {
+    'pib': 'gdp',
+    'produto interno bruto': 'gdp',
+    'rnb': 'gni',
+    'rendimento nacional bruto': 'gni',
+    'inflacao': 'inflation',
+    'precos ao consumidor': 'consumer prices',
+    'custo de vida': 'consumer prices',
+    'populacao': 'population',
+    'desemprego': 'unemployment',
+    'emprego': 'employment',
+    'exportacoes': 'exports',
+    'importacoes': 'imports',
+    'divida': 'debt',
+    'terra agricola': 'agricultural land',
+    'agricultura': 'agriculture',
+    'esperanca de vida': 'life expectancy',
+    'mortalidade': 'mortality',
+    'infantil': 'infant',
+    'natalidade': 'birth rate',
+    'educacao': 'education',
+    'escola': 'school',
+    'alfabetizacao': 'literacy',
+    'saude': 'health',
+    'pobreza': 'poverty',
+    'desigualdade': 'gini',
+    'taxa de cambio': 'exchange rate',
+    'cambio': 'exchange rate',
+    'juros': 'interest',
+    'electricidade': 'electricity',
+    'eletricidade': 'electricity',
+    'energia': 'energy',
+    'agua': 'water',
+    'emissoes': 'emissions',
+    'florestas': 'forest',
+    'floresta': 'forest',
+    'investimento estrangeiro': 'foreign direct investment',
+    'remessas': 'remittances',
+    'reservas': 'reserves',
+    'crescimento': 'growth',
+    'receitas': 'revenue',
+    'despesa': 'expenditure',
+    'despesas': 'expenditure',
+    'impostos': 'tax',
+    'credito': 'credit',
+    'urbana': 'urban',
+    'rural': 'rural',
+    'mulheres': 'female',
+    'homens': 'male',
+}
+_SINONIMOS_RE = re.compile(r'\b(' + '|'.join(sorted(map(re.escape, SINONIMOS), key=len, reverse=True)) + r')\b')
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', texto.lower()).strip()
+
+
+def _tokens(texto):
+    return normalizar(texto).split()
+
+
+def _trigramas(token):
+    t = f'  {token} '
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _como_array(indice):
+    return {chave: np.fromiter(sorted(docs), dtype=np.int32, count=len(docs)) for chave, docs in indice.items()}
+
+
+class IndicatorCatalog:
+    def __init__(self, series, degradado=False):
+        # series: lista de dicts com id, value, topics (lista de ids) e sourceNote.
+        # degradado: veio da lista simples do wbgapi, sem tópicos nem notas
+        self.degradado = degradado
+        self.ids = [s['id'] for s in series]
+        self.nomes = [s['value'] for s in series]
+        self.nome_para_id = dict(zip(self.nomes, self.ids))
+        self.nomes_ordenados = sorted(self.nome_para_id)
+
+        por_topico, nome_idx, nota_idx = defaultdict(set), defaultdict(set), defaultdict(set)
+        for doc, s in enumerate(series):
+            for t in s.get('topics') or []:
+                por_topico[str(t)].add(doc)
+            for token in _tokens(s['value']) + _tokens(s['id']):
+                nome_idx[token].add(doc)
+            for token in _tokens(s.get('sourceNote')):
+                nota_idx[token].add(doc)
+        # Listas de documentos em arrays NumPy para pontuar todos os candidatos de uma vez
+        self.por_topico = _como_array(por_topico)
+        self.nome_idx = _como_array(nome_idx)
+        self.nota_idx = _como_array(nota_idx)
+
+        # Desempate: nomes mais curtos primeiro, depois ordem alfabética
+        self.ordem = np.empty(len(series), dtype=np.int32)
+        self.ordem[sorted(range(len(series)), key=lambda d: (len(self.nomes[d]), self.nomes[d]))] = np.arange(len(series))
+        self.ordem_alfabetica = np.empty(len(series), dtype=np.int32)
+        self.ordem_alfabetica[sorted(range(len(series)), key=lambda d: self.nomes[d])] = np.arange(len(series))
+
+        # Vocabulário ordenado para prefixos e índice de trigramas para aproximações
+        self.vocabulario = sorted(self.nome_idx)
+        trigramas = defaultdict(set)
+        for token in self.vocabulario:
+            for tri in _trigramas(token):
+                trigramas[tri].add(token)
+        self.trigramas = dict(trigramas)
+
+        # Bytes ocupados (estimativa), calculados uma vez: as caches em memória usam este valor
+        # em vez de serializar o catálogo inteiro a cada inserção
+        indices = [*self.por_topico.values(), *self.nome_idx.values(), *self.nota_idx.values()]
+        self.nbytes = (sum(a.nbytes for a in indices) + self.ordem.nbytes + self.ordem_alfabetica.nbytes
+                       + sum(sys.getsizeof(t) for t in (*self.ids, *self.nomes, *self.vocabulario))
+                       + sum(sys.getsizeof(tokens) for tokens in self.trigramas.values()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _prefixo(self, token):
+        i = bisect.bisect_left(self.vocabulario, token)
+        encontrados = []
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(token):
+            encontrados.append(self.vocabulario[i])
+            i += 1
+        return encontrados
+
+    def _aproximados(self, token, limiar=0.45):
+        tri = _trigramas(token)
+        contagem = defaultdict(int)
+        for t in tri:
+            for candidato in self.trigramas.get(t, ()):
+                contagem[candidato] += 1
+        return [candidato for candidato, comuns in contagem.items()
+                if comuns / (len(tri) + len(_trigramas(candidato)) - comuns) >= limiar]
+
+    def _pontuar_token(self, token):
+        # Pontos por tipo de correspondência; os mais fortes são aplicados por último
+        pontos = np.zeros(len(self.ids), dtype=np.float32)
+        notas = self.nota_idx.get(token)
+        if notas is not None:
+            pontos[notas] = 0.5
+        prefixo = self._prefixo(token) if len(token) >= 2 else []
+        if not prefixo and len(token) >= 4:
+            for candidato in self._aproximados(token):
+                pontos[self.nome_idx[candidato]] = 1.0
+        for candidato in prefixo:
+            pontos[self.nome_idx[candidato]] = 2.0
+        exatos = self.nome_idx.get(token)
+        if exatos is not None:
+            pontos[exatos] = 3.0
+        return pontos
+
+    def search(self, query, topic=None, limit=50):
+        # Devolve os nomes dos indicadores mais relevantes para a pesquisa
+        consulta = _SINONIMOS_RE.sub(lambda m: SINONIMOS[m.group(1)], normalizar(query))
+        tokens = consulta.split()
+        permitidos = None
+        if topic is not None:
+            permitidos = self.por_topico.get(str(topic), np.empty(0, dtype=np.int32))
+
+        if not tokens:
+            if permitidos is None:
+                return self.nomes_ordenados[:limit]
+            docs = permitidos[np.argsort(self.ordem_alfabetica[permitidos])]
+            return list(dict.fromkeys(self.nomes[d] for d in docs))[:limit]
+
+        # Todos os termos têm de aparecer em algum campo (nome, id ou notas)
+        total = np.zeros(len(self.ids), dtype=np.float32)
+        for token in tokens:
+            pontos = self._pontuar_token(token)
+            pontos[pontos == 0] = -np.inf
+            total += pontos
+        if permitidos is not None:
+            mascara = np.full(len(self.ids), -np.inf, dtype=np.float32)
+            mascara[permitidos] = 0
+            total += mascara
+
+        candidatos = np.flatnonzero(np.isfinite(total))
+        candidatos = candidatos[np.lexsort((self.ordem[candidatos], -total[candidatos]))]
+        return list(dict.fromkeys(self.nomes[d] for d in candidatos[:limit * 2]))[:limit]
+
+
+def _descarregar_series():
+    # Um único pedido com nomes, tópicos e notas; devolve (series, degradado). Se a API ou o JSON
+    # falharem usa a lista simples do wbgapi, sem tópicos (degradado=True)
+    try:
+        response = wbfetch.get_session().get(
+            f'{wbfetch.ENDPOINT.rstrip("/")}/source/{wbfetch.DB}/indicators',
+            params={'format': 'json', 'per_page': 50000},
+            timeout=wbfetch.TIMEOUT
+        )
+        response.raise_for_status()
+        _, itens = response.json()  # ValueError se o corpo não for o JSON esperado
+    except (requests.RequestException, ValueError):
+        return [{'id': s['id'], 'value': s['value']} for s in wb.series.list()], True
+    return [{
+        'id': s['id'],
+        'value': s['name'],
+        'topics': [t['id'] for t in s.get('topics') or [] if t.get('id')],
+        'sourceNote': s.get('sourceNote') or '',
+    } for s in itens], False
+
+
+def load_catalog(path=None, ttl=CATALOGO_TTL, refresh=False):
+    path = path or CATALOGO_PATH
+    if not refresh and os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        try:
+            with open(path, 'rb') as f:
+                guardado = pickle.load(f)
+            if guardado.get('versao') == VERSAO:
+                return guardado['catalogo']
+        except Exception:
+            pass
+
+    series, degradado = _descarregar_series()
+    catalogo = IndicatorCatalog(series, degradado)
+    if degradado:
+        # Sem tópicos a filtragem por tópico não encontra nada: o catálogo não fica em disco e a
+        # próxima sessão volta a tentar o pedido completo
+        return catalogo
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporario = f'{path}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as f:
+        pickle.dump({'versao': VERSAO, 'catalogo': catalogo}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, path)
+    return catalogo
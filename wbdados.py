@@ -0,0 +1,141 @@
+import functools
+import os
+import pickle
+import time
+
+import plotly.express as px
+import wbgapi as wb
+
+import graficos
+import wbcache
+import wbcatalog
+import wbreshape
+
+# ------------------ Camada de dados do Banco Mundial (sem Streamlit) ------------------
+# Tudo o que o wbapp.py precisa para chegar aos dados e aos gráficos — listas de tópicos e
+# países, catálogo de indicadores, pedido à API com cache, passagem para o formato longo e
+# construção das figuras — pode ser importado e corrido fora do Streamlit (testes, scripts,
+# pré-aquecimento das caches com o preaquecer.py).
+
+LISTAS_TTL = 30 * 24 * 3600
+ANOS = (1960, 2024)
+
+
+def _em_cache(nome, descarregar, ttl=LISTAS_TTL, refresh=False):
+    # Listas pequenas e estáveis (tópicos, economias) guardadas em disco junto do catálogo
+    path = os.path.join(wbcache.CACHE_DIR, f'{nome}.pkl')
+    if not refresh and os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            pass
+
+    valor = descarregar()
+    os.makedirs(wbcache.CACHE_DIR, exist_ok=True)
+    temporario = f'{path}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as f:
+        pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, path)
+    return valor
+
+
+def carregar_topicos(refresh=False):
+    return _em_cache('topicos', lambda: list(wb.topic.list()), refresh=refresh)
+
+
+def carregar_paises(refresh=False):
+    # DataFrame compacto indexado pelo nome (nome -> id, já ordenado)
+    return _em_cache('economias', lambda: wbreshape.compactar_economias(wb.economy.list()), refresh=refresh)
+
+
+def carregar_catalogo(refresh=False):
+    return wbcatalog.load_catalog(refresh=refresh)
+
+
+def formato_longo(df, i_lis, sel_ind, c_lis, sel_country):
+    # Tabela larga do wbcache ((economy, series) x YRxxxx), ou qualquer outro formato do
+    # wb.data.DataFrame -> formato longo País/Indicador/Ano/Valor com tipos compactos
+    return wbreshape.para_longo(df, series=i_lis, indicadores=sel_ind, economias=c_lis, paises=sel_country)
+
+
+def carregar_longo(sel_ind, sel_country, start_year, end_year, catalogo=None, paises=None):
+    # Nomes de indicadores e países -> formato longo, usando o cache local (só as células em falta
+    # são pedidas à API). Levanta wbfetch.WBFetchError se a API falhar.
+    catalogo = catalogo or carregar_catalogo()
+    paises = carregar_paises() if paises is None else paises
+    i_lis = [catalogo.nome_para_id[c] for c in sel_ind]
+    c_lis = paises.loc[sel_country, 'id'].tolist()
+    df = wbcache.get_data(i_lis, c_lis, start_year, end_year)
+    return formato_longo(df, i_lis, sel_ind, c_lis, sel_country)
+
+
+def dados_grafico(df_long, sel_ind):
+    df_filtered = df_long[df_long['Indicador'].isin(sel_ind)].copy()
+    # A legenda "País - Indicador" sai dos códigos das categorias, sem concatenar strings linha a linha
+    df_filtered['Legenda'] = wbreshape.legenda(df_filtered)
+    return df_filtered
+
+
+def figura_linhas(df_grafico, sel_ind):
+    fig = px.line(
+        df_grafico,
+        x='Ano',
+        y='Valor',
+        color='Legenda',# Uma linha por país
+        line_dash='Indicador', # Diferencia os indicadores por tipo de linha (pontilhada, sólida, etc)
+        markers=True,
+        template='plotly_white',
+        render_mode=graficos.modo_render(df_grafico)
+    )
+    fig.update_layout(
+                        title=f"Evolução Temporal: {', '.join(sel_ind)}",
+                        legend_title='Indicadores',
+                        hovermode="x unified",  # Mostra todos os valores ao passar o mouse
+                        height=500,
+                        width=1500
+                    )
+    fig.update_layout(
+        legend=dict(
+            orientation="h",   # Define a orientação horizontal
+            yanchor="bottom",
+            y=-0.2,            # Posição vertical (valores negativos descem a legenda)
+            xanchor="center",
+            x=0.5              # Centraliza horizontalmente
+        )
+    )
+    return fig
+
+
+def figura_area(df_grafico, sel_ind):
+    # Use a mesma coluna 'Legenda' que criamos para o gráfico de linhas
+    fig_area = px.area(
+        df_grafico,
+        x='Ano',
+        y='Valor',
+        color='Legenda', # Essencial para separar as áreas
+        template="plotly_white",
+        title=f"Volume Acumulado (Área): {', '.join(sel_ind)}"
+    )
+
+    fig_area.update_layout(
+        xaxis_title='Período',
+        yaxis_title='Valor',
+        legend_title='Indicadores',
+        hovermode="x unified",
+        height=500,
+        # Colocando a legenda abaixo também para manter o padrão
+        legend=dict(orientation="h", y=-0.3, x=0.5, xanchor="center")
+    )
+    return fig_area
+
+
+def figuras(df_filtered, sel_ind, chave=None):
+    # Cada série é reduzida (LTTB) a um número máximo de pontos; com muitas séries usa WebGL.
+    # Com `chave` (impressão digital da seleção) as figuras vêm da cache partilhada entre sessões
+    # e a redução só é feita se alguma faltar.
+    df_grafico = functools.cache(lambda: graficos.reduzir(df_filtered, 'Ano', 'Valor', grupo='Legenda'))
+    if chave is None:
+        return figura_linhas(df_grafico(), sel_ind), figura_area(df_grafico(), sel_ind)
+    return (graficos.figura_em_cache(chave + ('linhas',), lambda: figura_linhas(df_grafico(), sel_ind)),
+            graficos.figura_em_cache(chave + ('area',), lambda: figura_area(df_grafico(), sel_ind)))
@@ -0,0 +1,174 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# ------------------ Pedidos concorrentes à API do Banco Mundial ------------------
+# Seleções grandes (muitos países x muitos indicadores x 60 anos) são divididas em blocos de
+# séries/economias, pedidos em paralelo num conjunto limitado de threads que reutilizam as
+# mesmas ligações HTTP. Erros transitórios são repetidos com espera exponencial e os blocos
+# são juntados no mesmo formato largo (economy, series) x YRxxxx do wb.data.DataFrame.
+
+ENDPOINT = os.environ.get('MOZDADOS_WB_ENDPOINT', 'https://api.worldbank.org/v2')
+DB = 2  # World Development Indicators
+
+MAX_WORKERS = 6
+SERIES_POR_BLOCO = 5
+ECONOMIAS_POR_BLOCO = 20
+POR_PAGINA = 1000
+TIMEOUT = 30
+
+TENTATIVAS = 4
+ESPERA_BASE = 0.5  # segundos; dobra a cada nova tentativa
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+class WBFetchError(Exception):
+    # `parcial` guarda os blocos que chegaram antes da falha, para não se perderem
+    def __init__(self, msg, parcial=None):
+        super().__init__(msg)
+        self.parcial = parcial
+
+
+class PedidoCancelado(WBFetchError):
+    # Pedido abandonado a meio (a seleção mudou); `parcial` tem os blocos que já tinham chegado
+    pass
+
+
+class _ErroTransitorio(Exception):
+    pass
+
+
+_sessao = None
+_sessao_lock = threading.Lock()
+
+
+def get_session():
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            _sessao = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _sessao.mount('http://', adapter)
+            _sessao.mount('https://', adapter)
+        return _sessao
+
+
+def _blocos(lista, tamanho):
+    return [lista[i:i + tamanho] for i in range(0, len(lista), tamanho)]
+
+
+def _pedir_pagina(url, params, endpoint, session):
+    try:
+        response = session.get(f'{endpoint}/{url}', params=params, timeout=TIMEOUT)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise _ErroTransitorio(str(e))
+
+    if response.status_code in STATUS_TRANSITORIOS:
+        raise _ErroTransitorio(f'HTTP {response.status_code}')
+    if response.status_code != 200:
+        raise WBFetchError(f'HTTP {response.status_code}: {response.reason} ({response.url})')
+
+    try:
+        result = response.json()
+    except ValueError:
+        # A API às vezes devolve XML/HTML quando está sobrecarregada
+        raise _ErroTransitorio('resposta não é JSON')
+
+    if isinstance(result, list) and result and result[0].get('message'):
+        msg = result[0]['message'][0]
+        raise WBFetchError(f"{msg.get('key')}: {msg.get('value')} ({response.url})")
+    if not isinstance(result, dict) or 'source' not in result:
+        raise _ErroTransitorio('formato de resposta desconhecido')
+    return result
+
+
+def _com_repeticao(funcao, tentativas, espera_base):
+    for tentativa in range(tentativas):
+        try:
+            return funcao()
+        except _ErroTransitorio as e:
+            if tentativa == tentativas - 1:
+                raise WBFetchError(f'falhou após {tentativas} tentativas: {e}')
+            espera = espera_base * 2 ** tentativa
+            time.sleep(espera + random.uniform(0, espera_base))
+
+
+def _verificar(cancelado):
+    if cancelado is not None and cancelado.is_set():
+        raise PedidoCancelado('pedido cancelado')
+
+
+def _buscar_bloco(series, economies, years, endpoint, session, tentativas, espera_base, cancelado=None):
+    url = 'sources/{}/series/{}/country/{}/time/{}'.format(
+        DB, ';'.join(series), ';'.join(economies), ';'.join(f'YR{y}' for y in years)
+    )
+    linhas = []
+    pagina, paginas = 1, 1
+    while pagina <= paginas:
+        _verificar(cancelado)
+        params = {'format': 'json', 'per_page': POR_PAGINA, 'page': pagina}
+        result = _com_repeticao(lambda: _pedir_pagina(url, params, endpoint, session), tentativas, espera_base)
+        paginas = int(result.get('pages') or 1)
+
+        for row in result['source']['data']:
+            chaves = {v['concept'].lower(): v['id'] for v in row['variable']}
+            linhas.append((chaves['country'], chaves['series'], chaves['time'], row['value']))
+        pagina += 1
+
+    return pd.DataFrame(linhas, columns=['economy', 'series', 'time', 'value'])
+
+
+def fetch_chunked(series, economies, years, endpoint=None, session=None, max_workers=None,
+                  series_por_bloco=None, economias_por_bloco=None, tentativas=None, espera_base=None,
+                  cancelado=None):
+    # `cancelado` (threading.Event opcional): quando é ativado, os blocos ainda por pedir são
+    # abandonados e a função levanta PedidoCancelado com o que já tinha chegado
+    endpoint = (endpoint or ENDPOINT).rstrip('/')
+    session = session or get_session()
+    max_workers = max_workers or MAX_WORKERS
+    tentativas = tentativas or TENTATIVAS
+    espera_base = ESPERA_BASE if espera_base is None else espera_base
+    series, economies, years = list(series), list(economies), list(years)
+
+    blocos = [(s, e)
+              for s in _blocos(series, series_por_bloco or SERIES_POR_BLOCO)
+              for e in _blocos(economies, economias_por_bloco or ECONOMIAS_POR_BLOCO)]
+
+    partes, erros = [], []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(blocos)) or 1) as pool:
+        futuros = [pool.submit(_buscar_bloco, s, e, years, endpoint, session, tentativas, espera_base, cancelado)
+                   for s, e in blocos]
+        for futuro in as_completed(futuros):
+            try:
+                partes.append(futuro.result())
+            except WBFetchError as e:
+                erros.append(e)
+
+    wide = _juntar(partes, years)
+    if cancelado is not None and cancelado.is_set():
+        raise PedidoCancelado(f'pedido cancelado ({len(partes)} de {len(blocos)} blocos recebidos)', parcial=wide)
+    if erros:
+        raise WBFetchError(f'{len(erros)} de {len(blocos)} blocos falharam: {erros[0]}', parcial=wide)
+    return wide
+
+
+def _juntar(partes, years):
+    colunas = [f'YR{y}' for y in years]
+    index = pd.MultiIndex.from_arrays([[], []], names=['economy', 'series'])
+    if not partes:
+        return pd.DataFrame(index=index, columns=pd.Index(colunas, name='time'), dtype=float)
+
+    long_df = pd.concat(partes, ignore_index=True)
+    long_df['value'] = pd.to_numeric(long_df['value'], errors='coerce')
+    # Como no wb.data.DataFrame, a primeira observação de cada célula prevalece
+    long_df = long_df.drop_duplicates(['economy', 'series', 'time'], keep='first')
+    wide = long_df.set_index(['economy', 'series', 'time'])['value'].unstack('time')
+    wide = wide.reindex(columns=colunas).sort_index()
+    wide.columns.name = 'time'
+    return wide
@@ -0,0 +1,121 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import wbcache
+import wbfetch
+
+# ------------------ Pedidos ao Banco Mundial em segundo plano ------------------
+# Arrastar o slider de anos ou editar a lista de países gera um rerun por cada valor intermédio.
+# Em vez de cada rerun bloquear a página à espera da API, o pedido corre numa thread:
+#   - espera DEBOUNCE segundos antes de ir à API; se entretanto a sessão pedir outra seleção,
+#     o pedido anterior é cancelado sem ter feito nenhuma chamada
+#   - pedidos iguais de sessões diferentes partilham a mesma tarefa (coalescência)
+#   - um pedido que já está a correr e deixou de interessar a todas as sessões é interrompido
+#     entre páginas (wbfetch.PedidoCancelado); os blocos que já chegaram ficam no wbcache
+# Enquanto a tarefa corre, o wbapp.py continua a mostrar a última seleção carregada.
+
+DEBOUNCE = float(os.environ.get('MOZDADOS_DEBOUNCE', 0.4))
+MAX_WORKERS = 2
+
+
+class Tarefa:
+    def __init__(self, chave, funcao):
+        self.chave = chave
+        self.funcao = funcao
+        self.cancelado = threading.Event()
+        self.interessados = 1
+        self.pedida_em = time.time()
+        self.futuro = None
+
+    def pronta(self):
+        return self.futuro.done()
+
+    def cancelada(self):
+        return self.cancelado.is_set()
+
+    def esperar(self, timeout=None):
+        wait([self.futuro], timeout)
+
+    def resultado(self, timeout=None):
+        return self.futuro.result(timeout)
+
+
+class Buscador:
+    def __init__(self, max_workers=MAX_WORKERS, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='wbfundo')
+        self._lock = threading.Lock()
+        self._em_curso = {}  # chave -> Tarefa ainda não terminada, partilhada entre sessões
+        self.pedidos = self.coalescidos = self.cancelados = self.executados = 0
+
+    def pedir(self, chave, funcao, anterior=None, debounce=None):
+        # `funcao(cancelado)` faz o trabalho; `anterior` é a última tarefa pedida pela mesma
+        # sessão, que é largada (e cancelada se mais ninguém a quiser) quando a chave muda
+        with self._lock:
+            self.pedidos += 1
+            if anterior is not None and anterior.chave == chave and not anterior.cancelada() \
+                    and not (anterior.pronta() and anterior.futuro.exception() is not None):
+                return anterior
+            tarefa = self._em_curso.get(chave)
+            if tarefa is not None and not tarefa.cancelada():
+                tarefa.interessados += 1
+                self.coalescidos += 1
+            else:
+                tarefa = self._em_curso[chave] = Tarefa(chave, funcao)
+                espera = self.debounce if debounce is None else debounce
+                tarefa.futuro = self._pool.submit(self._correr, tarefa, espera)
+            if anterior is not None:
+                self._largar(anterior)
+        return tarefa
+
+    def largar(self, tarefa):
+        # A sessão deixou de precisar desta tarefa (ex.: a nova seleção já estava em cache)
+        if tarefa is not None:
+            with self._lock:
+                self._largar(tarefa)
+
+    def _largar(self, tarefa):
+        if tarefa.cancelada():
+            return
+        tarefa.interessados -= 1
+        if tarefa.interessados > 0 or tarefa.futuro.done():
+            return
+        tarefa.cancelado.set()
+        self.cancelados += 1
+        # Ainda na fila: nunca chega a correr
+        if tarefa.futuro.cancel() and self._em_curso.get(tarefa.chave) is tarefa:
+            del self._em_curso[tarefa.chave]
+
+    def _correr(self, tarefa, espera):
+        try:
+            if tarefa.cancelado.wait(espera):
+                raise wbfetch.PedidoCancelado('substituído por uma seleção mais recente')
+            with self._lock:
+                self.executados += 1
+            return tarefa.funcao(tarefa.cancelado)
+        finally:
+            with self._lock:
+                if self._em_curso.get(tarefa.chave) is tarefa:
+                    del self._em_curso[tarefa.chave]
+
+    def estatisticas(self):
+        with self._lock:
+            return {'pedidos': self.pedidos, 'coalescidos': self.coalescidos, 'cancelados': self.cancelados,
+                    'executados': self.executados, 'em_curso': len(self._em_curso)}
+
+
+buscador = Buscador()
+
+
+def pedir_dados(series, economies, start_year, end_year, anterior=None, debounce=None):
+    # Tarefa que devolve o mesmo DataFrame largo do wbcache.get_data
+    chave = (tuple(series), tuple(economies), start_year, end_year)
+
+    def buscar(cancelado):
+        fetcher = functools.partial(wbfetch.fetch_chunked, cancelado=cancelado)
+        return wbcache.get_data(series, economies, start_year, end_year, fetcher=fetcher)
+
+    return buscador.pedir(chave, buscar, anterior, debounce)
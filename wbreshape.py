@@ -0,0 +1,150 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ------------------ Formato longo compacto dos dados do Banco Mundial ------------------
+# País e Indicador ficam como categorias (um código inteiro por linha em vez de uma string),
+# o Ano como inteiro pequeno e, opcionalmente, o Valor em float32. A legenda dos gráficos
+# ("País - Indicador") é montada a partir dos códigos das categorias, sem concatenar strings.
+#
+# para_longo() passa qualquer formato devolvido pelo wb.data.DataFrame (ou pelo wbcache / wdi)
+# para o formato longo País/Indicador/Ano/Valor: uma ou várias séries, uma ou várias economias,
+# MultiIndex, anos nas colunas (YR2000 ou 2000) ou no índice, colunas de nomes (labels=True).
+# Os códigos são trocados pelos nomes só nas categorias (uma vez por código distinto); as linhas
+# guardam apenas os códigos inteiros, montados com np.repeat/np.tile numa única passagem.
+
+VALORES_FLOAT32 = False
+DIMENSOES = ('economy', 'series', 'time')
+COLUNAS_NOMES = ('Country', 'Series', 'Time')  # acrescentadas pelo wb.data.DataFrame(labels=True)
+
+
+def _categoria(coluna, categorias):
+    if categorias is None and isinstance(coluna.dtype, pd.CategoricalDtype):
+        return coluna
+    return pd.Categorical(coluna, categories=categorias if categorias is not None else pd.unique(coluna))
+
+
+def compactar(df, paises=None, indicadores=None, float32=None):
+    # Converte as colunas presentes. Aplicado à tabela larga antes do melt, as categorias são
+    # criadas uma vez por par (país, indicador) e o melt só repete os códigos.
+    # paises/indicadores fixam a ordem das categorias (por defeito a ordem de aparição)
+    float32 = VALORES_FLOAT32 if float32 is None else float32
+    if 'País' in df.columns:
+        df['País'] = _categoria(df['País'], paises)
+    if 'Indicador' in df.columns:
+        df['Indicador'] = _categoria(df['Indicador'], indicadores)
+    if 'Ano' in df.columns:
+        df['Ano'] = pd.to_numeric(df['Ano']).astype(np.int16)
+    if 'Valor' in df.columns:
+        df['Valor'] = pd.to_numeric(df['Valor']).astype(np.float32 if float32 else np.float64)
+    return df
+
+
+def legenda(df_long, separador=' - '):
+    # Categoria "País - Indicador" calculada a partir dos códigos (uma combinação por par)
+    paises = df_long['País'].cat
+    indicadores = df_long['Indicador'].cat
+    n = len(indicadores.categories)
+    codigos = paises.codes.astype(np.int64) * n + indicadores.codes
+    codigos = np.where((paises.codes < 0) | (indicadores.codes < 0), -1, codigos)
+    rotulos = [f'{p}{separador}{i}' for p in paises.categories for i in indicadores.categories]
+    return pd.Categorical.from_codes(codigos, categories=rotulos).remove_unused_categories()
+
+
+def compactar_economias(economias):
+    # Lista de dicts do wb.economy.list() -> DataFrame indexado pelo nome, ordenado uma vez
+    df = pd.DataFrame(list(economias))
+    df = df[[c for c in ['id', 'value', 'aggregate', 'region', 'incomeLevel'] if c in df.columns]]
+    df = df.drop_duplicates('value').set_index('value').sort_index()
+    for col in ['region', 'incomeLevel']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# ------------------ Formato largo (wb.data.DataFrame) -> longo ------------------
+
+def _ano(valor):
+    # 'YR2019', 2019 ou '2019' -> 2019; None se não for um ano
+    correspondencia = re.fullmatch(r'(?:YR)?(\d{4})', str(valor))
+    return int(correspondencia.group(1)) if correspondencia else None
+
+
+def _dimensao(nome, valores, dimensoes):
+    # Nome da dimensão de um eixo do wb.data.DataFrame: o que vier no eixo, senão deduzido dos
+    # valores (anos ou códigos pedidos)
+    if nome in DIMENSOES:
+        return nome
+    if len(valores) and all(_ano(v) is not None for v in valores):
+        return 'time'
+    for dimensao, codigos in dimensoes.items():
+        if codigos is not None and set(valores) <= set(codigos):
+            return dimensao
+    raise ValueError(f'Não foi possível identificar a dimensão do eixo {nome!r}')
+
+
+def _categorias(codigos, unicos, dimensao, selecao):
+    # Códigos por linha (posição em `unicos`) -> Categorical com os nomes, na ordem da seleção
+    codigos_sel, nomes_sel = selecao.get(dimensao, (None, None))
+    if dimensao == 'time':
+        anos = np.array([_ano(u) for u in unicos], dtype=np.int16)
+        return anos[codigos]
+    if codigos_sel is None:
+        return pd.Categorical.from_codes(codigos, categories=pd.Index(unicos).astype(str))
+    nomes = list(nomes_sel) if nomes_sel is not None else [str(c) for c in codigos_sel]
+    posicao = {c: i for i, c in enumerate(codigos_sel)}
+    # Códigos que não foram pedidos ficam com o próprio código como nome, no fim
+    extra = [u for u in unicos if u not in posicao]
+    for u in extra:
+        posicao[u] = len(nomes)
+        nomes.append(str(u))
+    mapa = np.array([posicao[u] for u in unicos], dtype=np.int32)
+    return pd.Categorical.from_codes(mapa[codigos], categories=nomes)
+
+
+def para_longo(df, series=None, indicadores=None, economias=None, paises=None, float32=None):
+    # `series`/`economias`: códigos pedidos, na ordem da seleção; `indicadores`/`paises`: os nomes
+    # correspondentes (mesma ordem). Uma dimensão que o wb.data.DataFrame omite por ter um só
+    # valor (uma série ou uma economia) é preenchida com esse valor.
+    float32 = VALORES_FLOAT32 if float32 is None else float32
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    df = df.drop(columns=[c for c in COLUNAS_NOMES if c in df.columns])
+    pedidas = {'economy': economias, 'series': series}
+    selecao = {'economy': (economias, paises), 'series': (series, indicadores)}
+
+    nomes_linhas = [_dimensao(n, df.index.get_level_values(i).unique(), pedidas)
+                    for i, n in enumerate(df.index.names)]
+    dimensao_colunas = _dimensao(df.columns.name, df.columns, pedidas)
+    if dimensao_colunas == 'time':
+        # Só as colunas de anos (ignora colunas de metadados que sobrem)
+        df = df.loc[:, [_ano(c) is not None for c in df.columns]]
+
+    n_linhas, n_colunas = df.shape
+    # Ordem do melt: ano a ano (coluna a coluna), as linhas da tabela dentro de cada ano
+    valores = df.to_numpy(dtype=np.float64).ravel(order='F')
+    longo = {}
+    for i, dimensao in enumerate(nomes_linhas):
+        codigos, unicos = pd.factorize(df.index.get_level_values(i))
+        longo[dimensao] = _categorias(np.tile(codigos, n_colunas), unicos, dimensao, selecao)
+    codigos, unicos = pd.factorize(df.columns)
+    longo[dimensao_colunas] = _categorias(np.repeat(codigos, n_linhas), unicos, dimensao_colunas, selecao)
+
+    for dimensao in ('economy', 'series'):
+        if dimensao not in longo:
+            codigos_sel, _ = selecao[dimensao]
+            if not codigos_sel or len(codigos_sel) != 1:
+                raise ValueError(f'O DataFrame não tem a dimensão {dimensao!r} e a seleção não tem '
+                                 f'exatamente um código para a preencher')
+            longo[dimensao] = _categorias(np.zeros(len(valores), dtype=np.int32), list(codigos_sel),
+                                          dimensao, selecao)
+    if 'time' not in longo:
+        raise ValueError('O DataFrame não tem a dimensão dos anos')
+
+    return pd.DataFrame({
+        'País': longo['economy'],
+        'Indicador': longo['series'],
+        'Ano': longo['time'],
+        'Valor': valores.astype(np.float32) if float32 else valores,
+    })
@@ -0,0 +1,133 @@
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ------------------ Servidor local que imita a API de dados do Banco Mundial ------------------
+# Responde a /v2/sources/2/series/{s1;s2}/country/{e1;e2}/time/{YR2000;YR2001} no mesmo formato
+# JSON (com paginação) da API real, com valores sintéticos determinísticos. Permite simular
+# latência e erros transitórios para testar o wbfetch sem rede:
+#
+#     python wbstub.py --porta 8765 --latencia 0.2 --jitter 0.1 --erros 0.1
+#     MOZDADOS_WB_ENDPOINT=http://127.0.0.1:8765/v2 streamlit run wbapp.py
+
+
+def valor_sintetico(series, economy, year):
+    # Mesmo valor para a mesma célula em qualquer pedido
+    semente = zlib.crc32(f'{series}|{economy}'.encode())
+    base = 10 + semente % 1000
+    return round(base * (1 + 0.02 * (year - 1960)) + (semente % 7) * (year % 5), 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latencia = 0.0
+    jitter = 0.0
+    taxa_erros = 0.0
+    erros_seguidos = 0
+    series_com_erro = frozenset()
+    pedidos = 0
+    vistos = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _indisponivel(self):
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        with self.lock:
+            type(self).pedidos += 1
+            vezes = self.vistos[self.path] = self.vistos.get(self.path, 0) + 1
+        if self.latencia or self.jitter:
+            time.sleep(self.latencia + random.uniform(0, self.jitter))
+        # Erros injetados: as primeiras `erros_seguidos` tentativas de cada URL e uma fração aleatória
+        if vezes <= self.erros_seguidos or random.random() < self.taxa_erros:
+            self._indisponivel()
+            return
+
+        url = urlsplit(self.path)
+        partes = url.path.strip('/').split('/')
+        try:
+            i = partes.index('sources')
+            dims = dict(zip(partes[i + 2::2], partes[i + 3::2]))
+            series = dims['series'].split(';')
+            economies = dims['country'].split(';')
+            times = dims['time'].split(';')
+        except (ValueError, KeyError):
+            self._responder(400, [{'message': [{'id': '120', 'key': 'Parameter value is not valid',
+                                                'value': 'The provided parameter value is not valid'}]}])
+            return
+        # Blocos com estas séries falham sempre, para simular uma falha parcial
+        if self.series_com_erro.intersection(series):
+            self._indisponivel()
+            return
+
+        params = parse_qs(url.query)
+        por_pagina = int(params.get('per_page', ['50'])[0])
+        pagina = int(params.get('page', ['1'])[0])
+
+        linhas = [(s, e, t) for s in series for e in economies for t in times]
+        total = len(linhas)
+        inicio = (pagina - 1) * por_pagina
+        data = [{
+            'variable': [
+                {'concept': 'Country', 'id': e, 'value': e},
+                {'concept': 'Series', 'id': s, 'value': s},
+                {'concept': 'Time', 'id': t, 'value': t.replace('YR', '')},
+            ],
+            'value': valor_sintetico(s, e, int(t.replace('YR', ''))),
+        } for s, e, t in linhas[inicio:inicio + por_pagina]]
+
+        self._responder(200, {
+            'page': pagina,
+            'pages': max(1, -(-total // por_pagina)),
+            'per_page': por_pagina,
+            'total': total,
+            'source': {'id': '2', 'name': 'World Development Indicators', 'data': data},
+        })
+
+
+def iniciar(porta=0, latencia=0.0, taxa_erros=0.0, jitter=0.0, erros_seguidos=0, series_com_erro=()):
+    # Arranca o servidor numa thread; devolve (servidor, endpoint). Use porta=0 para uma porta livre.
+    # O número de pedidos recebidos fica em servidor.RequestHandlerClass.pedidos.
+    handler = type('Handler', (_Handler,), {
+        'latencia': latencia, 'jitter': jitter, 'taxa_erros': taxa_erros, 'erros_seguidos': erros_seguidos,
+        'series_com_erro': frozenset(series_com_erro), 'pedidos': 0, 'vistos': {},
+    })
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}/v2'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor local que imita a API do Banco Mundial')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos de espera por pedido')
+    parser.add_argument('--jitter', type=float, default=0.0, help='espera aleatória extra, até estes segundos')
+    parser.add_argument('--erros', type=float, default=0.0, help='fração de pedidos que respondem 503')
+    parser.add_argument('--erros-seguidos', type=int, default=0,
+                        help='as primeiras N tentativas de cada URL respondem 503')
+    args = parser.parse_args()
+
+    servidor, endpoint = iniciar(args.porta, args.latencia, args.erros, args.jitter, args.erros_seguidos)
+    print(f'API simulada em {endpoint}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+# ------------------ Cópia local do WDI (World Development Indicators) ------------------
+# Para servir o wbapp.py sem depender da API, o ficheiro de descarga em massa do WDI
+# (WDI_CSV.zip, ou o WDICSV.csv / WDIData.csv já extraído) é convertido num conjunto Parquet:
+#
+#     dados/wdi/valores/series=NY.GDP.MKTP.CD/part-0.parquet   (economy, year, value)
+#     dados/wdi/indicadores.parquet, dados/wdi/economias.parquet, dados/wdi/meta.json
+#
+# O CSV é lido aos blocos e nunca fica inteiro em memória: primeiro os valores vão para
+# BALDES ficheiros intermédios (repartidos pelo código da série), depois cada balde é ordenado e
+# escrito com uma pasta por série. Dentro de cada ficheiro as linhas estão ordenadas por economia
+# e ano em row groups pequenos, para que os filtros por economia e ano saltem os row groups que não
+# interessam (as estatísticas min/max do Parquet). A leitura usa memory mapping.
+#
+#     python wdi.py ~/Downloads/WDI_CSV.zip
+#     MOZDADOS_WDI_DIR=dados/wdi streamlit run wbapp.py
+
+WDI_DIR = os.environ.get(
+    'MOZDADOS_WDI_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'wdi')
+)
+FICHEIROS_CSV = ('WDICSV.csv', 'WDIData.csv')  # nome do ficheiro de dados no zip (atual e antigo)
+LINHAS_POR_BLOCO = 5000  # linhas do CSV (país x indicador) lidas de cada vez
+BALDES = 64
+LINHAS_POR_GRUPO = 1024  # ~16 economias x 64 anos por row group
+
+ESQUEMA = pa.schema([('series', pa.string()), ('economy', pa.string()),
+                     ('year', pa.int16()), ('value', pa.float64())])
+PARTICOES = ds.partitioning(pa.schema([('series', pa.string())]), flavor='hive')
+
+
+# ------------------ Ingestão ------------------
+
+def _abrir_csv(fonte):
+    # Ficheiro de dados dentro do zip ou o próprio CSV
+    if zipfile.is_zipfile(fonte):
+        arquivo = zipfile.ZipFile(fonte)
+        nomes = {os.path.basename(n): n for n in arquivo.namelist()}
+        for nome in FICHEIROS_CSV:
+            if nome in nomes:
+                return arquivo.open(nomes[nome])
+        raise ValueError(f'{fonte} não tem nenhum de {", ".join(FICHEIROS_CSV)}')
+    return open(fonte, 'rb')
+
+
+def _blocos(fonte, linhas_por_bloco=LINHAS_POR_BLOCO):
+    # Blocos no formato longo (series, economy, year, value), só com as células preenchidas,
+    # mais os nomes (código -> nome) de indicadores e economias vistos em cada bloco
+    with _abrir_csv(fonte) as f:
+        for bloco in pd.read_csv(f, chunksize=linhas_por_bloco, encoding='utf-8-sig'):
+            anos = [c for c in bloco.columns if re.fullmatch(r'\d{4}', str(c))]
+            longo = bloco.melt(id_vars=['Indicator Code', 'Country Code'], value_vars=anos,
+                               var_name='year', value_name='value')
+            longo = longo.dropna(subset=['value'])
+            longo = pd.DataFrame({
+                'series': longo['Indicator Code'].astype(str),
+                'economy': longo['Country Code'].astype(str),
+                'year': longo['year'].astype('int16'),
+                'value': longo['value'].astype('float64'),
+            })
+            nomes = (bloco[['Indicator Code', 'Indicator Name']].drop_duplicates(),
+                     bloco[['Country Code', 'Country Name']].drop_duplicates())
+            yield longo, nomes
+
+
+def _balde(codigo):
+    return zlib.crc32(codigo.encode('utf-8')) % BALDES
+
+
+def ingerir(fonte, destino=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    # Converte o CSV/ZIP do WDI no conjunto Parquet em `destino` e devolve o meta.json.
+    # O conjunto novo é montado ao lado e só substitui o anterior no fim.
+    destino = destino or WDI_DIR
+    inicio = time.perf_counter()
+    novo = f'{destino}.novo-{os.getpid()}'
+    intermedio = os.path.join(novo, '_baldes')
+    os.makedirs(intermedio)
+    try:
+        # 1.ª passagem: CSV aos blocos -> um ficheiro por balde
+        escritores = {}
+        indicadores, economias = {}, {}
+        linhas = 0
+        try:
+            for longo, (nomes_ind, nomes_eco) in _blocos(fonte, linhas_por_bloco):
+                indicadores.update(zip(nomes_ind['Indicator Code'], nomes_ind['Indicator Name']))
+                economias.update(zip(nomes_eco['Country Code'], nomes_eco['Country Name']))
+                linhas += len(longo)
+                baldes = longo['series'].map(_balde)
+                for balde, parte in longo.groupby(baldes, sort=False):
+                    if balde not in escritores:
+                        escritores[balde] = pq.ParquetWriter(os.path.join(intermedio, f'{balde:03d}.parquet'), ESQUEMA)
+                    escritores[balde].write_table(pa.Table.from_pandas(parte, schema=ESQUEMA, preserve_index=False))
+        finally:
+            for escritor in escritores.values():
+                escritor.close()
+
+        # 2.ª passagem: cada balde (1/BALDES dos dados) ordenado e repartido por série
+        valores = os.path.join(novo, 'valores')
+        anos = set()
+        for nome in sorted(os.listdir(intermedio)):
+            caminho = os.path.join(intermedio, nome)
+            tabela = pq.read_table(caminho).sort_by([('series', 'ascending'), ('economy', 'ascending'),
+                                                     ('year', 'ascending')])
+            os.remove(caminho)
+            codigos = tabela.column('series').unique().to_pylist()
+            for codigo in codigos:
+                serie = tabela.filter(pc.equal(tabela.column('series'), codigo)).drop_columns(['series'])
+                pasta = os.path.join(valores, f'series={quote(codigo, safe="")}')
+                os.makedirs(pasta, exist_ok=True)
+                pq.write_table(serie, os.path.join(pasta, 'part-0.parquet'), row_group_size=LINHAS_POR_GRUPO)
+            anos.update(pc.unique(tabela.column('year')).to_pylist())
+        os.rmdir(intermedio)
+
+        pd.DataFrame({'id': list(indicadores), 'nome': list(indicadores.values())}) \
+            .to_parquet(os.path.join(novo, 'indicadores.parquet'), index=False)
+        pd.DataFrame({'id': list(economias), 'nome': list(economias.values())}) \
+            .to_parquet(os.path.join(novo, 'economias.parquet'), index=False)
+        meta = {
+            'fonte': os.path.basename(fonte),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'linhas': linhas,
+            'indicadores': len(indicadores),
+            'economias': len(economias),
+            'anos': [min(anos), max(anos)] if anos else None,
+            'segundos': round(time.perf_counter() - inicio, 1),
+        }
+        with open(os.path.join(novo, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+
+        antigo = f'{destino}.antigo-{os.getpid()}'
+        if os.path.exists(destino):
+            os.replace(destino, antigo)
+        os.replace(novo, destino)
+        shutil.rmtree(antigo, ignore_errors=True)
+        return meta
+    except BaseException:
+        shutil.rmtree(novo, ignore_errors=True)
+        raise
+
+
+# ------------------ Consulta ------------------
+
+_conjuntos = {}
+_conjuntos_lock = threading.Lock()
+
+
+def disponivel(path=None):
+    return os.path.exists(os.path.join(path or WDI_DIR, 'meta.json'))
+
+
+def versao(path=None):
+    # Muda sempre que o conjunto é ingerido de novo; None se não existir
+    try:
+        return os.path.getmtime(os.path.join(path or WDI_DIR, 'meta.json'))
+    except FileNotFoundError:
+        return None
+
+
+def _conjunto(path=None):
+    # Dataset aberto uma vez por versão (data de modificação do meta.json)
+    path = path or WDI_DIR
+    versao_atual = versao(path)
+    with _conjuntos_lock:
+        guardado = _conjuntos.get(path)
+        if guardado is None or guardado[0] != versao_atual:
+            conjunto = ds.dataset(os.path.join(path, 'valores'), format='parquet', partitioning=PARTICOES,
+                                  filesystem=pafs.LocalFileSystem(use_mmap=True))
+            guardado = _conjuntos[path] = (versao_atual, conjunto)
+        return guardado[1]
+
+
+def consultar(series, economies, start_year, end_year, path=None):
+    # Formato longo (series, economy, year, value) só com as células guardadas; os filtros são
+    # aplicados ao ler (pastas por série, row groups por economia e ano)
+    filtro = (ds.field('series').isin(list(series)) & ds.field('economy').isin(list(economies))
+              & (ds.field('year') >= start_year) & (ds.field('year') <= end_year))
+    tabela = _conjunto(path).to_table(columns=['series', 'economy', 'year', 'value'], filter=filtro)
+    return tabela.to_pandas()
+
+
+def _largo(long_df, series, economies, years):
+    # Mesmo formato do wb.data.DataFrame(index=['economy', 'series'], columns='time') e do wbcache
+    index = pd.MultiIndex.from_product([sorted(economies), sorted(series)], names=['economy', 'series'])
+    wide = (long_df.astype({'year': int})
+            .set_index(['economy', 'series', 'year'])['value']
+            .unstack('year')
+            .reindex(index=index, columns=years))
+    wide.columns = pd.Index([f'YR{y}' for y in years], name='time')
+    return wide
+
+
+def get_data(series, economies, start_year, end_year, path=None):
+    series = list(dict.fromkeys(series))
+    economies = list(dict.fromkeys(economies))
+    years = list(range(start_year, end_year + 1))
+    return _largo(consultar(series, economies, start_year, end_year, path), series, economies, years)
+
+
+def fetch(series, economies, years, path=None):
+    # Com a mesma assinatura do wbfetch.fetch_chunked: pode servir de `fetcher` ao wbcache
+    years = list(years)
+    return get_data(series, economies, min(years), max(years), path).reindex(columns=[f'YR{y}' for y in years])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converte a descarga em massa do WDI num conjunto Parquet local')
+    parser.add_argument('fonte', help='WDI_CSV.zip ou WDICSV.csv descarregado do Banco Mundial')
+    parser.add_argument('--destino', default=WDI_DIR, help=f'pasta do conjunto (por defeito {WDI_DIR})')
+    parser.add_argument('--linhas-por-bloco', type=int, default=LINHAS_POR_BLOCO)
+    args = parser.parse_args()
+
+    try:
+        meta = ingerir(args.fonte, args.destino, args.linhas_por_bloco)
+    except (OSError, ValueError) as e:
+        print(f'✗ {e}', file=sys.stderr)
+        sys.exit(1)
+    print(f"✓ {meta['linhas']:,} valores, {meta['indicadores']} indicadores, {meta['economias']} economias, "
+          f"{meta['anos'][0]}-{meta['anos'][1]} em {meta['segundos']}s -> {args.destino}")